@@ -0,0 +1,303 @@
+"""
+Benchmarks of the simulation and the export, swept over the amount of cars
+(density times road length), the amount of lanes and the amount of steps.
+Every benchmark reports steps per second and car updates (steps times cars)
+per second. The results are saved as JSON together with the commit they were
+measured on, and can be compared with an earlier file to see regressions.
+
+Run from the root directory:
+
+    python -m benchmarks.run_benchmarks --out bench.json
+    python -m benchmarks.run_benchmarks --quick --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from src import circular_animation, kernels
+from src.model import TRACK_ENGINES, Model
+from src.recorder import TrajectoryRecorder
+from src.trajectory_io import trajectory_frame
+
+ROAD_LENGTH = 2000
+FULL = {
+    "densities": [20, 60, 140],
+    "lanes": [1, 2, 3],
+    "steps": [200, 1000],
+    "repeat": 3,
+}
+QUICK = {"densities": [20, 140], "lanes": [1, 2], "steps": [100], "repeat": 1}
+
+
+def make_track(engine, lanes, density, central_control=False, seed=0):
+    track = TRACK_ENGINES[engine](
+        lane_count=lanes,
+        length=ROAD_LENGTH,
+        central_control=central_control,
+        rng=np.random.default_rng(seed),
+    )
+    track.init_cars(density)
+    return track
+
+
+def prefered_per_lane(track):
+    """The same preferred amount of cars per lane as ``Model.simulate``."""
+    total_cars = sum(track.lane_sizes())
+    prefered = [total_cars // track.lanes_count] * track.lanes_count
+    for i in range(total_cars % track.lanes_count):
+        prefered[i] += 1
+    return prefered
+
+
+def measure(function, repeat):
+    """Returns the best time in seconds of ``repeat`` calls of ``function``."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(name, engine, lanes, density, cars, steps, seconds):
+    return {
+        "benchmark": name,
+        "engine": engine,
+        "lanes": lanes,
+        "density": density,
+        "cars": cars,
+        "steps": steps,
+        "seconds": seconds,
+        "steps_per_sec": steps / seconds,
+        "car_updates_per_sec": steps * cars / seconds,
+    }
+
+
+def bench_track(engine, lanes, density, steps, repeat):
+    """The phases of a simulation step of a track, each on its own."""
+    results = []
+    track = make_track(engine, lanes, density)
+    cars = sum(track.lane_sizes())
+
+    def next_state():
+        for _ in range(steps):
+            track.calculate_next_state()
+
+    seconds = measure(next_state, repeat)
+    results.append(
+        result("calculate_next_state", engine, lanes, density, cars, steps, seconds)
+    )
+    if lanes == 1:
+        return results
+
+    def switches():
+        for _ in range(steps):
+            track.lane_switches()
+
+    seconds = measure(switches, repeat)
+    results.append(
+        result("lane_switches", engine, lanes, density, cars, steps, seconds)
+    )
+
+    track = make_track(engine, lanes, density, central_control=True)
+    prefered = prefered_per_lane(track)
+
+    def switches_central():
+        for _ in range(steps):
+            track.lane_switches_central(prefered)
+
+    seconds = measure(switches_central, repeat)
+    results.append(
+        result("lane_switches_central", engine, lanes, density, cars, steps, seconds)
+    )
+    return results
+
+
+def bench_model(engine, lanes, density, steps, repeat):
+    """A whole ``Model`` simulation of a single density."""
+    model = Model(total_time=steps, lane_count=lanes, engine=engine, seed=0)
+    cars = sum(make_track(engine, lanes, density).lane_sizes())
+
+    def simulate():
+        model.simulate(density, rng=np.random.default_rng(0))
+
+    seconds = measure(simulate, repeat)
+    return [result("Model.simulate", engine, lanes, density, cars, steps, seconds)]
+
+
+def recorded_run(lanes, density, steps):
+    """Simulates a run and returns its trajectories in a ``TrajectoryRecorder``."""
+    track = make_track("vector", lanes, density)
+    cars = sum(track.lane_sizes())
+    recorder = TrajectoryRecorder(steps, cars)
+    for t in range(steps):
+        recorder.record(t, t, *track.snapshot())
+        if lanes > 1:
+            track.lane_switches()
+        track.calculate_next_state()
+        track.update_state()
+        track.apply_periodic_boundary()
+    return track, recorder
+
+
+def bench_export(lanes, density, steps, repeat):
+    """``Model.export_data`` in every format that can be written here."""
+    results = []
+    track, recorder = recorded_run(lanes, density, steps)
+    cars = recorder.position.shape[1]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for fmt in ("csv", "npz"):
+                model = Model(lane_count=lanes, export_format=fmt)
+                seconds = measure(
+                    lambda: model.export_data(recorder, track, density), repeat
+                )
+                name = f"Model.export_data[{fmt}]"
+                results.append(result(name, "-", lanes, density, cars, steps, seconds))
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def bench_animation(lanes, density, steps, repeat):
+    """``circular_animation.update_animation`` for every recorded frame."""
+    _, recorder = recorded_run(lanes, density, steps)
+    cars = recorder.position.shape[1]
+    df = trajectory_frame(*recorder.trajectories())
+    frames = circular_animation.prepare_frames(df)
+    fig, ax1, ax2, cmap, norm = circular_animation.setup_figure_and_axes(df, df)
+    frames["colors"] = cmap(norm(frames["speed"]))
+    objects = (ax1.scatter([], []), ax2.scatter([], []), ax1.text(0, 0, ""))
+
+    def update():
+        for timestep in frames["timesteps"]:
+            circular_animation.update_animation(timestep, frames, frames, objects)
+
+    seconds = measure(update, repeat)
+    plt.close(fig)
+    return [result("update_animation", "-", lanes, density, cars, steps, seconds)]
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": kernels.HAVE_NUMBA,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run(engines, densities, lanes_list, steps_list, repeat=3, log=print):
+    """Runs every benchmark for every combination and returns the results."""
+    results = []
+    # compiles the kernels of the compiled engine before anything is measured
+    for engine in engines:
+        make_track(engine, 2, 20).calculate_next_state()
+    for density in densities:
+        for lanes in lanes_list:
+            for steps in steps_list:
+                case = []
+                for engine in engines:
+                    case += bench_track(engine, lanes, density, steps, repeat)
+                    case += bench_model(engine, lanes, density, steps, repeat)
+                case += bench_export(lanes, density, steps, repeat)
+                case += bench_animation(lanes, density, steps, repeat)
+                for entry in case:
+                    log(format_result(entry))
+                results += case
+    return results
+
+
+def key(entry):
+    return (
+        entry["benchmark"],
+        entry["engine"],
+        entry["lanes"],
+        entry["density"],
+        entry["steps"],
+    )
+
+
+def format_result(entry, baseline=None):
+    line = (
+        f"{entry['benchmark']:<28} {entry['engine']:<9} lanes={entry['lanes']} "
+        f"density={entry['density']:<4} cars={entry['cars']:<4} "
+        f"steps={entry['steps']:<5} {entry['steps_per_sec']:>10.1f} steps/s "
+        f"{entry['car_updates_per_sec']:>12.0f} car-updates/s"
+    )
+    if baseline is not None:
+        line += f"  x{baseline['seconds'] / entry['seconds']:.2f}"
+    return line
+
+
+def compare(results, baseline_file):
+    """Prints the speedup of every result over the same benchmark in a file."""
+    with open(baseline_file) as file:
+        baseline = {key(entry): entry for entry in json.load(file)["results"]}
+    print(f"\nCompared with {baseline_file} (x > 1 is faster):")
+    for entry in results:
+        if key(entry) in baseline:
+            print(format_result(entry, baseline[key(entry)]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", help="an earlier results file")
+    parser.add_argument(
+        "--engines", nargs="+", default=list(TRACK_ENGINES), choices=TRACK_ENGINES
+    )
+    parser.add_argument("--densities", nargs="+", type=float)
+    parser.add_argument("--lanes", nargs="+", type=int)
+    parser.add_argument("--steps", nargs="+", type=int)
+    parser.add_argument("--repeat", type=int)
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="a small sweep with a single repeat, for the values that are not given",
+    )
+    args = parser.parse_args(argv)
+    sweep = QUICK if args.quick else FULL
+    for name, value in sweep.items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+
+    results = run(args.engines, args.densities, args.lanes, args.steps, args.repeat)
+    with open(args.out, "w") as file:
+        json.dump({"metadata": metadata(), "results": results}, file, indent=2)
+    print(f"Results saved to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,119 @@
 import numpy as np
 
+# used by agents that are not given a generator of their own
+DEFAULT_RNG = np.random.default_rng()
+
+
+class VehicleType(object):
+    """
+    The parameters that all vehicles of a type share, with the same meaning
+    and defaults as those of ``VehicleAgent``. The agents only point to their
+    type, so the parameters are not kept once per car.
+    """
+
+    __slots__ = (
+        "desired_speed",
+        "max_speed",
+        "length",
+        "a_normal",
+        "a_max",
+        "b",
+        "TP",
+        "AC",
+    )
+
+    def __init__(
+        self,
+        desired_speed=30,
+        max_speed=35,
+        length=5,
+        a_normal=3.05,
+        a_max=6.04,
+        b=0.2,
+        TP=1.2,
+        AC=0.5,
+    ):
+        self.desired_speed = desired_speed
+        self.max_speed = max_speed
+        self.length = length
+        self.a_normal = a_normal
+        self.a_max = a_max
+        self.b = b
+        self.TP = TP
+        self.AC = AC
+
+    def parameters(self):
+        """Returns the parameters as a dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def replace(self, **changes):
+        """Returns a new type with some of the parameters changed."""
+        return VehicleType(**{**self.parameters(), **changes})
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, VehicleType) and self.parameters() == other.parameters()
+        )
+
+    def __hash__(self):
+        return hash(tuple(self.parameters().values()))
+
+    def __repr__(self):
+        parameters = ", ".join(f"{k}={v}" for k, v in self.parameters().items())
+        return f"VehicleType({parameters})"
+
+
+# the type of the agents that are created with the default parameters
+DEFAULT_TYPE = VehicleType()
+_DEFAULT_PARAMETERS = tuple(DEFAULT_TYPE.parameters().values())
+
+# the vehicle classes that can be named in a vehicle mix, see ``Track.init_cars``
+VEHICLE_CLASSES = {
+    "car": DEFAULT_TYPE,
+    "truck": VehicleType(
+        desired_speed=25, max_speed=28, length=12, a_normal=1.5, a_max=3.0, TP=1.6
+    ),
+    "bus": VehicleType(
+        desired_speed=22, max_speed=25, length=12, a_normal=1.2, a_max=2.5, TP=1.5
+    ),
+}
+
+
+def _type_parameter(name):
+    """A property of ``VehicleAgent`` that reads a parameter of its type."""
+
+    def get(self):
+        return getattr(self.vehicle_type, name)
+
+    def set(self, value):
+        # the type is shared with other agents, so this one gets its own
+        self.vehicle_type = self.vehicle_type.replace(**{name: value})
+
+    return property(get, set, doc=f"The {name} of the type of the vehicle.")
+
 
 # car object that behaves like a car
 class VehicleAgent(object):
+    __slots__ = (
+        "position",
+        "current_speed",
+        "next_speed",
+        "acceleration",
+        "rng",
+        "vehicle_id",
+        "vehicle_type",
+        "vehicle_class",
+    )
+
+    desired_speed = _type_parameter("desired_speed")
+    max_speed = _type_parameter("max_speed")
+    length = _type_parameter("length")
+    a_normal = _type_parameter("a_normal")
+    a_max = _type_parameter("a_max")
+    b = _type_parameter("b")
+    TP = _type_parameter("TP")
+    AC = _type_parameter("AC")
+
     def __init__(
         self,
         position,
@@ -15,6 +126,10 @@ class VehicleAgent(object):
         b=0.2,
         TP=1.2,
         AC=0.5,
+        rng=None,
+        vehicle_id=None,
+        vehicle_type=None,
+        vehicle_class=0,
     ):
         """
         The parameters of the vehicle agent are:
@@ -28,38 +143,32 @@ class VehicleAgent(object):
         - b: the noise of the model, accounting for the real world environment
         - TP: the time headway the follower prefers to the vehicle in front
         - AC: the chance that in a centralized control environment this car tries to increase the mean spead
+        - rng: the numpy.random.Generator used for the noise, when the noise is not given by the track
+        - vehicle_id: the index of the car in the trajectories recorded by the track
+        - vehicle_type: a VehicleType shared with other agents, which replaces the
+          parameters from desired speed up to AC
+        - vehicle_class: the index of the class of the vehicle in the vehicle mix of
+          the track
         """
 
         self.position = position
         self.current_speed = current_speed
-        self.desired_speed = desired_speed
-        self.max_speed = max_speed
-        self.length = length
-        self.a_normal = a_normal
-        self.a_max = a_max
-        self.b = b
-        self.TP = TP
+        self.next_speed = current_speed
+        if vehicle_type is None:
+            parameters = (desired_speed, max_speed, length, a_normal, a_max, b, TP, AC)
+            if parameters == _DEFAULT_PARAMETERS:
+                vehicle_type = DEFAULT_TYPE
+            else:
+                vehicle_type = VehicleType(*parameters)
+        self.vehicle_type = vehicle_type
+        self.vehicle_class = vehicle_class
         self.acceleration = 0
-        self.AC = AC
-
-        # used to save data which can be exported
-        self.speed_list = [0]
-        self.position_list = [0]
-        self.lane_list = [0]
+        self.rng = rng if rng is not None else DEFAULT_RNG
+        self.vehicle_id = vehicle_id
 
     def __lt__(self, other):
         return self.position < other.position
 
-    def reset_data(self):
-        """
-        Resets the data the Agent hold, can be used for example when resetting a simulation
-        with the same cars
-        """
-        self.speed_list = [0]
-        self.position_list = [0]
-        self.lane_list = [0]
-        pass
-
     def compute_decision(self, gap, leader_speed, leader_acceleration):
         """
         The Decision Tree. Returns the decision: accelerate,
@@ -67,7 +176,7 @@ class VehicleAgent(object):
         """
         vF = self.current_speed
         vL = leader_speed
-        gap_desire = vF * self.TP
+        gap_desire = vF * self.vehicle_type.TP
         if gap < 6 * vF:
             delta = gap - gap_desire
 
@@ -115,7 +224,7 @@ class VehicleAgent(object):
                     )
 
         else:
-            delta = vF - self.desired_speed
+            delta = vF - self.vehicle_type.desired_speed
 
             if delta < 0:
                 # accelerate
@@ -132,21 +241,22 @@ class VehicleAgent(object):
                 )
 
     def decceleration_rate(self, vF, vL, aL, gap, gap_desire):
+        vehicle_type = self.vehicle_type
         # case 1: free flowing case
-        if vF > self.desired_speed:
-            aF = min((vF - self.desired_speed) / 3, self.a_normal)
+        if vF > vehicle_type.desired_speed:
+            aF = min((vF - vehicle_type.desired_speed) / 3, vehicle_type.a_normal)
             return aF
 
         # case 2: car-following regime, normal decceleration
         if gap - gap_desire == 0:
             if not vL >= vF:
-                aF = (vF**2 - vL**2) / (2 * gap)
+                aF = (vF * vF - vL * vL) / (2 * gap)
                 return aF
 
         # case 3: emergency decceleration
         if gap - gap_desire < 0:
             if not vL > vF:
-                aF = aL - 0.25 * self.a_normal
+                aF = aL - 0.25 * vehicle_type.a_normal
                 return aF
 
         # case 4: near-collision decceleration
@@ -156,7 +266,7 @@ class VehicleAgent(object):
             and (not gap > 3 * vF)
             and (not ((gap > 2 * vF) and (gap > 7.5)))
         ):
-            aF = min(aL + ((vF - vL) ** 2 / (2 * gap)), self.a_max)
+            aF = min(aL + ((vF - vL) * (vF - vL) / (2 * gap)), vehicle_type.a_max)
             return aF
 
         return 0
@@ -192,7 +302,10 @@ class VehicleAgent(object):
         return True
 
     def can_switch_lanes(self, cars_left, cars_right):
-        assert cars_left != cars_right, f"{cars_left} == {cars_right}"
+        # two empty lanes on either side are the same (None, None)
+        assert (
+            cars_left in (None, (None, None)) or cars_left != cars_right
+        ), f"{cars_left} == {cars_right}"
         return (
             self.can_switch_lane(cars_left),
             self.can_switch_lane(cars_right),
@@ -261,7 +374,10 @@ class VehicleAgent(object):
         reaction_time = 1
         v_safe = leader_speed + (
             (gap - leader_speed * reaction_time)
-            / (reaction_time + ((self.current_speed + leader_speed) / (2 * self.a_max)))
+            / (
+                reaction_time
+                + ((self.current_speed + leader_speed) / (2 * self.vehicle_type.a_max))
+            )
         )
         return v_safe
 
@@ -274,6 +390,7 @@ class VehicleAgent(object):
         mean_speed=None,
         max_accel=1,
         speed_push=0.5,
+        noise=None,
     ):
         """
         Updates the state of the follower (current vehicle), which
@@ -283,21 +400,25 @@ class VehicleAgent(object):
         mean_spead = None means no centralized control
         mac_accel = the maximum acceleration to meet the mean speed
         speed_push = the maximum acceleration added to push the average on mean speed
+        noise = uniform random number in [0, 1) for this step, drawn from rng when None
         """
+        if noise is None:
+            noise = self.rng.random()
+        vehicle_type = self.vehicle_type
 
         self.compute_decision(gap, leader_speed, leader_acceleration)
         v_safe = self.compute_safe_speed(gap, leader_speed)
         v_ideal = min(
-            self.max_speed, self.current_speed + self.acceleration * dt, v_safe
+            vehicle_type.max_speed, self.current_speed + self.acceleration * dt, v_safe
         )
         eta = None
         # eta is only random when no centralized control
         if mean_speed == None:
-            eta = np.random.rand()
+            eta = noise
         else:
             eta = 0.5
 
-        self.next_speed = max(0, v_ideal - self.b * eta)
+        self.next_speed = max(0, v_ideal - vehicle_type.b * eta)
         # if no central control
         if mean_speed != None:
             dif_speed = mean_speed - self.next_speed
@@ -307,14 +428,9 @@ class VehicleAgent(object):
             # if with these speeds there is a collision in 3 seconds don't try and increase the average mean_speed
             if (
                 0 < gap + 3 * (leader_speed - self.next_speed)
-            ) and np.random.rand() < self.AC:
+            ) and noise < vehicle_type.AC:
                 self.next_speed += speed_push
 
-    def update_state(self, dt, lane):
+    def update_state(self, dt):
         self.current_speed = self.next_speed
         self.position += self.current_speed * dt
-
-        # updata data
-        self.speed_list.append(self.current_speed)
-        self.position_list.append(self.position)
-        self.lane_list.append(lane)
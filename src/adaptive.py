@@ -0,0 +1,250 @@
+"""
+Adaptive sweeps, which spend the simulations where the fundamental diagram is
+known the least. ``adaptive_sweep`` chooses the densities: it starts with a
+coarse grid and keeps adding densities halfway the intervals where the slope
+of the mean flow changes the fastest or the flow differs the most from run to
+run, until a budget of simulations is spent, so the flat parts of the diagram
+get few densities and the capacity peak and the jam transition get many.
+``adaptive_runs`` chooses the amount of runs per density: every density gets
+more runs until the confidence intervals of its mean flow and mean speed are
+narrow enough, so the runs go to the densities where the results vary.
+"""
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+from .runner import simulate_tasks, task_seeds
+
+
+def density_seeds(seed, k, runs):
+    """
+    Returns the seeds of the ``runs`` runs of the ``k``-th density that was
+    added to an adaptive sweep, derived from the seed of the model.
+    """
+    return [np.random.SeedSequence(seed, spawn_key=(k, idx)) for idx in range(runs)]
+
+
+def interval_scores(densities, flows):
+    """
+    Returns how much every interval between two neighbouring densities needs
+    a density in between, given the flows of the runs of every density (in
+    order of density). The first part is how far the fundamental diagram bends
+    at the ends of the interval: the change of the slope of the mean flow at
+    both ends, times the width of the interval. A straight part, like the free
+    flow branch, is already described well by its ends. The second part is the
+    mean of the standard deviations of the flow at both ends.
+    """
+    means = np.array([np.mean(runs) for runs in flows])
+    spreads = np.array([np.std(runs) for runs in flows])
+    widths = np.diff(densities)
+    slopes = np.diff(means) / widths
+    bends = np.zeros(len(means))
+    bends[1:-1] = np.abs(np.diff(slopes))
+    return widths * (bends[:-1] + bends[1:]) / 2 + (spreads[:-1] + spreads[1:]) / 2
+
+
+def adaptive_sweep(
+    model, budget, initial=5, runs=3, min_spacing=1.0, batch=1, processes=1
+):
+    """
+    Sweeps the densities between the smallest and the largest of
+    ``model.density_values`` adaptively, with ``runs`` independent runs per
+    density and at most ``budget`` simulations in total. The sweep starts with
+    ``initial`` evenly spaced densities and adds ``batch`` densities at a time
+    (which are simulated on ``processes`` processes) in the intervals with the
+    highest ``interval_scores``. Intervals narrower than ``2 * min_spacing``
+    veh/km are not split any further.
+
+    Returns the sorted densities and, for every run and density, the
+    ``(flow, mean_speed, steps, profile)`` of its simulation.
+    """
+    if budget < initial * runs:
+        raise ValueError(
+            f"A budget of {budget} simulations is too small for the initial grid"
+        )
+    low, high = np.min(model.density_values), np.max(model.density_values)
+    results = {}
+
+    def simulate(densities):
+        tasks = []
+        for density in densities:
+            seeds = density_seeds(model.seed, len(results), runs)
+            results[density] = None
+            tasks += [(model, idx, density, density, seeds[idx]) for idx in range(runs)]
+        for idx, density, flow, mean_speed, steps, profile in simulate_tasks(
+            tasks, processes
+        ):
+            if results[density] is None:
+                results[density] = [None] * runs
+            results[density][idx] = (flow, mean_speed, steps, profile)
+
+    simulate([float(density) for density in np.linspace(low, high, initial)])
+    while len(results) * runs + runs <= budget:
+        densities = sorted(results)
+        scores = interval_scores(
+            np.array(densities),
+            [[flow for flow, *_ in results[density]] for density in densities],
+        )
+        scores[np.diff(densities) < 2 * min_spacing] = -np.inf
+        count = min(batch, (budget - len(results) * runs) // runs)
+        split = [i for i in np.argsort(-scores, kind="stable")[:count]]
+        split = [i for i in split if scores[i] > -np.inf]
+        if len(split) == 0:
+            break
+        simulate([(densities[i] + densities[i + 1]) / 2 for i in split])
+
+    densities = sorted(results)
+    return np.array(densities), [
+        [results[density][idx] for density in densities] for idx in range(runs)
+    ]
+
+
+def t_cdf(t, df):
+    """
+    Returns the cumulative distribution function of Student's t-distribution
+    with an integer ``df`` degrees of freedom at ``t``, with the finite series
+    of Abramowitz and Stegun (26.7.3 and 26.7.4).
+    """
+    theta = math.atan(abs(t) / math.sqrt(df))
+    cos2 = math.cos(theta) ** 2
+    if df % 2 == 1:
+        term, total = math.cos(theta), 0.0
+        for k in range(1, (df - 1) // 2 + 1):
+            total += term
+            term *= cos2 * 2 * k / (2 * k + 1)
+        inside = 2 / math.pi * (theta + math.sin(theta) * total)
+    else:
+        term, total = 1.0, 0.0
+        for k in range(1, df // 2 + 1):
+            total += term
+            term *= cos2 * (2 * k - 1) / (2 * k)
+        inside = math.sin(theta) * total
+    # ``inside`` is the probability of a value between -|t| and |t|
+    return (1 + math.copysign(inside, t)) / 2
+
+
+def t_quantile(p, df):
+    """
+    Returns the ``p`` quantile of Student's t-distribution with ``df`` degrees
+    of freedom, with the Cornish-Fisher expansion around the normal quantile.
+    The expansion is accurate to three decimals from three degrees of freedom
+    on, below 30 degrees of freedom (where the runs of a density usually are)
+    it is refined with Newton's method on ``t_cdf`` to the exact quantile.
+    """
+    if p < 0.5:
+        return -t_quantile(1 - p, df)
+    z = NormalDist().inv_cdf(p)
+    t = (
+        z
+        + (z**3 + z) / (4 * df)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+        + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z)
+        / (92160 * df**4)
+    )
+    if df >= 30:
+        return t
+    # the density of the distribution at 0, it falls off with (1 + t^2/df)
+    gamma_ratio = math.exp(math.lgamma((df + 1) / 2) - math.lgamma(df / 2))
+    scale = gamma_ratio / math.sqrt(df * math.pi)
+    for _ in range(100):
+        # the distribution function is concave for t > 0, so after the first
+        # step every step is short of the quantile and they do not overshoot
+        density = scale * (1 + t * t / df) ** (-(df + 1) / 2)
+        step = (p - t_cdf(t, df)) / density
+        t += step
+        if abs(step) <= 1e-12 * t:
+            break
+    return t
+
+
+def confidence_interval(values, confidence=0.95):
+    """
+    Returns the mean of ``values`` and the width of its confidence interval.
+    NaN values (the mean speed of an empty track) are left out, without any
+    other values the mean is NaN and the width 0.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, 0.0
+    if len(values) == 1:
+        return float(values[0]), np.inf
+    spread = np.std(values, ddof=1) / np.sqrt(len(values))
+    width = 2 * t_quantile((1 + confidence) / 2, len(values) - 1) * spread
+    return float(np.mean(values)), float(width)
+
+
+def adaptive_runs(
+    model,
+    flow_width,
+    speed_width,
+    min_runs=5,
+    max_runs=50,
+    confidence=0.95,
+    batch=1,
+    processes=1,
+):
+    """
+    Simulates every density of ``model.density_values`` until the confidence
+    intervals of its mean flow and mean speed are at most ``flow_width`` and
+    ``speed_width`` wide, or it has ``max_runs`` runs. Every density starts
+    with ``min_runs`` runs and gets ``batch`` more at a time, the runs of all
+    densities that need them are simulated together on ``processes``
+    processes. Run ``idx`` of a density has the same seed as in ``Model.run``
+    with ``total_runs`` at ``max_runs``.
+
+    Returns, for every density, the ``(flow, mean_speed, steps, profile)`` of
+    its runs, and a summary of every density: a dict with its ``density``,
+    its amount of ``runs`` and the mean and the achieved confidence interval
+    width of the flow and the mean speed, ``flow_mean``, ``flow_width``,
+    ``speed_mean`` and ``speed_width``.
+    """
+    if min_runs < 2:
+        raise ValueError("A confidence interval needs at least two runs")
+    densities = list(model.density_values)
+    seeds = task_seeds(model.seed, max_runs, len(densities))
+    results = [[] for _ in densities]
+
+    def summary(j):
+        flow_mean, flow_ci = confidence_interval(
+            [flow for flow, *_ in results[j]], confidence
+        )
+        speed_mean, speed_ci = confidence_interval(
+            [speed for _, speed, *_ in results[j]], confidence
+        )
+        return {
+            "density": float(densities[j]),
+            "runs": len(results[j]),
+            "flow_mean": flow_mean,
+            "flow_width": flow_ci,
+            "speed_mean": speed_mean,
+            "speed_width": speed_ci,
+        }
+
+    def converged(j):
+        if len(results[j]) < min_runs:
+            return False
+        if len(results[j]) >= max_runs:
+            return True
+        stats = summary(j)
+        return stats["flow_width"] <= flow_width and stats["speed_width"] <= speed_width
+
+    pending = list(range(len(densities)))
+    while pending:
+        tasks = []
+        for j in pending:
+            done = len(results[j])
+            count = min_runs - done if done < min_runs else batch
+            count = min(count, max_runs - done)
+            tasks += [
+                (model, idx, j, densities[j], seeds[idx][j])
+                for idx in range(done, done + count)
+            ]
+        for idx, j, flow, mean_speed, steps, profile in simulate_tasks(
+            tasks, processes
+        ):
+            results[j].append((flow, mean_speed, steps, profile))
+        pending = [j for j in pending if not converged(j)]
+    return results, [summary(j) for j in range(len(densities))]
@@ -0,0 +1,412 @@
+import numpy as np
+from .track_interface import parse_vehicle_mix
+from .vector_track import PARAMETERS, VectorTrack
+
+
+class BatchedTrack(VectorTrack):
+    """
+    Many independent tracks ("rings"), for example all runs and densities of a
+    sweep, simulated at once in the same NumPy arrays. Every car has the id
+    of its ring, and the arrays are kept sorted on (ring, lane, position), so
+    the cars of a lane of a ring are a contiguous segment and the car in
+    front is found without a loop over the rings.
+
+    Every ring has its own random generator and draws from it exactly like a
+    ``VectorTrack`` of its own would, so every ring gives the same results as
+    simulating it on its own with the same seed. Only the car following of
+    ``VectorTrack`` is reused. The cars move around in the arrays when they
+    are sorted, so every car keeps its vehicle id in ``vehicle_id``, which is
+    its id in its own ring plus the start of the ring.
+    """
+
+    def __init__(
+        self,
+        lane_count=2,
+        length=2000,
+        dt=1.0,
+        central_control=False,
+        max_accel=1,
+        speed_push=0.5,
+        profiler=None,
+    ):
+        super().__init__(
+            lane_count=lane_count,
+            length=length,
+            dt=dt,
+            central_control=central_control,
+            max_accel=max_accel,
+            speed_push=speed_push,
+            profiler=profiler,
+        )
+        self.rngs = []
+        self.ring = np.zeros(0, dtype=np.intp)
+        self.vehicle_id = np.zeros(0, dtype=np.intp)
+        # the cars of ring r are at ring_start[r]:ring_start[r + 1]
+        self.ring_start = np.zeros(1, dtype=np.intp)
+
+    def init_rings(self, densities, rngs, vehicle_mix=None):
+        """
+        Creates a ring for every density, initialised with its generator from
+        ``rngs`` and the vehicle classes of ``vehicle_mix`` like
+        ``VectorTrack.init_cars`` does.
+        """
+        tracks = []
+        for density, rng in zip(densities, rngs):
+            track = VectorTrack(
+                lane_count=self.lanes_count,
+                length=self.length,
+                dt=self.dt,
+                rng=rng,
+            )
+            track.init_cars(density, vehicle_mix=vehicle_mix)
+            tracks.append(track)
+        sizes = [len(track.position) for track in tracks]
+        self.allocate(sum(sizes))
+        self.vehicle_types, self.class_fractions = parse_vehicle_mix(vehicle_mix)
+        self.rngs = list(rngs)
+        self.ring = np.repeat(np.arange(len(tracks)), sizes)
+        self.ring_start = np.concatenate([[0], np.cumsum(sizes)]).astype(np.intp)
+        self.vehicle_id = np.zeros(sum(sizes), dtype=np.intp)
+        for r, track in enumerate(tracks):
+            # the cars of a ring in the order of its lanes
+            ids = np.concatenate(track.lane_order)
+            block = slice(self.ring_start[r], self.ring_start[r + 1])
+            self.position[block] = track.position[ids]
+            self.current_speed[block] = track.current_speed[ids]
+            self.lane[block] = track.lane[ids]
+            self.vehicle_class[block] = track.vehicle_class[ids]
+            self.vehicle_id[block] = self.ring_start[r] + ids
+        self.set_parameters()
+
+    @property
+    def ring_count(self):
+        return len(self.rngs)
+
+    def segments(self):
+        """Returns the (ring, lane) segment of every car, in sorted order."""
+        return self.ring * self.lanes_count + self.lane
+
+    def ring_lane_sizes(self):
+        """Returns the amount of cars in every lane of every ring."""
+        sizes = np.bincount(
+            self.segments(), minlength=self.ring_count * self.lanes_count
+        )
+        return sizes.reshape(self.ring_count, self.lanes_count)
+
+    def lane_sizes(self):
+        """Returns the amount of cars in every lane, summed over the rings."""
+        return list(self.ring_lane_sizes().sum(axis=0))
+
+    def mean_speeds(self):
+        """Returns the mean speed of every ring, like ``VectorTrack.mean_speed``."""
+        return np.array(
+            [
+                np.mean(self.current_speed[self.ring_start[r] : self.ring_start[r + 1]])
+                for r in range(self.ring_count)
+            ]
+        )
+
+    def mean_speed(self):
+        """Returns the mean of the current speed of all cars of all rings."""
+        return np.mean(self.current_speed)
+
+    def lane_state(self, lane, ring=0):
+        """
+        Returns the sorted positions and the speeds of the cars of a lane of
+        the ring ``ring``, like ``VectorTrack.lane_state``.
+        """
+        segment = self.segments()
+        target = ring * self.lanes_count + lane
+        start = np.searchsorted(segment, target, side="left")
+        end = np.searchsorted(segment, target, side="right")
+        return self.position[start:end], self.current_speed[start:end]
+
+    # The rings are set up at once by ``init_rings``, and the cars can not be
+    # added or removed afterwards, their ids are kept per ring in the arrays.
+
+    def init_cars(self, density=10, equal_lanes=False, vehicle_mix=None):
+        raise NotImplementedError(
+            "A BatchedTrack is initialised with init_rings, one density per ring"
+        )
+
+    def set_density(self, density):
+        raise NotImplementedError(
+            "The rings of a BatchedTrack can not change their density"
+        )
+
+    def add_car(self, lane, position, speed, vehicle_class=None):
+        raise NotImplementedError("Cars can not be added to a BatchedTrack")
+
+    def remove_car(self, lane, slot):
+        raise NotImplementedError("Cars can not be removed from a BatchedTrack")
+
+    def _reorder(self, order):
+        """Puts the cars, and all their state and parameters, in ``order``."""
+        names = ["position", "current_speed", "next_speed", "acceleration", "lane"]
+        names += ["vehicle_id", "vehicle_class"]
+        for name in names + list(PARAMETERS):
+            setattr(self, name, getattr(self, name)[order])
+
+    def _sort(self, *keys):
+        """
+        Sorts the cars on (segment, position) if any segment is out of order,
+        which only happens after an overtake. Like ``VectorTrack.update_lanes``
+        the sort is stable, ``keys`` are the tie-breakers before that.
+        """
+        segment = self.segments()
+        same = segment[1:] == segment[:-1]
+        unsorted = same & (self.position[1:] < self.position[:-1])
+        if not np.any(unsorted):
+            return
+        self.profiler.count("lane sorts", len(np.unique(segment[1:][unsorted])))
+        self._reorder(np.lexsort(keys + (self.position, segment)))
+
+    def _leaders(self):
+        """
+        Returns the car in front of every car in its own lane, the first car
+        with a larger position or the first car of the lane, like
+        ``Lane.front``.
+        """
+        n = len(self.position)
+        segment = self.segments()
+        start = np.searchsorted(segment, segment, side="left")
+        end = np.searchsorted(segment, segment, side="right")
+        # the cars with the same position as the ones before them are skipped
+        new_run = np.ones(n, dtype=bool)
+        new_run[1:] = (segment[1:] != segment[:-1]) | (
+            self.position[1:] != self.position[:-1]
+        )
+        run_end = np.append(np.flatnonzero(new_run)[1:], n)
+        front = run_end[np.cumsum(new_run) - 1]
+        return np.where(front < end, front, start)
+
+    def _neighbours(self, ids, lane_i):
+        """
+        Returns the cars in front of and behind the cars ``ids`` in the lane
+        ``lane_i`` of their own ring, wrapping around like ``Lane.front`` and
+        ``Lane.back``, and -1 where that lane is empty.
+        """
+        segment = self.segments()
+        target = self.ring[ids] * self.lanes_count + lane_i
+        start = np.searchsorted(segment, target, side="left")
+        end = np.searchsorted(segment, target, side="right")
+        # complex numbers are ordered on their real part first, which makes
+        # this a binary search within the segments
+        keys = segment + 1j * self.position
+        query = target + 1j * self.position[ids]
+        front = np.searchsorted(keys, query, side="right")
+        front = np.where(front == end, start, front)
+        back = np.searchsorted(keys, query, side="left") - 1
+        back = np.where(back < start, end - 1, back)
+        empty = start == end
+        front[empty] = -1
+        back[empty] = -1
+        return front, back
+
+    def _can_switch_lane(self, ids, lane_i):
+        """
+        ``VectorTrack._can_switch_lane`` in the lane ``lane_i`` of the ring of
+        every car, the car in front is -1 where that lane is empty.
+        """
+        if not 0 <= lane_i < self.lanes_count:
+            # No lane here
+            return np.zeros(len(ids), dtype=bool), None
+        car_front, car_behind = self._neighbours(ids, lane_i)
+        empty = car_front < 0
+        pos = self.position[ids]
+        length = self.veh_length[ids]
+        front_pos = self.position[car_front]
+        front_end = front_pos - self.veh_length[car_front]
+        can_switch = np.where(
+            car_front == car_behind,
+            (pos < front_end) | (pos - length > front_pos),
+            ~(pos > front_end) & ~(pos - length < self.position[car_behind]),
+        )
+        # Lane is empty
+        can_switch[empty] = True
+        return can_switch, car_front
+
+    def switch_lanes(self, ids, count):
+        """
+        Moves the cars ``ids`` by their entry in ``count``. Like ``np.insert``
+        in ``VectorTrack.switch_lanes``, a car that arrives goes behind the
+        cars that already were at the same position.
+        """
+        moving = count != 0
+        if not np.any(moving):
+            return
+        self.profiler.count("lane switches made", int(np.count_nonzero(moving)))
+        self.lane[ids[moving]] += count[moving]
+        arrived = np.zeros(len(self.position), dtype=bool)
+        arrived[ids[moving]] = True
+        self._reorder(np.lexsort((arrived, self.position, self.segments())))
+
+    def lane_switches(self):
+        for i in range(self.lanes_count):
+            ids = np.flatnonzero(self.lane == i)
+            if len(ids) == 0:
+                continue
+            can_go_left, _ = self._can_switch_lane(ids, i + 1)
+            can_go_right, car_front_right = self._can_switch_lane(ids, i - 1)
+
+            # the decision of VehicleAgent.traditional_lane_switch
+            car_front, _ = self._neighbours(ids, i)
+            pos = self.position[ids]
+            speed = self.current_speed[ids]
+            speed_difference = self.current_speed[car_front] - speed
+            gap = (self.position[car_front] - pos) % self.length
+            # Car in front is close and slow enough the passing lane is preferred.
+            passing = (speed_difference < -5.0) & (gap < speed * 5.0)
+            if car_front_right is None:
+                far_right = np.ones(len(ids), dtype=bool)
+            else:
+                # Slow lane is empty, or the next car in it is far enough away
+                gap_fr = (self.position[car_front_right] - pos) % self.length
+                far_right = (car_front_right < 0) | (gap_fr > 200)
+            count = np.where(
+                passing,
+                np.where(can_go_left, 1, 0),
+                np.where(can_go_right & far_right, -1, 0),
+            )
+            self.profiler.count("lane switches considered", len(ids))
+            self.profiler.count("leader lookups", len(ids))
+            self.switch_lanes(ids, count)
+
+    def lane_switches_central(self, prefered_per_lane):
+        """
+        ``VectorTrack.lane_switches_central`` for every ring,
+        ``prefered_per_lane`` holds the preferred amount of cars in every lane
+        of every ring.
+        """
+        for lane_i in range(self.lanes_count):
+            sizes = self.ring_lane_sizes()[:, lane_i]
+            crowded = sizes > prefered_per_lane[:, lane_i]
+            ids = np.flatnonzero((self.lane == lane_i) & crowded[self.ring])
+            if len(ids) == 0:
+                continue
+            can_go_left, _ = self._can_switch_lane(ids, lane_i + 1)
+            can_go_right, _ = self._can_switch_lane(ids, lane_i - 1)
+            count = np.where(can_go_left, 1, np.where(can_go_right, -1, 0))
+            # a random choice for every car, used when it can go either way
+            choices = np.concatenate(
+                [
+                    self.rngs[r].integers(0, 2, size=sizes[r])
+                    for r in np.flatnonzero(crowded)
+                ]
+            )
+            both = can_go_left & can_go_right
+            count[both] = np.where(choices[both] == 0, 1, -1)
+            # only the first cars above the preferred amount of their ring
+            # leave the lane, ranked by how many cars of the ring move before
+            ring = self.ring[ids]
+            moving = count != 0
+            before = np.cumsum(moving)
+            start = np.searchsorted(ring, ring)
+            rank = before - (before[start] - moving[start])
+            excess = sizes - prefered_per_lane[:, lane_i]
+            count[rank > excess[ring]] = 0
+            self.profiler.count("lane switches considered", len(ids))
+            self.profiler.count("leader lookups", len(ids))
+            self.switch_lanes(ids, count)
+
+    def calculate_next_state(self):
+        ids = np.arange(len(self.position))
+        self.profiler.count("leader lookups", len(ids))
+        leader = self._leaders()
+        # leaders which were already visited use their new acceleration
+        wrapped = leader < ids
+
+        alone = leader == ids
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = (self.position[leader] - self.position) % self.length
+            gap = np.maximum(0, gap - self.veh_length[leader])
+            gap[alone] = np.inf
+            vL = np.where(alone, np.inf, self.current_speed[leader])
+            aL = np.where(alone, np.inf, self.acceleration[leader])
+
+            self.acceleration = self.compute_decision(ids, gap, vL, aL)
+            if np.any(wrapped):
+                aL[wrapped] = self.acceleration[leader[wrapped]]
+                self.acceleration[wrapped] = self.compute_decision(
+                    ids[wrapped], gap[wrapped], vL[wrapped], aL[wrapped]
+                )
+
+            v_safe = self.compute_safe_speed(ids, gap, vL)
+            # fmin ignores the NaN safe speed of a car that is alone in its lane
+            v_ideal = np.fmin(
+                np.minimum(
+                    self.max_speed, self.current_speed + self.acceleration * self.dt
+                ),
+                v_safe,
+            )
+
+            # the noise of every car for this step, every ring from its own
+            # generator
+            noise = np.empty(len(ids))
+            for r, rng in enumerate(self.rngs):
+                block = slice(self.ring_start[r], self.ring_start[r + 1])
+                noise[block] = rng.random(self.ring_start[r + 1] - self.ring_start[r])
+            if not self.central_control:
+                self.next_speed = np.maximum(0, v_ideal - self.b * noise)
+                return
+
+            next_speed = np.maximum(0, v_ideal - self.b * 0.5)
+            mean_speed = np.empty(len(ids))
+            segment = self.segments()
+            bounds = np.flatnonzero(np.diff(segment)) + 1
+            for start, end in zip(
+                np.concatenate([[0], bounds]), np.append(bounds, len(ids))
+            ):
+                # summed like ``Track`` does, so both agree to the last bit
+                lane_speeds = self.current_speed[start:end].tolist()
+                mean_speed[start:end] = sum(lane_speeds) / (end - start)
+            dif_speed = np.clip(
+                mean_speed - next_speed, -self.max_accel, self.max_accel
+            )
+            next_speed += dif_speed
+            # if with these speeds there is a collision in 3 seconds don't try and increase the average mean_speed
+            push = 0 < gap + 3 * (vL - next_speed)
+            push &= noise < self.AC
+            next_speed[push] += self.speed_push
+            self.next_speed = next_speed
+
+    def update_state(self):
+        self.current_speed[:] = self.next_speed
+        self.position += self.current_speed * self.dt
+        self._sort()
+
+    def apply_periodic_boundary(self):
+        """
+        Moves every car that drove past the end of the track back to the start
+        and returns the amount of cars that crossed the end of every ring.
+        """
+        crossed = self.position >= self.length
+        self.position[crossed] -= self.length
+        crossings = np.bincount(self.ring[crossed], minlength=self.ring_count)
+        if np.any(crossed):
+            # the cars that crossed become the first ones of their lane, like
+            # the roll of ``VectorTrack.update_lanes``
+            self._reorder(np.lexsort((~crossed, self.segments())))
+            self._sort()
+        return crossings
+
+    def vehicle_classes(self):
+        """Returns the vehicle class of every car, indexed by vehicle id."""
+        classes = np.empty_like(self.vehicle_class)
+        classes[self.vehicle_id] = self.vehicle_class
+        return classes
+
+    def snapshot(self):
+        """
+        Returns the ``(position, lane, speed)`` of the cars of all rings as
+        arrays indexed by vehicle id, the cars of ring ``r`` are at
+        ``ring_start[r]:ring_start[r + 1]``. Unlike ``VectorTrack.snapshot``
+        the arrays are copies.
+        """
+        position = np.empty_like(self.position)
+        lane = np.empty_like(self.lane)
+        speed = np.empty_like(self.current_speed)
+        position[self.vehicle_id] = self.position
+        lane[self.vehicle_id] = self.lane
+        speed[self.vehicle_id] = self.current_speed
+        return position, lane, speed
@@ -8,7 +8,8 @@ displayed interactively.
 
 INPUT:
 ------
-1. Two CSV files containing vehicle data with the following columns:
+1. Two data files exported by the model (.csv, .npz, .feather or .parquet)
+   containing vehicle data with the following columns:
    - car_id: Unique identifier for each vehicle
    - timestep: Time at which the measurements are recorded
    - alpha: Arc length around the circular track (range [0, CIRCUMFERENCE))
@@ -18,9 +19,9 @@ INPUT:
 
 FUNCTIONALITY:
 --------------
-1. Reads the two input CSV files as Pandas DataFrames.
+1. Reads the two input data files as Pandas DataFrames.
 2. Calculates positions in Cartesian coordinates (x, y) from (alpha, lane) on a
-   circular track.
+   circular track, for all rows at once, and groups the rows per timestep.
 3. Creates a figure with two subplots, each showing animated car positions for
    a given dataset.
 4. Uses Matplotlib's FuncAnimation to animate the positions over time.
@@ -41,14 +42,35 @@ If you want to run the file from the src directory directly:
 - python3 circular_animation.py <data_file1.csv> <data_file2.csv> <output.gif>
 Or if you want to run it from the root directory as a module:
 - python3 -m src.circular_animation <data_file1.csv> <data_file2.csv> <output.gif>
+
+Options:
+- --headless: only save the animation, without a window. The frames are
+  rendered by --processes worker processes (0 for all cores) and stitched
+  into a GIF with Pillow, or into an MP4 when the output ends with .mp4
+  (needs ffmpeg).
+- --every k: only animate every k-th timestep.
+- --fps f and --duration s: the frame rate of the output, and its length in
+  seconds (which picks f * s timesteps spread evenly over the run).
+For example, a 20 second poster animation on all cores:
+- python3 -m src.circular_animation data1.npz data2.npz out.gif --headless
+  --processes 0 --fps 10 --duration 20
 """
 
-import sys
-import pandas as pd
+import argparse
+import shutil
+import subprocess
+from multiprocessing import Pool
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 import matplotlib as mpl
+from PIL import Image
+
+try:
+    from .trajectory_io import read_trajectories
+except ImportError:
+    # run as a script from the src directory
+    from trajectory_io import read_trajectories
 
 ########################################
 # GLOBAL PARAMETERS
@@ -81,18 +103,56 @@ def alpha_to_xy(alpha, lane):
     y = r * np.sin(theta)
     return x, y
 
-def load_data(csv_path):
+def load_data(data_path):
     """
-    Load the CSV data into a Pandas DataFrame and sort timesteps.
-    Expected CSV columns: car_id, timestep, alpha, lane, speed.
+    Load the data into a Pandas DataFrame and sort timesteps.
+    The format follows from the extension: .csv, or the binary
+    .npz, .feather and .parquet files written by the model.
+    Expected columns: car_id, timestep, alpha, lane, speed.
     Returns:
       df: The entire DataFrame
       timesteps: Sorted list of unique timesteps
     """
-    df = pd.read_csv(csv_path)
+    df = read_trajectories(data_path)
     timesteps = sorted(df["timestep"].unique())
     return df, timesteps
 
+def prepare_frames(df):
+    """
+    Precompute everything the animation needs from a DataFrame, so drawing a
+    frame is only a slice of these arrays:
+      1) Sort the rows on timestep (stable, so the car order is kept).
+      2) Convert all (alpha, lane) pairs to (x, y) at once.
+      3) Find where the rows of every timestep start.
+    Returns a dict with:
+      timesteps: Sorted array of unique timesteps
+      offsets: The rows of timesteps[i] are xy[offsets[i]:offsets[i + 1]]
+      xy: (rows, 2) array of Cartesian coordinates
+      speed: The speed of every row, in the same order as xy
+    """
+    timestep = df["timestep"].to_numpy()
+    order = np.argsort(timestep, kind="stable")
+    timestep = timestep[order]
+    alpha = df["alpha"].to_numpy(dtype=float)[order]
+    x, y = alpha_to_xy(alpha, df["lane"].to_numpy()[order])
+    timesteps, starts = np.unique(timestep, return_index=True)
+    return {
+        "timesteps": timesteps,
+        "offsets": np.append(starts, len(timestep)),
+        "xy": np.column_stack((x, y)),
+        "speed": df["speed"].to_numpy()[order],
+    }
+
+def frame_rows(frames, timestep):
+    """
+    Return the slice of the precomputed rows that belong to a timestep,
+    which is empty when the data set has no rows at that timestep.
+    """
+    i = np.searchsorted(frames["timesteps"], timestep)
+    if i == len(frames["timesteps"]) or frames["timesteps"][i] != timestep:
+        return slice(0, 0)
+    return slice(frames["offsets"][i], frames["offsets"][i + 1])
+
 def setup_figure_and_axes(df1, df2):
     """
     Create a matplotlib figure with two subplots (ax1 and ax2),
@@ -179,50 +239,20 @@ def init_animation(scat1, scat2, time_text):
     # We return everything that needs to be re-drawn
     return (scat1, scat2, time_text)
 
-def update_animation(frame, df1, df2, objects, cmap, norm):
+def update_animation(frame, frames1, frames2, objects):
     """
     For each frame (timestep), update both subplots:
-      - Filter df1 for this timestep, convert (alpha, lane) to (x,y).
-      - Filter df2 for this timestep, convert (alpha, lane) to (x,y).
+      - Look up the rows of this timestep in the precomputed frames of
+        both data sets, which is a slice instead of a search.
       - Update each scatter (positions and colors).
       - Update time_text to show the current frame (timestep).
     """
     scat1, scat2, time_text = objects  # each is a PathCollection or Text
 
-    # --- Update subplot 1 ---
-    data_t1 = df1[df1["timestep"] == frame]
-    x_vals1 = []
-    y_vals1 = []
-    colors1 = []
-    for _, row in data_t1.iterrows():
-        x, y = alpha_to_xy(row["alpha"], row["lane"])
-        x_vals1.append(x)
-        y_vals1.append(y)
-        colors1.append(row["speed"])
-
-    if len(x_vals1) > 0:
-        scat1.set_offsets(np.column_stack((x_vals1, y_vals1)))
-        scat1.set_color(cmap(norm(colors1)))
-    else:
-        # Provide an empty 2D array
-        scat1.set_offsets(np.empty((0, 2)))
-
-    # --- Update subplot 2 ---
-    data_t2 = df2[df2["timestep"] == frame]
-    x_vals2 = []
-    y_vals2 = []
-    colors2 = []
-    for _, row in data_t2.iterrows():
-        x, y = alpha_to_xy(row["alpha"], row["lane"])
-        x_vals2.append(x)
-        y_vals2.append(y)
-        colors2.append(row["speed"])
-
-    if len(x_vals2) > 0:
-        scat2.set_offsets(np.column_stack((x_vals2, y_vals2)))
-        scat2.set_color(cmap(norm(colors2)))
-    else:
-        scat2.set_offsets(np.empty((0, 2)))
+    for scat, frames in ((scat1, frames1), (scat2, frames2)):
+        rows = frame_rows(frames, frame)
+        scat.set_offsets(frames["xy"][rows])
+        scat.set_color(frames["colors"][rows])
 
     # Update the time text #
     time_text.set_text(f"t = {frame}")
@@ -230,36 +260,30 @@ def update_animation(frame, df1, df2, objects, cmap, norm):
     # Return the updated artists
     return (scat1, scat2, time_text)
 
-def main():
+def build_figure(data_file1, data_file2):
     """
-    Main function to:
-      1) Parse command-line arguments.
-      2) Load two CSV data files.
-      3) Create a figure with two subplots (side by side).
-      4) Animate both subplots using FuncAnimation.
-      5) Save animation to a GIF file.
-      6) Show the figure window.
+    Load both data files and create the figure with the two (still empty)
+    scatter plots and the time text.
+    Returns:
+      fig: The figure
+      frames1, frames2: The precomputed frames of both data sets
+      objects: (scat1, scat2, time_text), the artists of the animation
+      all_timesteps: Sorted timesteps of both data sets combined
     """
-    if len(sys.argv) != 4:
-        print("Usage: python circular_animation.py <data_file1.csv>"
-              "<data_file2.csv> <output.gif>")
-        sys.exit(1)
-
-    data_file1 = sys.argv[1]
-    data_file2 = sys.argv[2]
-    output_file = sys.argv[3]
-
-    # 1) Load both data files
     df1, timesteps1 = load_data(data_file1)
     df2, timesteps2 = load_data(data_file2)
+    frames1 = prepare_frames(df1)
+    frames2 = prepare_frames(df2)
 
     # Combine all timesteps so both animations advance in lockstep
     all_timesteps = sorted(set(timesteps1) | set(timesteps2))
 
-    # 2) Create figure and axes for the two datasets
     fig, ax1, ax2, cmap, norm = setup_figure_and_axes(df1, df2)
+    # The colors of all rows are computed once as well
+    frames1["colors"] = cmap(norm(frames1["speed"]))
+    frames2["colors"] = cmap(norm(frames2["speed"]))
 
-    # 3) Create two empty scatter plots for the animation
+    # Two empty scatter plots for the animation
     scat1 = ax1.scatter([], [], c="red", s=15, alpha=0.8)
     scat2 = ax2.scatter([], [], c="blue", s=15, alpha=0.8)
 
@@ -271,21 +295,214 @@ def main():
         color="black",
         verticalalignment="top"
     )
+    return fig, frames1, frames2, (scat1, scat2, time_text), all_timesteps
+
+def select_timesteps(timesteps, every=1, frames=None):
+    """
+    Subsample the timesteps of the animation:
+      - every: only keep every k-th timestep
+      - frames: keep (at most) this many timesteps, evenly spread over the run
+    """
+    timesteps = list(timesteps)[::every]
+    if frames is not None and frames < len(timesteps):
+        idx = np.unique(np.linspace(0, len(timesteps) - 1, frames).round())
+        timesteps = [timesteps[int(i)] for i in idx]
+    return timesteps
+
+########################################
+# HEADLESS RENDERING
+########################################
+# Every worker process loads the data and builds its own figure once, then
+# renders the chunks of timesteps it is handed out.
+_worker = {}
+
+def _init_worker(data_file1, data_file2, output_format):
+    plt.switch_backend("Agg")
+    fig, frames1, frames2, objects, _ = build_figure(data_file1, data_file2)
+    # Like blitting: the static part of the figure is drawn only once,
+    # every frame only the animated artists are drawn on top of it
+    for artist in objects:
+        artist.set_animated(True)
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    _worker.update(
+        fig=fig, frames1=frames1, frames2=frames2, objects=objects,
+        background=background, output_format=output_format
+    )
+
+def render_frame(timestep):
+    """
+    Draw a single timestep in the figure of this worker and return it as an
+    image: a palette image for a GIF (quantizing is the slow part, so it is
+    done in the worker too), or an RGB array for an MP4.
+    """
+    update_animation(
+        timestep, _worker["frames1"], _worker["frames2"], _worker["objects"]
+    )
+    canvas = _worker["fig"].canvas
+    canvas.restore_region(_worker["background"])
+    for artist in _worker["objects"]:
+        artist.axes.draw_artist(artist)
+    rgb = np.asarray(canvas.buffer_rgba())[:, :, :3]
+    if _worker["output_format"] == "gif":
+        return Image.fromarray(rgb).quantize()
+    return rgb.copy()
+
+def _render_chunk(timesteps):
+    return [render_frame(timestep) for timestep in timesteps]
+
+def render_frames(data_file1, data_file2, timesteps, output_format,
+                  processes=1, chunk_size=25):
+    """
+    Render the timesteps in chunks of chunk_size frames, on a pool of
+    processes worker processes when it is not 1 (None uses all cores).
+    Yields the frames in order, while the workers go on rendering.
+    """
+    chunks = [
+        timesteps[i:i + chunk_size] for i in range(0, len(timesteps), chunk_size)
+    ]
+    if processes == 1:
+        _init_worker(data_file1, data_file2, output_format)
+        rendered = map(_render_chunk, chunks)
+        for chunk in rendered:
+            yield from chunk
+        return
+    with Pool(
+        processes,
+        initializer=_init_worker,
+        initargs=(data_file1, data_file2, output_format),
+    ) as pool:
+        for chunk in pool.imap(_render_chunk, chunks):
+            yield from chunk
+
+def write_gif(output_file, images, fps):
+    """Stitch the rendered palette images into a looping GIF with Pillow."""
+    images = list(images)
+    images[0].save(
+        output_file,
+        save_all=True,
+        append_images=images[1:],
+        duration=int(1000 / fps),
+        loop=0,
+    )
+
+def write_mp4(output_file, images, fps):
+    """Pipe the rendered RGB arrays into ffmpeg, one frame after the other."""
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is needed to write an MP4 file")
+    images = iter(images)
+    first = next(images)
+    height, width, _ = first.shape
+    command = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        # H.264 needs even dimensions
+        "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+        "-vcodec", "libx264", "-pix_fmt", "yuv420p",
+        output_file,
+    ]
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as ffmpeg:
+        ffmpeg.stdin.write(first.tobytes())
+        for image in images:
+            ffmpeg.stdin.write(image.tobytes())
+        ffmpeg.stdin.close()
+    if ffmpeg.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed with exit code {ffmpeg.returncode}")
+
+def render_headless(data_file1, data_file2, output_file, timesteps, fps=5,
+                    processes=1):
+    """
+    Render the animation without a window, in parallel when processes is
+    not 1, and save it as a GIF or, if output_file ends with .mp4, an MP4.
+    """
+    output_format = "mp4" if output_file.endswith(".mp4") else "gif"
+    images = render_frames(
+        data_file1, data_file2, timesteps, output_format, processes=processes
+    )
+    if output_format == "mp4":
+        write_mp4(output_file, images, fps)
+    else:
+        write_gif(output_file, images, fps)
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(
+        description="Animate two exported data sets side by side."
+    )
+    parser.add_argument("data_file1")
+    parser.add_argument("data_file2")
+    parser.add_argument("output_file", help="a .gif file, or .mp4 (headless)")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="only save the animation, without showing a window",
+    )
+    parser.add_argument(
+        "--every", type=int, default=1, help="only animate every k-th timestep"
+    )
+    parser.add_argument(
+        "--fps", type=float, default=5, help="frames per second of the output"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=None,
+        help="length of the animation in seconds, picks fps * duration frames",
+    )
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="worker processes rendering the frames when headless, 0 for all cores",
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Main function to:
+      1) Parse command-line arguments.
+      2) Load two data files.
+      3) Create a figure with two subplots (side by side).
+      4) Animate both subplots using FuncAnimation.
+      5) Save animation to a GIF file.
+      6) Show the figure window.
+    With --headless the frames are rendered without a window instead,
+    optionally by several processes, and stitched into a GIF or MP4.
+    """
+    args = parse_arguments(argv)
+    frames = None
+    if args.duration is not None:
+        frames = max(1, int(args.fps * args.duration))
+
+    if args.headless:
+        # Only the timesteps are needed here, the workers load the data
+        _, timesteps1 = load_data(args.data_file1)
+        _, timesteps2 = load_data(args.data_file2)
+        timesteps = select_timesteps(
+            sorted(set(timesteps1) | set(timesteps2)), args.every, frames
+        )
+        render_headless(
+            args.data_file1, args.data_file2, args.output_file, timesteps,
+            fps=args.fps, processes=args.processes or None,
+        )
+        print(f"Animation saved to {args.output_file}")
+        return
+
+    # 1-3) Load both data files and create the figure
+    fig, frames1, frames2, objects, all_timesteps = build_figure(
+        args.data_file1, args.data_file2
+    )
 
     # 4) Build the animation
     ani = animation.FuncAnimation(
         fig,
         func=update_animation,
-        frames=all_timesteps,
-        init_func=lambda: init_animation(scat1, scat2, time_text),
-        fargs=(df1, df2, (scat1, scat2, time_text), cmap, norm),
+        frames=select_timesteps(all_timesteps, args.every, frames),
+        init_func=lambda: init_animation(*objects),
+        fargs=(frames1, frames2, objects),
         blit=True,
-        repeat=True
+        repeat=True,
+        interval=1000 / args.fps,
     )
 
     # 5) Save the resulting GIF
-    ani.save(filename=output_file, writer="pillow")
-    print(f"Animation saved to {output_file}")
+    ani.save(filename=args.output_file, writer="pillow", fps=args.fps)
+    print(f"Animation saved to {args.output_file}")
 
     # 6) Show the figure window
     plt.show()
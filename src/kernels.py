@@ -0,0 +1,209 @@
+"""
+The car following of ``VehicleAgent`` as plain functions on numbers and
+arrays, compiled with Numba when it is installed. ``follow_lane`` updates a
+whole lane in one loop, in the same order and with the same arithmetic as
+``Track.calculate_next_state``, so it gives exactly the same results.
+
+Without Numba the functions run as ordinary Python, which gives the same
+results but is slower than the NumPy engine. ``HAVE_NUMBA`` tells which one
+is used.
+"""
+
+try:
+    from numba import njit
+
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        """Stands in for ``numba.njit`` and leaves the function as it is."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+@njit(cache=True)
+def acceleration_rate(vF):
+    """``VehicleAgent.acceleration_rate``."""
+    if vF <= 12.19:
+        return 1.1
+    return 0.37
+
+
+@njit(cache=True)
+def decceleration_rate(vF, vL, aL, gap, gap_desire, desired_speed, a_normal, a_max):
+    """``VehicleAgent.decceleration_rate``."""
+    # case 1: free flowing case
+    if vF > desired_speed:
+        aF = (vF - desired_speed) / 3
+        return a_normal if a_normal < aF else aF
+
+    # case 2: car-following regime, normal decceleration
+    if gap - gap_desire == 0:
+        if not vL >= vF:
+            return (vF * vF - vL * vL) / (2 * gap)
+
+    # case 3: emergency decceleration
+    if gap - gap_desire < 0:
+        if not vL > vF:
+            return aL - 0.25 * a_normal
+
+    # case 4: near-collision decceleration
+    if (
+        (gap - gap_desire > 0)
+        and (not vL >= vF)
+        and (not gap > 3 * vF)
+        and (not ((gap > 2 * vF) and (gap > 7.5)))
+    ):
+        aF = aL + ((vF - vL) * (vF - vL) / (2 * gap))
+        return a_max if a_max < aF else aF
+
+    return 0.0
+
+
+@njit(cache=True)
+def compute_decision(vF, vL, aL, gap, acceleration, desired_speed, a_normal, a_max, TP):
+    """
+    ``VehicleAgent.compute_decision``, returns the new acceleration of the
+    car, which is ``acceleration`` when none of the cases apply.
+    """
+    gap_desire = vF * TP
+    if gap < 6 * vF:
+        delta = gap - gap_desire
+        if delta > 0:
+            if vL >= vF or gap > 3 * vF:
+                return acceleration_rate(vF)
+            if (gap > 2 * vF) and (gap > 7.5):
+                return 0.0
+            return decceleration_rate(
+                vF, vL, aL, gap, gap_desire, desired_speed, a_normal, a_max
+            )
+        elif delta == 0:
+            if vL >= vF:
+                return 0.0
+            return decceleration_rate(
+                vF, vL, aL, gap, gap_desire, desired_speed, a_normal, a_max
+            )
+        elif delta < 0:
+            if vL > vF:
+                return 0.0
+            return decceleration_rate(
+                vF, vL, aL, gap, gap_desire, desired_speed, a_normal, a_max
+            )
+    else:
+        delta = vF - desired_speed
+        if delta < 0:
+            return acceleration_rate(vF)
+        elif delta == 0:
+            return 0.0
+        elif delta > 0:
+            return decceleration_rate(
+                vF, vL, aL, gap, gap_desire, desired_speed, a_normal, a_max
+            )
+    return acceleration
+
+
+@njit(cache=True)
+def compute_safe_speed(vF, vL, gap, a_max):
+    """``VehicleAgent.compute_safe_speed``."""
+    reaction_time = 1
+    return vL + (
+        (gap - vL * reaction_time) / (reaction_time + ((vF + vL) / (2 * a_max)))
+    )
+
+
+@njit(cache=True)
+def follow_lane(
+    lane,
+    position,
+    current_speed,
+    acceleration,
+    next_speed,
+    veh_length,
+    desired_speed,
+    max_speed,
+    a_normal,
+    a_max,
+    b,
+    TP,
+    AC,
+    noise,
+    length,
+    dt,
+    central_control,
+    max_accel,
+    speed_push,
+):
+    """
+    Computes the acceleration and the next speed of the cars ``lane`` (indices
+    into the state arrays, sorted on position), like
+    ``VehicleAgent.calculate_next_state`` does for every car of a lane. The
+    leader of a car is the first car with a larger position, like
+    ``Lane.front``, the last cars follow the first one, which already has
+    its new acceleration by then. ``noise`` holds the random number of every
+    car of the lane.
+    """
+    n = len(lane)
+    if n == 0:
+        return
+
+    mean_speed = 0.0
+    if central_control:
+        # summed in order, like ``Track`` does
+        for i in range(n):
+            mean_speed += current_speed[lane[i]]
+        mean_speed = mean_speed / n
+
+    for i in range(n):
+        car = lane[i]
+        vF = current_speed[car]
+        j = i + 1
+        while j < n and position[lane[j]] <= position[car]:
+            j += 1
+        leader = lane[j] if j < n else lane[0]
+        if leader == car:
+            # the car is alone in its lane
+            gap = vL = aL = float("inf")
+        else:
+            gap = (position[leader] - position[car]) % length - veh_length[leader]
+            if not gap > 0:
+                gap = 0.0
+            vL = current_speed[leader]
+            aL = acceleration[leader]
+
+        acceleration[car] = compute_decision(
+            vF,
+            vL,
+            aL,
+            gap,
+            acceleration[car],
+            desired_speed[car],
+            a_normal[car],
+            a_max[car],
+            TP[car],
+        )
+        v_safe = compute_safe_speed(vF, vL, gap, a_max[car])
+        # min() of Python, which skips a NaN safe speed
+        v_ideal = max_speed[car]
+        v = vF + acceleration[car] * dt
+        if v < v_ideal:
+            v_ideal = v
+        if v_safe < v_ideal:
+            v_ideal = v_safe
+
+        eta = 0.5 if central_control else noise[i]
+        speed = v_ideal - b[car] * eta
+        if not speed > 0:
+            speed = 0.0
+        if central_control:
+            dif_speed = mean_speed - speed
+            if dif_speed > max_accel:
+                dif_speed = max_accel
+            elif dif_speed < -max_accel:
+                dif_speed = -max_accel
+            speed += dif_speed
+            # if with these speeds there is a collision in 3 seconds don't try and increase the average mean_speed
+            if (0 < gap + 3 * (vL - speed)) and noise[i] < AC[car]:
+                speed += speed_push
+        next_speed[car] = speed
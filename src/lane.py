@@ -0,0 +1,199 @@
+from bisect import bisect_left, bisect_right
+from heapq import merge
+from operator import attrgetter, itemgetter, le
+
+
+class Lane:
+    """
+    The cars of a single lane, sorted on their position. Next to the cars the
+    lane keeps the sorted list of their positions, so the cars in front of and
+    behind any position are found with a binary search instead of a scan.
+
+    The cars are stored as a circular buffer: ``head`` is the index of the car
+    with the smallest position. When cars drive past the end of the track they
+    only have to be rotated to the start by moving the head, so the lane never
+    has to be sorted again as long as cars do not overtake each other.
+
+    ``key`` returns the position of a car. By default the cars are
+    ``VehicleAgent`` objects, but any other handle (for example an index into
+    an array of positions) can be used with a matching ``key``. The given cars
+    are assumed to be sorted, use ``sort`` otherwise.
+    """
+
+    def __init__(self, cars=(), key=attrgetter("position")):
+        self.key = key
+        self.cars = list(cars)
+        self.positions = [key(car) for car in self.cars]
+        self.head = 0
+
+    def __len__(self):
+        return len(self.cars)
+
+    def __getitem__(self, i):
+        n = len(self.cars)
+        if not -n <= i < n:
+            raise IndexError("lane index out of range")
+        return self.cars[(self.head + i) % n]
+
+    def __iter__(self):
+        # like iterating a list: removing the current car skips the next one
+        cars = self.cars
+        i = 0
+        while i < len(cars):
+            yield cars[(self.head + i) % len(cars)]
+            i += 1
+
+    def ordered(self):
+        """Returns the cars as a list sorted on position."""
+        return self.cars[self.head :] + self.cars[: self.head]
+
+    def sort(self):
+        """Sorts the cars on their current position and rebuilds the index."""
+        self.cars = self.ordered()
+        self.cars.sort(key=self.key)
+        self.positions = [self.key(car) for car in self.cars]
+        self.head = 0
+
+    def is_sorted(self):
+        """Returns whether the index is in sorted order."""
+        positions = self.positions[self.head :] + self.positions[: self.head]
+        return all(map(le, positions, positions[1:]))
+
+    def update(self, wrapped=0):
+        """
+        Brings the index up to date after the cars moved. ``wrapped`` is the
+        amount of cars at the end of the lane that were moved back to the start
+        of the track, they become the first cars by rotating the head.
+        Cars that overtook each other are put back in order, in which case
+        this returns True.
+        """
+        n = len(self.cars)
+        if n == 0:
+            return False
+        self.head = (self.head + n - wrapped) % n
+        self.positions = [self.key(car) for car in self.cars]
+        if not self.is_sorted():
+            # only happens after an overtake, which leaves the lane almost
+            # sorted, so this takes linear time
+            self.sort()
+            return True
+        return False
+
+    def _bisect(self, position, bisect):
+        """Binary search in the sorted order, returns a sorted index."""
+        n, head = len(self.cars), self.head
+        i = bisect(self.positions, position, head, n)
+        if i < n or head == 0:
+            return i - head
+        return n - head + bisect(self.positions, position, 0, head)
+
+    def front(self, position):
+        """
+        Returns the first car with a larger position, wrapping around to the
+        first car of the lane, or ``None`` if the lane is empty.
+        """
+        cars, positions, head = self.cars, self.positions, self.head
+        n = len(cars)
+        if n == 0:
+            return None
+        # the cars from the head onwards have the smallest positions
+        i = bisect_right(positions, position, head, n)
+        if i < n:
+            return cars[i]
+        i = bisect_right(positions, position, 0, head)
+        if i < head:
+            return cars[i]
+        return cars[head]
+
+    def back(self, position):
+        """
+        Returns the last car with a smaller position, wrapping around to the
+        last car of the lane, or ``None`` if the lane is empty.
+        """
+        cars, positions, head = self.cars, self.positions, self.head
+        n = len(cars)
+        if n == 0:
+            return None
+        # the cars before the head have the largest positions
+        i = bisect_left(positions, position, 0, head)
+        if i > 0:
+            return cars[i - 1]
+        i = bisect_left(positions, position, head, n)
+        if i > head:
+            return cars[i - 1]
+        return cars[head - 1]
+
+    def find(self, position):
+        """Returns the sorted index of the first car at exactly ``position``."""
+        i = self._bisect(position, bisect_left)
+        if i == len(self.cars) or self.key(self[i]) != position:
+            raise ValueError(f"No car at position {position}")
+        return i
+
+    def insert(self, car):
+        """Inserts the car at its sorted position."""
+        position = self.key(car)
+        n, head = len(self.cars), self.head
+        i = self._bisect(position, bisect_right)
+        if head == 0 or i < n - head:
+            j = head + i
+        else:
+            # the car goes in front of the head, which moves up by one
+            j = i - (n - head)
+            self.head += 1
+        self.cars.insert(j, car)
+        self.positions.insert(j, position)
+
+    def insert_many(self, cars):
+        """
+        Inserts a batch of cars at their sorted positions, like calling
+        ``insert`` for each of them in turn. The lane is rebuilt once by
+        merging it with the sorted cars, which takes linear time instead of
+        shifting the list for every car.
+        """
+        if len(cars) == 0:
+            return
+        arrivals = sorted(((self.key(car), car) for car in cars), key=itemgetter(0))
+        head = self.head
+        lane = zip(self.positions[head:] + self.positions[:head], self.ordered())
+        # on equal positions the cars already in the lane stay in front
+        merged = list(merge(lane, arrivals, key=itemgetter(0)))
+        self.positions = [position for position, _ in merged]
+        self.cars = [car for _, car in merged]
+        self.head = 0
+
+    def pop(self, i):
+        """Removes the car at sorted index ``i`` and returns it."""
+        j = (self.head + i) % len(self.cars)
+        del self.positions[j]
+        car = self.cars.pop(j)
+        if j < self.head:
+            self.head -= 1
+        elif self.head == len(self.cars):
+            self.head = 0
+        return car
+
+    def remove_slots(self, slots):
+        """
+        Removes the cars at the given sorted indices, which have to be in
+        increasing order, and returns them in that order.
+        """
+        if len(slots) == 0:
+            return []
+        cars = self.ordered()
+        head = self.head
+        positions = self.positions[head:] + self.positions[:head]
+        # the lane is rebuilt once without the cars, in linear time
+        removed = set(slots)
+        keep = [i for i in range(len(cars)) if i not in removed]
+        self.positions = [positions[i] for i in keep]
+        self.cars = [cars[i] for i in keep]
+        self.head = 0
+        return [cars[i] for i in slots]
+
+    def remove(self, car):
+        """Removes the given car from the lane."""
+        i = self.find(self.key(car))
+        while self[i] != car:
+            i += 1
+        self.pop(i)
@@ -0,0 +1,106 @@
+"""
+Shows the cars of a running simulation on the circular track, without exporting
+anything to disk. The viewer reads the state straight from the track (``Track``
+or ``VectorTrack``) through ``track.snapshot()``. It redraws at most every
+``interval`` seconds of wall-clock time, however many simulation steps that
+is, so how often it draws does not depend on the timestep of the model.
+
+Usage, from the root directory:
+
+    model = Model(lane_count=2, engine="vector")
+    model.watch(density=60)
+"""
+
+import time
+import numpy as np
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+
+LANE_WIDTH = 10  # meters, the same as in circular_animation
+
+
+class LiveViewer:
+    """
+    Draws the cars of a track as a scatter plot coloured by speed.
+
+    - interval: the minimal time in seconds between two redraws
+    - max_overhead: the largest fraction of the time spent on drawing, when a
+      redraw takes longer than that the next one is postponed (None to always
+      redraw after the interval)
+    - max_speed: the speed at the top of the colour scale
+    """
+
+    def __init__(self, interval=0.5, max_overhead=0.05, max_speed=35, title=None):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_speed = max_speed
+        self.title = title
+        self.frames = 0  # the amount of redraws
+        self.next_draw = 0
+
+    def start(self, track):
+        """Creates the figure with the lanes of ``track`` and draws it once."""
+        self.length = track.length
+        self.base_radius = track.length / (2.0 * np.pi)
+
+        plt.ion()
+        self.fig, self.ax = plt.subplots(figsize=(6, 6))
+        if self.title is not None:
+            self.ax.set_title(self.title)
+        self.ax.set_aspect("equal", adjustable="box")
+        self.ax.set_xticks([])
+        self.ax.set_yticks([])
+        outer_radius = self.base_radius + (track.lanes_count - 1) * LANE_WIDTH
+        padding = 100
+        self.ax.set_xlim(-outer_radius - padding, outer_radius + padding)
+        self.ax.set_ylim(-outer_radius - padding, outer_radius + padding)
+
+        theta = np.linspace(0, 2 * np.pi, 360)
+        for lane in range(track.lanes_count):
+            r = self.base_radius + lane * LANE_WIDTH
+            self.ax.plot(
+                r * np.cos(theta), r * np.sin(theta), "--", color="gray", linewidth=0.5
+            )
+
+        norm = mpl.colors.Normalize(vmin=0, vmax=self.max_speed)
+        self.scatter = self.ax.scatter(
+            [], [], c=[], s=15, alpha=0.8, cmap="coolwarm", norm=norm
+        )
+        self.fig.colorbar(self.scatter, ax=self.ax, label="Speed (m/s)")
+        self.time_text = self.ax.text(
+            0.05, 0.95, "", transform=self.ax.transAxes, verticalalignment="top"
+        )
+        self.draw(track, 0)
+
+    def update(self, track, t):
+        """
+        Called after every simulation step, at time ``t``. Only redraws when
+        the interval has passed, otherwise this returns right away.
+        """
+        if time.perf_counter() >= self.next_draw:
+            self.draw(track, t)
+
+    def draw(self, track, t):
+        """Draws the current state of ``track``."""
+        start = time.perf_counter()
+        position, lane, speed = track.snapshot()
+        theta = 2.0 * np.pi * (position / self.length)
+        r = self.base_radius + lane * LANE_WIDTH
+        self.scatter.set_offsets(
+            np.column_stack((r * np.cos(theta), r * np.sin(theta)))
+        )
+        self.scatter.set_array(speed)
+        self.time_text.set_text(f"t = {t:g}")
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+        self.frames += 1
+
+        now = time.perf_counter()
+        wait = self.interval
+        if self.max_overhead is not None:
+            wait = max(wait, (now - start) / self.max_overhead)
+        self.next_draw = now + wait
+
+    def close(self):
+        """Stops the interactive mode, the window stays open until closed."""
+        plt.ioff()
@@ -1,8 +1,28 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from .track_interface import Track
-from itertools import chain
-import csv
+from .track_interface import Track, parse_vehicle_mix
+from .vector_track import VectorTrack, CompiledTrack
+from .batched_track import BatchedTrack
+from .runner import (
+    record_parallel,
+    run_parallel,
+    run_tasks,
+    simulate_tasks,
+    task_seeds,
+)
+from .adaptive import adaptive_runs, adaptive_sweep
+from .recorder import TrajectoryRecorder, StreamingRecorder
+from .trajectory_io import EXPORT_FORMATS, ChunkWriter, write_trajectories
+from .live_viewer import LiveViewer
+from .profiling import NULL_PROFILER, Profiler
+from .steady_state import MeasurementWindow, SteadyStateDetector
+
+# the available implementations of the track, see ``Model(engine=...)``
+TRACK_ENGINES = {
+    "agent": Track,
+    "vector": VectorTrack,
+    "compiled": CompiledTrack,
+}
 
 
 class Model(object):
@@ -15,6 +35,20 @@ class Model(object):
         central_control=False,
         max_accel=1,
         speed_push=0.5,
+        engine: str = "agent",
+        seed=None,
+        record_every: int = 1,
+        export_format: str = "csv",
+        stream_every=None,
+        background_writer=False,
+        profile=False,
+        steady_window=None,
+        steady_tolerance=0.05,
+        warmup_time=None,
+        measure_time=None,
+        warm_start_time=None,
+        store=None,
+        vehicle_mix=None,
     ) -> None:
         """
         The parameters of the simulation model are:
@@ -25,7 +59,43 @@ class Model(object):
         - central_control: if the central control model is used
         - mac_accel: the maximum acceleration to meet the mean speed of an agent
         - speed_push: the maximum acceleration added to push the average of the mean speed
-
+        - engine: "agent" simulates every car as a VehicleAgent object, "vector" keeps
+          the cars in NumPy arrays and updates them all at once (same results, faster),
+          "compiled" is "vector" with the car following compiled by Numba, if installed
+        - seed: the seed of all randomness in the simulations, a model with the same
+          seed gives the same results. A random seed is picked and stored in
+          ``self.seed`` when it is None, so any run can be replayed.
+        - record_every: when data is exported, only every record_every-th timestep
+          is recorded
+        - export_format: the file format of the exported data, "csv", or the much
+          smaller and faster "npz", "feather" or "parquet" (the last two need pyarrow)
+        - stream_every: when not None, the exported data is written to disk every
+          stream_every timesteps instead of kept in memory until the end
+        - background_writer: if the streamed data is written by a separate thread
+        - profile: if the time and the amount of calls of every phase of the simulation,
+          and counters like the amount of lane switches, are kept in profile_results
+        - steady_window: when not None, a simulation stops as soon as the flow and
+          the mean speed, averaged over windows of steady_window timesteps, are
+          stationary. The amount of timesteps used is kept in steps_results
+        - steady_tolerance: the relative difference between those windows that
+          still counts as stationary
+        - warmup_time: when not None, the first warmup_time seconds are not measured,
+          and the flow (veh/h) and the time-averaged mean speed are measured over the
+          measure_time seconds after it. With steady_window set as well, the warm-up
+          ends early once the simulation is stationary
+        - measure_time: the length of the measurement window, by default the rest of
+          total_time
+        - warm_start_time: when not None, every run sweeps the densities on a single
+          track, which starts each density from the state of the previous one with
+          cars added or removed, and is only warmed up for warm_start_time seconds.
+          Needs warmup_time, which is still used for the first density
+        - store: a results_store.ResultsStore, when given the results of every
+          simulation are saved in it, and simulations that are in it already are
+          not run again
+        - vehicle_mix: the fraction of the cars of every vehicle class, for example
+          {"car": 0.8, "truck": 0.15, "bus": 0.05}, see Agent.VEHICLE_CLASSES. The
+          classes may also be Agent.VehicleType objects. All cars are the same
+          when it is None
         """
 
         self.dt = dt
@@ -37,73 +107,512 @@ class Model(object):
         self.total_runs = 20  # In the paper they also did 20 runs for each density
         self.flow_results = [[] for _ in range(self.total_runs)]
         self.speed_results = [[] for _ in range(self.total_runs)]
+        # the amount of timesteps that were simulated, fewer than total_time / dt
+        # when a simulation stopped at a steady state
+        self.steps_results = [[] for _ in range(self.total_runs)]
+        # one report of profiling.Profiler per run and density, when profiling
+        self.profile_results = [[] for _ in range(self.total_runs)]
+        # the achieved confidence interval of every density, see adaptive_runs
+        self.ci_results = []
 
         # central control arguments
         self.central_control = central_control
         self.max_accel = max_accel
         self.speed_push = speed_push
 
+        if engine not in TRACK_ENGINES:
+            raise ValueError(f"Unrecognised engine '{engine}'")
+        self.engine = engine
+
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self.record_every = record_every
+
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unrecognised export format '{export_format}'")
+        self.export_format = export_format
+        self.stream_every = stream_every
+        self.background_writer = background_writer
+        self.profile = profile
+        self.steady_window = steady_window
+        self.steady_tolerance = steady_tolerance
+        if warmup_time is not None and measure_time is None:
+            measure_time = total_time - warmup_time
+        if measure_time is not None and measure_time <= 0:
+            raise ValueError("The measurement window must be longer than zero")
+        self.warmup_time = warmup_time
+        self.measure_time = measure_time
+        if warm_start_time is not None and warmup_time is None:
+            raise ValueError("A warm-start sweep needs a warmup_time")
+        self.warm_start_time = warm_start_time
+        self.store = store
+        # raises a ValueError for an unknown class or fractions that are not valid
+        parse_vehicle_mix(vehicle_mix)
+        self.vehicle_mix = vehicle_mix
+
     def run(self, idx, export_data=False) -> None:
         """
         A single run of the simulation. In total, we will perform 20 runs,
         which is also done in the paper which we wanted to validate our model with.
         """
 
-        for density in self.density_values:
-            # N is amount of vehicles
-            track = Track(
-                lane_count=self.lane_count,
-                length=self.road_length,
-                central_control=self.central_control,
-                max_accel=self.max_accel,
-                speed_push=self.speed_push,
+        # per multiple runs only ones will the data be exported
+        export_data = idx == 0 and export_data
+        if self.warm_start_time is not None:
+            results = run_tasks([(self, idx, export_data)], sweep=True)
+        else:
+            seeds = task_seeds(self.seed, self.total_runs, len(self.density_values))
+            results = simulate_tasks(
+                [
+                    (self, idx, j, density, seeds[idx][j], export_data)
+                    for j, density in enumerate(self.density_values)
+                ]
             )
-            track.init_cars(density)
+        for _, _, flow, mean_speed, steps, profile in results:
+            self.flow_results[idx].append(flow)
+            self.speed_results[idx].append(mean_speed)
+            self.steps_results[idx].append(steps)
+            if self.profile:
+                self.profile_results[idx].append(profile)
 
-            # USED FOR CENTRAL CONTROL ==============================================
-            total_cars = sum([len(lane) for lane in track.lanes_list])
-            # prefered amount of cars per lane
-            prefered_per_lane = [
-                total_cars // track.lanes_count for lane in range(len(track.lanes_list))
-            ]
-            for i in range(total_cars % track.lanes_count):
-                prefered_per_lane[i] += 1
-            # ======================================================================
-            total_crossings = (
-                0  # count the total crossings at a fixed reference point in time
+    def sweep(self, idx, export_data=False):
+        """
+        The warm-start sweep of run ``idx``: all densities are simulated in
+        order on the same track, which is only initialised with random cars
+        for the first density. Every next density starts from the state the
+        previous one ended in, with cars added or removed by
+        ``set_density``, and only has a warm-up of ``warm_start_time``. The
+        random generator of the run is seeded like the first density of
+        ``run``. Returns ``(flow, mean_speed, steps, profiler)`` per density.
+        """
+        seeds = task_seeds(self.seed, self.total_runs, len(self.density_values))
+        track = self.make_track(rng=np.random.default_rng(seeds[idx][0]))
+        track.init_cars(self.density_values[0], vehicle_mix=self.vehicle_mix)
+        results = []
+        for j, density in enumerate(self.density_values):
+            profiler = Profiler() if self.profile else None
+            flow, mean_speed, steps = self.simulate(
+                density,
+                export_data=export_data,
+                profiler=profiler,
+                track=track,
+                warmup_time=self.warmup_time if j == 0 else self.warm_start_time,
             )
-            time_data = []
-            for t in range(int(self.total_time / self.dt)):
-                time_data.append(t * self.dt)
-                # We don't need to run code that won't do anything
-                if self.lane_count > 1:
+            results.append((flow, mean_speed, steps, profiler))
+        return results
+
+    def car_count(self, density):
+        """Returns the amount of cars on the track at the given density (veh/km)."""
+        return int((self.road_length / 1000) * density)
+
+    def make_track(self, rng=None, profiler=None):
+        """Returns an empty track of the model's engine and settings."""
+        return TRACK_ENGINES[self.engine](
+            lane_count=self.lane_count,
+            length=self.road_length,
+            central_control=self.central_control,
+            max_accel=self.max_accel,
+            speed_push=self.speed_push,
+            rng=rng,
+            profiler=profiler,
+        )
+
+    def simulate(
+        self,
+        density,
+        export_data=False,
+        rng=None,
+        viewer=None,
+        profiler=None,
+        track=None,
+        warmup_time=None,
+        recorder=None,
+    ):
+        """
+        Simulates a track with the given density (veh/km) for ``total_time``
+        and returns the flow, the mean speed at the end of the simulation and
+        the amount of timesteps that were simulated.
+        ``rng`` is the numpy.random.Generator the simulation draws from, and
+        ``viewer`` an optional ``LiveViewer`` that shows the track while it runs.
+        A ``profiling.Profiler`` given as ``profiler`` records the time spent
+        in every phase of the steps.
+
+        With ``steady_window`` set, the simulation stops once it is at a steady
+        state. The flow is then the crossings so far plus the crossings of the
+        remaining time at the steady rate, so it can be compared with the flow
+        of a full simulation.
+
+        With ``warmup_time`` set, the flow is the crossings per hour and the mean
+        speed the time-averaged mean speed, both over the ``measure_time``
+        seconds after the warm-up. The warm-up ends at ``warmup_time``, or at a
+        steady state when ``steady_window`` is set, whichever comes first.
+
+        A ``track`` that is given is simulated from its current state, after
+        ``set_density`` brought it to the density, instead of a new track
+        (``rng`` is then not used). ``warmup_time`` overrides the one of the
+        model.
+
+        A ``TrajectoryRecorder`` given as ``recorder`` records the trajectories,
+        whether they are exported or not, instead of one made by the simulation.
+        It needs a column for every car, see ``car_count``.
+        """
+        if profiler is None:
+            profiler = NULL_PROFILER
+        if warmup_time is None:
+            warmup_time = self.warmup_time
+        if track is None:
+            track = self.make_track(rng=rng, profiler=profiler)
+            with profiler.phase("init cars"):
+                track.init_cars(density, vehicle_mix=self.vehicle_mix)
+        else:
+            track.profiler = profiler
+            with profiler.phase("init cars"):
+                track.set_density(density)
+
+        # USED FOR CENTRAL CONTROL ==============================================
+        total_cars = sum(track.lane_sizes())
+        # prefered amount of cars per lane
+        prefered_per_lane = [
+            total_cars // track.lanes_count for lane in range(track.lanes_count)
+        ]
+        for i in range(total_cars % track.lanes_count):
+            prefered_per_lane[i] += 1
+        # ======================================================================
+        total_crossings = (
+            0  # count the total crossings at a fixed reference point in time
+        )
+        steps = int(self.total_time / self.dt)
+        window = None
+        if warmup_time is not None:
+            warmup_steps = int(warmup_time / self.dt)
+            measure_steps = int(self.measure_time / self.dt)
+            # the longest the simulation can take, when the warm-up is not cut short
+            steps = warmup_steps + measure_steps
+            window = MeasurementWindow(self.dt)
+            # the step after which the measurement window ends, once it started
+            measure_end = measure_steps if warmup_steps == 0 else None
+        # the trajectories are only kept when they are exported or recorded
+        if recorder is None and export_data and self.stream_every is None:
+            recorder = TrajectoryRecorder(steps, total_cars, every=self.record_every)
+        elif recorder is None and export_data:
+            recorder = StreamingRecorder(
+                ChunkWriter(self.export_filename(track, density), self.export_format),
+                total_cars,
+                # the amount of recorded frames in stream_every timesteps
+                chunk=-(-self.stream_every // self.record_every),
+                every=self.record_every,
+                background=self.background_writer,
+            )
+        detector = None
+        if self.steady_window is not None:
+            detector = SteadyStateDetector(self.steady_window, self.steady_tolerance)
+        steps_used = steps
+        if viewer is not None:
+            viewer.start(track)
+        for t in range(steps):
+            if recorder is not None:
+                with profiler.phase("record"):
+                    recorder.record(t, t * self.dt, *track.snapshot())
+            # We don't need to run code that won't do anything
+            if self.lane_count > 1:
+                with profiler.phase("lane switches"):
                     if self.central_control:
                         track.lane_switches_central(prefered_per_lane)
                     else:
                         track.lane_switches()
+            with profiler.phase("next state"):
                 track.calculate_next_state()
+            with profiler.phase("update state"):
                 track.update_state()
 
-                for lane in track.lanes_list:
-                    for vehicle in lane:
-                        # Periodic boundary condition
-                        if vehicle.position >= self.road_length:
-                            vehicle.position -= self.road_length
-                            total_crossings += 1
+            # Periodic boundary condition
+            with profiler.phase("periodic boundary"):
+                crossings = track.apply_periodic_boundary()
+            total_crossings += crossings
+            if viewer is not None:
+                viewer.update(track, (t + 1) * self.dt)
+            if window is not None and measure_end is not None:
+                window.update(crossings, track.mean_speed())
+                if t + 1 == measure_end:
+                    steps_used = t + 1
+                    break
+            elif window is not None:
+                # the warm-up ends at warmup_time or at a steady state
+                if t + 1 == warmup_steps or (
+                    detector is not None
+                    and detector.update(crossings, track.mean_speed())
+                ):
+                    measure_end = t + 1 + measure_steps
+            elif detector is not None and detector.update(
+                crossings, track.mean_speed()
+            ):
+                steps_used = t + 1
+                break
 
+        if viewer is not None:
+            viewer.draw(track, steps_used * self.dt)
+            viewer.close()
+        if window is not None:
+            flow = window.flow()
+            mean_speed = window.mean_speed()
+        else:
             flow = total_crossings
-            mean_speed = np.mean(
-                [veh.current_speed for veh in chain(*track.lanes_list)]
+            if steps_used < steps:
+                flow += detector.flow_rate() * (steps - steps_used)
+            mean_speed = track.mean_speed()
+
+        with profiler.phase("export"):
+            if isinstance(recorder, StreamingRecorder):
+                recorder.close()
+            elif export_data:
+                self.export_data(recorder, track, density=density)
+        return flow, mean_speed, steps_used
+
+    def watch(self, density, interval=0.5, rng=None):
+        """
+        Simulates a single track with the given density while showing it in a
+        ``LiveViewer`` window, redrawn at most every ``interval`` seconds.
+        Returns the flow, the mean speed and the steps like ``simulate``.
+        """
+        viewer = LiveViewer(
+            interval=interval, title=f"{self.lane_count} lanes, {density} veh/km"
+        )
+        result = self.simulate(density, rng=rng, viewer=viewer)
+        plt.show()
+        return result
+
+    def run_parallel(self, processes=None, export_data=False) -> None:
+        """
+        Performs all ``total_runs`` runs for every density at once, spread over
+        a pool of ``processes`` worker processes (all cores by default). Every
+        (run, density) pair gets the same random seed as in ``run``, so the
+        results are identical to running every run one after another. The results
+        are stored in ``flow_results``, ``speed_results`` and ``steps_results``, in
+        the same shape as ``run``.
+        """
+        (
+            self.flow_results,
+            self.speed_results,
+            self.steps_results,
+            profile_results,
+        ) = run_parallel(self, processes=processes, export_data=export_data)
+        if self.profile:
+            self.profile_results = profile_results
+
+    def record_parallel(self, processes=None, every=None):
+        """
+        Simulates the first run of every density like ``run_parallel``, and
+        returns the trajectories of every density as a ``TrajectoryRecorder``.
+        The worker processes record into shared memory, so the trajectories are
+        not copied or written to disk to get them here. Only every ``every``-th
+        step is recorded, ``record_every`` by default.
+        """
+        return record_parallel(self, processes=processes, every=every)
+
+    def run_batched(self, stack_densities=True, export_data=False) -> None:
+        """
+        Simulates all ``total_runs`` runs of every density as the rings of a
+        single ``BatchedTrack``, or of one per density when ``stack_densities``
+        is False, so every step is a few NumPy operations on all cars instead
+        of one simulation after another. Every ring gets the seed of its run
+        and density in ``run``, so the results are the same as those of ``run``
+        with the "vector" engine, and are stored the same way. Steady states,
+        warm starts, exporting and profiling are not available in this mode, and
+        raise a ValueError.
+        """
+        if self.steady_window is not None:
+            raise ValueError("A batched run can not stop at a steady state")
+        if self.warm_start_time is not None:
+            raise ValueError("A batched run can not warm-start its densities")
+        if self.profile:
+            raise ValueError("A batched run can not be profiled")
+        if export_data:
+            raise ValueError("A batched run can not export or record trajectories")
+        densities = list(self.density_values)
+        seeds = task_seeds(self.seed, self.total_runs, len(densities))
+        tasks = [
+            (idx, j) for idx in range(self.total_runs) for j in range(len(densities))
+        ]
+        results = {}
+        if self.store is not None:
+            for idx, j in tasks:
+                cached = self.store.get(self, densities[j], seeds[idx][j])
+                if cached is not None:
+                    results[idx, j] = cached[:3]
+        pending = [task for task in tasks if task not in results]
+        if stack_densities:
+            batches = [pending]
+        else:
+            batches = [
+                [task for task in pending if task[1] == j]
+                for j in range(len(densities))
+            ]
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            batch_results = self.simulate_batch(
+                [densities[j] for _, j in batch],
+                [np.random.default_rng(seeds[idx][j]) for idx, j in batch],
             )
+            for (idx, j), result in zip(batch, batch_results):
+                results[idx, j] = result
+                if self.store is not None:
+                    self.store.put(self, densities[j], seeds[idx][j], idx, *result)
 
-            self.flow_results[idx].append(flow)
-            self.speed_results[idx].append(mean_speed)
-            # per multiple runs only ones will the data be exported
-            if idx == 0 and export_data:
-                self.export_data(time_data, track.lanes_list, density=density)
+        self.flow_results = [
+            [results[idx, j][0] for j in range(len(densities))]
+            for idx in range(self.total_runs)
+        ]
+        self.speed_results = [
+            [results[idx, j][1] for j in range(len(densities))]
+            for idx in range(self.total_runs)
+        ]
+        self.steps_results = [
+            [results[idx, j][2] for j in range(len(densities))]
+            for idx in range(self.total_runs)
+        ]
+
+    def simulate_batch(self, densities, rngs):
+        """
+        Simulates a ring for every density, with its generator from ``rngs``,
+        in one ``BatchedTrack`` and returns the ``(flow, mean_speed, steps)`` of
+        every ring, like ``simulate``.
+        """
+        track = BatchedTrack(
+            lane_count=self.lane_count,
+            length=self.road_length,
+            central_control=self.central_control,
+            max_accel=self.max_accel,
+            speed_push=self.speed_push,
+        )
+        track.init_rings(densities, rngs, vehicle_mix=self.vehicle_mix)
+
+        # USED FOR CENTRAL CONTROL, the prefered amount of cars per lane per ring
+        total_cars = track.ring_lane_sizes().sum(axis=1)
+        prefered_per_lane = np.repeat(
+            (total_cars // self.lane_count)[:, None], self.lane_count, axis=1
+        )
+        prefered_per_lane[
+            np.arange(self.lane_count)[None, :]
+            < (total_cars % self.lane_count)[:, None]
+        ] += 1
+
+        steps = int(self.total_time / self.dt)
+        warmup_steps = 0
+        if self.warmup_time is not None:
+            warmup_steps = int(self.warmup_time / self.dt)
+            steps = warmup_steps + int(self.measure_time / self.dt)
+        total_crossings = np.zeros(len(densities), dtype=int)
+        speed_sum = np.zeros(len(densities))
+        for t in range(steps):
+            if self.lane_count > 1:
+                if self.central_control:
+                    track.lane_switches_central(prefered_per_lane)
+                else:
+                    track.lane_switches()
+            track.calculate_next_state()
+            track.update_state()
+            crossings = track.apply_periodic_boundary()
+            if t >= warmup_steps:
+                total_crossings += crossings
+                if self.warmup_time is not None:
+                    speed_sum += track.mean_speeds()
+
+        if self.warmup_time is None:
+            flows = [int(crossings) for crossings in total_crossings]
+            mean_speeds = track.mean_speeds()
+        else:
+            # like ``MeasurementWindow``
+            measure_steps = steps - warmup_steps
+            flows = total_crossings * 3600 / (measure_steps * self.dt)
+            mean_speeds = speed_sum / measure_steps
+        return [
+            (float(flow) if self.warmup_time is not None else flow, speed, steps)
+            for flow, speed in zip(flows, mean_speeds)
+        ]
+
+    def adaptive_sweep(
+        self, budget=200, initial=5, runs=3, min_spacing=1.0, batch=1, processes=1
+    ):
+        """
+        Replaces the fixed grid of densities by an adaptive one between the
+        smallest and largest of ``density_values``, see ``adaptive.adaptive_sweep``:
+        densities are added where the slope of the flow changes the fastest or
+        the flow differs the most between the ``runs`` runs, until ``budget`` simulations are done.
+        Afterwards ``density_values`` holds the densities and ``total_runs`` is
+        ``runs``, and the results are stored like ``run`` does.
+        """
+        densities, results = adaptive_sweep(
+            self,
+            budget,
+            initial=initial,
+            runs=runs,
+            min_spacing=min_spacing,
+            batch=batch,
+            processes=processes,
+        )
+        self.density_values = densities
+        self.total_runs = runs
+        self.flow_results = [[flow for flow, *_ in run] for run in results]
+        self.speed_results = [[speed for _, speed, *_ in run] for run in results]
+        self.steps_results = [[steps for _, _, steps, _ in run] for run in results]
+        if self.profile:
+            self.profile_results = [[report for *_, report in run] for run in results]
 
-    def export_data(self, time_data, lanes_list, density):
-        """Exports the data of the position, speed, lane of every car in lanes_list into a csv file"""
+    def adaptive_runs(
+        self,
+        flow_width,
+        speed_width,
+        min_runs=5,
+        max_runs=50,
+        confidence=0.95,
+        batch=1,
+        processes=1,
+    ):
+        """
+        Simulates every density in ``density_values`` until the confidence
+        intervals of its mean flow and mean speed are at most ``flow_width``
+        and ``speed_width`` wide, with ``min_runs`` to ``max_runs`` runs per
+        density, see ``adaptive.adaptive_runs``. The achieved intervals are
+        stored in ``ci_results``. The results are stored like ``run`` does,
+        with ``total_runs`` the most runs of any density and NaN for the runs a
+        density did not need.
+        """
+        results, self.ci_results = adaptive_runs(
+            self,
+            flow_width,
+            speed_width,
+            min_runs=min_runs,
+            max_runs=max_runs,
+            confidence=confidence,
+            batch=batch,
+            processes=processes,
+        )
+        self.total_runs = max(len(runs) for runs in results)
+        missing = (np.nan, np.nan, np.nan, None)
+        results = [
+            [runs[idx] if idx < len(runs) else missing for runs in results]
+            for idx in range(self.total_runs)
+        ]
+        self.flow_results = [[flow for flow, *_ in run] for run in results]
+        self.speed_results = [[speed for _, speed, *_ in run] for run in results]
+        self.steps_results = [[steps for _, _, steps, _ in run] for run in results]
+        if self.profile:
+            self.profile_results = [[report for *_, report in run] for run in results]
+
+    def export_data(self, recorder, track, density):
+        """
+        Exports the position, speed and lane of every car on the track, recorded by
+        ``recorder``, into a file in ``export_format``
+        """
+        filename = self.export_filename(track, density)
+        filename += "." + self.export_format
+
+        write_trajectories(filename, recorder, self.export_format)
+
+    def export_filename(self, track, density):
+        """Returns the name of the exported data file, without extension"""
         # filename contains arguments of the simulation
         filename = "data_"
         if self.central_control:
@@ -111,45 +620,36 @@ class Model(object):
         else:
             filename += "individual_"
 
-        filename += str(len(lanes_list))
+        filename += str(track.lanes_count)
         filename += "lane_density_"
         filename += str(round(density))
-        filename += ".csv"
-
-        # write data to the file
-        with open(filename, mode="w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["id", "timestep", "alpha", "lane", "speed"])
-            car_id = 0
-            for lane in lanes_list:
-                for vehicle in lane:
-                    for i in range(len(time_data)):
-                        writer.writerow(
-                            [
-                                car_id,
-                                time_data[i],
-                                vehicle.position_list[i],
-                                vehicle.lane_list[i],
-                                vehicle.speed_list[i],
-                            ]
-                        )
-                    car_id += 1
-
-    def plot(self, stat: str = "position", export_data=False, out_file=None) -> None:
+        return filename
+
+    def plot(
+        self, stat: str = "position", export_data=False, out_file=None, processes=1
+    ) -> None:
         """
         Make the plot, which is either a flow-density graph or mean-speed-density graph.
         If stat = position, then the plot is a flow-density graph. If stat = velocity
         then the plot is a mean-speed-density graph.
 
         Export data means data of every agent in ONLY the first run will be saved to csv files
+
+        With processes other than 1 the runs are simulated in parallel on that many
+        processes (None means all cores), see ``run_parallel``.
         """
 
+        if stat not in ("position", "velocity"):
+            raise ValueError(f"Unrecognised statistic '{stat}'")
+        if processes != 1:
+            # simulate every run up front, the loops below only plot them
+            self.run_parallel(processes=processes, export_data=export_data)
+
         if stat == "position":
             for idx in range(self.total_runs):  # Run the simulation 20 times
-                print("run " + idx)
-                if idx == 1:
-                    break
-                self.run(idx, export_data=export_data)
+                if processes == 1:
+                    print(f"run {idx}")
+                    self.run(idx, export_data=export_data)
 
                 # Scatter plot for current run
                 plt.scatter(
@@ -173,8 +673,9 @@ class Model(object):
 
         elif stat == "velocity":
             for idx in range(self.total_runs):  # Run the simulation 20 times
-                print(idx)
-                self.run(idx, export_data=export_data)
+                if processes == 1:
+                    print(idx)
+                    self.run(idx, export_data=export_data)
 
                 # Scatter plot for current run
                 plt.scatter(
@@ -201,9 +702,6 @@ class Model(object):
             plt.title("The relationship between mean-speed and density")
             plt.legend()
 
-        else:
-            raise ValueError(f"Unrecognised statistic '{stat}'")
-
         if out_file is None:
             plt.show()
         else:
@@ -0,0 +1,115 @@
+"""
+Opt-in instrumentation of a simulation: the wall time and the amount of calls
+of every phase of a step, and counters of what the tracks do (lane switches
+that were considered and made, leader lookups, lane sorts).
+
+Tracks and ``Model.simulate`` always report to a profiler. By default that is
+``NULL_PROFILER``, which ignores everything, so the instrumentation costs next
+to nothing when it is not used. The counters are only updated once per lane
+per step, never per car.
+"""
+
+from time import perf_counter
+
+
+class _Phase:
+    """Context manager that adds the time spent inside it to a phase."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, perf_counter() - self.start)
+
+
+class Profiler:
+    """
+    Collects the time and the amount of calls per phase and named counters.
+
+        profiler = Profiler()
+        with profiler.phase("next state"):
+            track.calculate_next_state()
+        profiler.report()
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        """
+        Returns the collected numbers as a dict, ``{"phases": {name: {"seconds",
+        "calls"}}, "counters": {name: amount}}``.
+        """
+        return {
+            "phases": {
+                name: {"seconds": self.seconds[name], "calls": self.calls[name]}
+                for name in self.seconds
+            },
+            "counters": dict(self.counters),
+        }
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullProfiler:
+    """A profiler that ignores everything, used when profiling is off."""
+
+    _phase = _NullPhase()
+
+    def phase(self, name):
+        return self._phase
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def report(self):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def summarize(reports):
+    """
+    Adds up a list of reports (for example all densities of a run) into a
+    single report, skipping the ``None`` of unprofiled simulations.
+    """
+    total = Profiler()
+    for report in reports:
+        if report is None:
+            continue
+        for name, phase in report["phases"].items():
+            total.seconds[name] = total.seconds.get(name, 0.0) + phase["seconds"]
+            total.calls[name] = total.calls.get(name, 0) + phase["calls"]
+        for name, amount in report["counters"].items():
+            total.count(name, amount)
+    return total.report()
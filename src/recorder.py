@@ -0,0 +1,169 @@
+import queue
+import threading
+import numpy as np
+from .shared_arrays import SharedArray
+
+
+class TrajectoryRecorder:
+    """
+    Records the position, lane and speed of every car into preallocated
+    ``(frames, cars)`` arrays, so recording a step does not allocate anything.
+    Only every ``every``-th step of the ``steps`` steps of a simulation is
+    recorded. Column ``i`` of the arrays belongs to the car with vehicle id
+    ``i``, see ``Track.snapshot``.
+
+    With ``shared`` the arrays are ``SharedArray``s, so a copy of the recorder
+    sent to a worker process records into the memory of this one, and the
+    frames a worker recorded can be read here without copying them.
+    """
+
+    def __init__(self, steps, cars, every=1, dtype=np.float32, shared=False):
+        if every < 1:
+            raise ValueError(f"Can not record every {every} steps")
+        self.every = every
+        frames = -(-steps // every)  # rounded up, step 0 is always recorded
+        # the SharedArray of every array, by attribute, when they are shared
+        self.shared = {}
+        self._allocate("time", frames, float, shared)
+        self._allocate("position", (frames, cars), dtype, shared)
+        self._allocate("speed", (frames, cars), dtype, shared)
+        self._allocate("lane", (frames, cars), np.int16, shared)
+        # the amount of recorded frames, in an array so it is shared as well
+        self._allocate("_count", 1, np.int64, shared)
+
+    def _allocate(self, name, shape, dtype, shared):
+        if shared:
+            self.shared[name] = SharedArray(shape, dtype)
+            setattr(self, name, self.shared[name].array)
+        else:
+            setattr(self, name, np.zeros(shape, dtype=dtype))
+
+    @property
+    def frames(self):
+        return int(self._count[0])
+
+    @frames.setter
+    def frames(self, frames):
+        self._count[0] = frames
+
+    def __len__(self):
+        return self.frames
+
+    def __getstate__(self):
+        # the shared arrays are sent as the name of their memory
+        return {
+            name: value
+            for name, value in self.__dict__.items()
+            if name not in self.shared
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name, array in self.shared.items():
+            setattr(self, name, array.array)
+
+    def release(self):
+        """Removes the shared memory of a shared recorder, see ``SharedArray``."""
+        for array in self.shared.values():
+            array.release()
+
+    def record(self, step, time, position, lane, speed):
+        """
+        Saves the state of the cars at the given step, unless the step is not
+        one of the recorded ones. The arrays are indexed by vehicle id.
+        """
+        if step % self.every != 0:
+            return
+        i = self.frames
+        self.time[i] = time
+        self.position[i] = position
+        self.lane[i] = lane
+        self.speed[i] = speed
+        self.frames += 1
+
+    def trajectories(self):
+        """
+        Returns the ``(time, position, lane, speed)`` arrays of the recorded
+        frames, the last three have one column per car.
+        """
+        n = self.frames
+        return self.time[:n], self.position[:n], self.lane[:n], self.speed[:n]
+
+
+class StreamingRecorder:
+    """
+    Records like ``TrajectoryRecorder``, but only keeps ``chunk`` frames in
+    memory. Every time the buffer is full the frames are handed to
+    ``writer.write(time, position, lane, speed)`` (a ``ChunkWriter``), so the
+    length of a recorded run is not limited by memory.
+
+    With ``background`` the chunks are written by a separate thread while the
+    simulation continues. At most ``queue_size`` chunks wait for the writer,
+    when it falls behind ``record`` blocks until there is room again.
+    """
+
+    def __init__(
+        self,
+        writer,
+        cars,
+        chunk=1000,
+        every=1,
+        dtype=np.float32,
+        background=False,
+        queue_size=2,
+    ):
+        self.writer = writer
+        self.buffer = TrajectoryRecorder(chunk * every, cars, every, dtype)
+        self.frames = 0  # the amount of frames handed to the writer
+        self.error = None
+
+        self.queue = None
+        self.thread = None
+        if background:
+            self.queue = queue.Queue(maxsize=queue_size)
+            self.thread = threading.Thread(target=self._write_chunks, daemon=True)
+            self.thread.start()
+
+    def __len__(self):
+        return self.frames + len(self.buffer)
+
+    def record(self, step, time, position, lane, speed):
+        """Saves the state of the cars, see ``TrajectoryRecorder.record``."""
+        self.buffer.record(step, time, position, lane, speed)
+        if len(self.buffer) == len(self.buffer.time):
+            self.flush()
+
+    def flush(self):
+        """Hands the buffered frames to the writer and empties the buffer."""
+        if len(self.buffer) == 0:
+            return
+        chunk = tuple(array.copy() for array in self.buffer.trajectories())
+        self.frames += len(self.buffer)
+        self.buffer.frames = 0
+        if self.queue is None:
+            self.writer.write(*chunk)
+        else:
+            self.queue.put(chunk)
+
+    def _write_chunks(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                return
+            # after an error the chunks are still taken from the queue, so the
+            # simulation does not block, the error is raised by ``close``
+            if self.error is None:
+                try:
+                    self.writer.write(*chunk)
+                except Exception as error:
+                    self.error = error
+
+    def close(self):
+        """Writes the remaining frames and waits until everything is on disk."""
+        self.flush()
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
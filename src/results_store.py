@@ -0,0 +1,218 @@
+"""
+A persistent store of simulation results in an SQLite database, so a sweep
+never simulates the same thing twice and an interrupted sweep resumes where it
+stopped. Every simulation is stored under
+
+- the key of its parameters: a hash of everything that changes its results,
+  the settings of the ``Model``, the defaults of ``VehicleAgent`` and the
+  tracks, and the source code of the simulation;
+- its density and the seed sequence of its random generator.
+
+The flow, the mean speed and the amount of steps are stored as columns, and
+any other statistics (like a profiling report) as JSON.
+"""
+
+import hashlib
+import inspect
+import json
+import sqlite3
+
+from . import (
+    Agent,
+    batched_track,
+    kernels,
+    lane,
+    steady_state,
+    track_interface,
+    vector_track,
+)
+
+# the settings of ``Model`` that change the results of a simulation, the others
+# only change how it is run or what is kept (the engines all give the same
+# results)
+MODEL_PARAMETERS = (
+    "dt",
+    "total_time",
+    "road_length",
+    "lane_count",
+    "central_control",
+    "max_accel",
+    "speed_push",
+    "steady_window",
+    "steady_tolerance",
+    "warmup_time",
+    "measure_time",
+    "warm_start_time",
+)
+# the modules that simulate, a change to any of them gives a new key
+SIMULATION_MODULES = (
+    Agent,
+    batched_track,
+    kernels,
+    lane,
+    steady_state,
+    track_interface,
+    vector_track,
+)
+
+
+def defaults(function):
+    """Returns the default values of the arguments of ``function``."""
+    return {
+        name: parameter.default
+        for name, parameter in inspect.signature(function).parameters.items()
+        if parameter.default is not inspect.Parameter.empty
+        and name not in ("rng", "profiler", "vehicle_id")
+    }
+
+
+def code_version():
+    """Returns a hash of the source code of the simulation."""
+    from .model import Model
+
+    digest = hashlib.sha256()
+    for module in SIMULATION_MODULES:
+        digest.update(inspect.getsource(module).encode())
+    # the methods of the model that simulate, a warm-start sweep goes through
+    # sweep instead of simulate for every density
+    for method in (Model.simulate, Model.sweep, Model.simulate_batch):
+        digest.update(inspect.getsource(method).encode())
+    return digest.hexdigest()
+
+
+def model_parameters(model):
+    """
+    Returns everything that changes the results of the simulations of
+    ``model``, as a dict that can be stored as JSON.
+    """
+    parameters = {name: getattr(model, name) for name in MODEL_PARAMETERS}
+    if model.warm_start_time is not None:
+        # a density of a warm-start sweep continues from the ones before it
+        parameters["density_values"] = [float(d) for d in model.density_values]
+    if model.vehicle_mix is not None:
+        vehicle_types, class_fractions = track_interface.parse_vehicle_mix(
+            model.vehicle_mix
+        )
+        parameters["vehicle_mix"] = [
+            [vehicle_type.parameters(), float(fraction)]
+            for vehicle_type, fraction in zip(vehicle_types, class_fractions)
+        ]
+    parameters["VehicleAgent"] = defaults(Agent.VehicleAgent.__init__)
+    parameters["Track"] = defaults(track_interface.Track.__init__)
+    parameters["VectorTrack.allocate"] = defaults(vector_track.VectorTrack.allocate)
+    return parameters
+
+
+def seed_id(seed):
+    """Returns a string that identifies a ``numpy.random.SeedSequence``."""
+    return f"{seed.entropy}/{'.'.join(str(key) for key in seed.spawn_key)}"
+
+
+class ResultsStore:
+    """
+    The results of simulations in the SQLite database at ``path``, which is
+    created when it does not exist yet.
+
+        store = ResultsStore("data/results.sqlite")
+        model = Model(lane_count=2, seed=0, store=store)
+        model.run_parallel()  # only simulates what is not in the store yet
+
+    The connection is opened when it is first needed, so a store can be sent
+    to other processes along with its model.
+    """
+
+    def __init__(self, path="results.sqlite"):
+        self.path = path
+        self._connection = None
+        # the keys of the models that were seen, by their parameters
+        self._keys = {}
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS parameters ("
+                    "key TEXT PRIMARY KEY, parameters TEXT, code_version TEXT)"
+                )
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT, density REAL, seed TEXT, run INTEGER, "
+                    "flow REAL, mean_speed REAL, steps INTEGER, stats TEXT, "
+                    "PRIMARY KEY (key, density, seed))"
+                )
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def key(self, model):
+        """
+        Returns the key of the parameters of ``model``, and stores the
+        parameters themselves the first time.
+        """
+        parameters = json.dumps(model_parameters(model), sort_keys=True)
+        if parameters not in self._keys:
+            version = code_version()
+            key = hashlib.sha256((parameters + version).encode()).hexdigest()[:16]
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO parameters VALUES (?, ?, ?)",
+                    (key, parameters, version),
+                )
+            self._keys[parameters] = key
+        return self._keys[parameters]
+
+    def get(self, model, density, seed):
+        """
+        Returns the ``(flow, mean_speed, steps, stats)`` of the simulation of
+        ``model`` at ``density`` with ``seed``, or None when it is not stored.
+        Profiling does not change the results, so it is not part of the key,
+        but a profiled model does not get a simulation that was stored without
+        its profile.
+        """
+        row = self.connection.execute(
+            "SELECT flow, mean_speed, steps, stats FROM results "
+            "WHERE key = ? AND density = ? AND seed = ?",
+            (self.key(model), float(density), seed_id(seed)),
+        ).fetchone()
+        if row is None:
+            return None
+        flow, mean_speed, steps, stats = row
+        if model.profile and stats is None:
+            return None
+        if model.warmup_time is None and model.steady_window is None:
+            # the flow is then a count of crossings, an int like a new simulation
+            flow = int(flow)
+        # SQLite stores NaN as NULL
+        mean_speed = float("nan") if mean_speed is None else mean_speed
+        return flow, mean_speed, steps, stats and json.loads(stats)
+
+    def put(self, model, density, seed, run, flow, mean_speed, steps, stats=None):
+        """Stores the results of a simulation, replacing an earlier one."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.key(model),
+                    float(density),
+                    seed_id(seed),
+                    run,
+                    float(flow),
+                    float(mean_speed),
+                    steps,
+                    None if stats is None else json.dumps(stats),
+                ),
+            )
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -0,0 +1,223 @@
+"""
+Runs the (run, density) simulations of a ``Model`` in parallel worker
+processes. Every simulation is an independent task with its own seed, spawned
+from a single ``numpy.random.SeedSequence``, so a parallel sweep gives the same
+results no matter how many processes are used or in which order the tasks
+finish.
+"""
+
+import numpy as np
+from multiprocessing import Pool
+from .profiling import Profiler
+from .recorder import TrajectoryRecorder
+
+
+def task_seeds(seed, total_runs, density_count):
+    """
+    Returns a ``(total_runs, density_count)`` nested list of independent seed
+    sequences, one for every simulation of a sweep.
+    """
+    children = np.random.SeedSequence(seed).spawn(total_runs * density_count)
+    return [
+        children[idx * density_count : (idx + 1) * density_count]
+        for idx in range(total_runs)
+    ]
+
+
+def simulate_task(model, idx, j, density, seed, export_data=False, recorder=None):
+    """
+    Simulates run ``idx`` at the ``j``-th density of the model with a random
+    generator seeded from ``seed``, recording the trajectories into
+    ``recorder`` when one is given. Returns ``(idx, j, flow, mean_speed, steps,
+    profile)``, where profile is the report of the profiler when
+    ``model.profile`` is set and None otherwise.
+    """
+    rng = np.random.default_rng(seed)
+    profiler = Profiler() if model.profile else None
+    flow, mean_speed, steps = model.simulate(
+        density,
+        export_data=export_data,
+        rng=rng,
+        profiler=profiler,
+        recorder=recorder,
+    )
+    return idx, j, flow, mean_speed, steps, profiler and profiler.report()
+
+
+def sweep_task(model, idx, export_data=False):
+    """
+    Runs the warm-start sweep of run ``idx``, see ``Model.sweep``. Returns a
+    list with the ``(idx, j, flow, mean_speed, steps, profile)`` of every
+    density ``j``, like ``simulate_task``.
+    """
+    return [
+        (idx, j, flow, mean_speed, steps, profiler and profiler.report())
+        for j, (flow, mean_speed, steps, profiler) in enumerate(
+            model.sweep(idx, export_data)
+        )
+    ]
+
+
+def task_rows(task, sweep=False):
+    """
+    Returns the ``(idx, j, density, seed)`` of every simulation of a task, the
+    arguments of ``simulate_task``, or of ``sweep_task`` when ``sweep`` is set.
+    The simulations of a sweep all use the seed of the run.
+    """
+    if not sweep:
+        model, idx, j, density, seed = task[:5]
+        return [(idx, j, density, seed)]
+    model, idx = task[:2]
+    seed = task_seeds(model.seed, model.total_runs, len(model.density_values))[idx][0]
+    return [(idx, j, density, seed) for j, density in enumerate(model.density_values)]
+
+
+def _simulate_task(args):
+    i, task = args
+    return i, [simulate_task(*task)]
+
+
+def _sweep_task(args):
+    i, task = args
+    return i, sweep_task(*task)
+
+
+def run_tasks(tasks, sweep=False, processes=1):
+    """
+    Runs ``simulate_task`` for every task, a tuple of its arguments, or
+    ``sweep_task`` when ``sweep`` is set. The tasks run on a pool of
+    ``processes`` worker processes (all cores when ``None``), or in this
+    process when ``processes`` is 1. Returns the results of all simulations in
+    the order of the tasks.
+
+    When the model of a task has a ``store`` (a ``ResultsStore``), the tasks
+    of which every simulation is stored already are not simulated again,
+    unless they export or record data. The results of the other tasks are stored as soon
+    as they are done, so an interrupted sweep resumes where it stopped.
+    """
+    results = [None] * len(tasks)
+    todo = []
+    for i, task in enumerate(tasks):
+        model = task[0]
+        if sweep:
+            export_data = task[2]
+        else:
+            # exported or recorded into a given recorder
+            export_data = (len(task) > 5 and task[5]) or (
+                len(task) > 6 and task[6] is not None
+            )
+        if model.store is None or export_data:
+            todo.append(i)
+            continue
+        cached = [
+            model.store.get(model, density, seed)
+            for _, _, density, seed in task_rows(task, sweep)
+        ]
+        if any(result is None for result in cached):
+            todo.append(i)
+            continue
+        results[i] = [
+            (idx, j, *result)
+            for (idx, j, _, _), result in zip(task_rows(task, sweep), cached)
+        ]
+
+    def collect(done):
+        for i, task_results in done:
+            results[i] = task_results
+            model = tasks[i][0]
+            if model.store is None:
+                continue
+            for (_, _, density, seed), result in zip(
+                task_rows(tasks[i], sweep), task_results
+            ):
+                idx, _, flow, mean_speed, steps, profile = result
+                model.store.put(
+                    model, density, seed, idx, flow, mean_speed, steps, profile
+                )
+
+    function = _sweep_task if sweep else _simulate_task
+    arguments = [(i, tasks[i]) for i in todo]
+    if processes == 1:
+        collect(map(function, arguments))
+    elif len(arguments) > 0:
+        with Pool(processes) as pool:
+            collect(pool.imap_unordered(function, arguments))
+    return [result for task_results in results for result in task_results]
+
+
+def simulate_tasks(tasks, processes=1):
+    """``run_tasks`` of ``simulate_task`` tasks."""
+    return run_tasks(tasks, processes=processes)
+
+
+def run_parallel(model, processes=None, export_data=False):
+    """
+    Simulates all ``model.total_runs`` runs for every density in
+    ``model.density_values`` on a pool of ``processes`` worker processes (all
+    cores when ``None``). The seeds are derived from ``model.seed`` and data is
+    only exported for the first run, both like ``Model.run`` does. Returns the
+    flow, the mean speed, the steps and the profile results as
+    ``[run][density]`` nested lists.
+    """
+    densities = list(model.density_values)
+    sweep = model.warm_start_time is not None
+    if sweep:
+        # a warm-start sweep carries its track from one density to the next,
+        # so then every run is a single task
+        tasks = [
+            (model, idx, export_data and idx == 0) for idx in range(model.total_runs)
+        ]
+    else:
+        seeds = task_seeds(model.seed, model.total_runs, len(densities))
+        tasks = [
+            (model, idx, j, density, seeds[idx][j], export_data and idx == 0)
+            for idx in range(model.total_runs)
+            for j, density in enumerate(densities)
+        ]
+        # the highest densities take the longest, handing them out first keeps
+        # all workers busy until the end
+        tasks.sort(key=lambda task: -task[3])
+
+    flow_results = [[None] * len(densities) for _ in range(model.total_runs)]
+    speed_results = [[None] * len(densities) for _ in range(model.total_runs)]
+    steps_results = [[None] * len(densities) for _ in range(model.total_runs)]
+    profile_results = [[None] * len(densities) for _ in range(model.total_runs)]
+    for idx, j, flow, mean_speed, steps, profile in run_tasks(
+        tasks, sweep=sweep, processes=processes
+    ):
+        flow_results[idx][j] = flow
+        speed_results[idx][j] = mean_speed
+        steps_results[idx][j] = steps
+        profile_results[idx][j] = profile
+    return flow_results, speed_results, steps_results, profile_results
+
+
+def record_parallel(model, processes=None, every=None):
+    """
+    Simulates the first run of every density in ``model.density_values`` on a
+    pool of ``processes`` worker processes (all cores when ``None``), with the
+    seeds of ``run_parallel``. Every ``every``-th step (``model.record_every``
+    by default) is recorded by the workers straight into a shared
+    ``TrajectoryRecorder`` of this process, so the trajectories are not copied
+    back. Returns the recorders in the order of the densities.
+    """
+    if model.warm_start_time is not None:
+        raise ValueError("The densities of a warm-start sweep can not be recorded")
+    if every is None:
+        every = model.record_every
+    steps = int(model.total_time / model.dt)
+    if model.warmup_time is not None:
+        # the longest a simulation with a warm-up can take, see ``Model.simulate``
+        steps = int(model.warmup_time / model.dt) + int(model.measure_time / model.dt)
+    densities = list(model.density_values)
+    seeds = task_seeds(model.seed, model.total_runs, len(densities))
+    recorders = [
+        TrajectoryRecorder(steps, model.car_count(density), every, shared=True)
+        for density in densities
+    ]
+    tasks = [
+        (model, 0, j, density, seeds[0][j], False, recorders[j])
+        for j, density in enumerate(densities)
+    ]
+    run_tasks(tasks, processes=processes)
+    return recorders
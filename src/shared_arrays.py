@@ -0,0 +1,66 @@
+"""
+NumPy arrays in ``multiprocessing.shared_memory``, for buffers that worker
+processes fill in and the parent reads, without copying them through the
+pipes of the pool.
+"""
+
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _close(memory, owner):
+    if owner:
+        _unlink(memory)
+    memory.close()
+
+
+def _unlink(memory):
+    try:
+        memory.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class SharedArray:
+    """
+    A ``shape`` array of ``dtype`` in a new block of shared memory, filled
+    with zeros, as ``array``. It pickles as the name of the block, so the copy
+    a worker process gets is the same memory: what the worker writes into
+    ``array`` is seen by the parent as it is written.
+
+    The memory is unmapped once ``array`` and every view of it are garbage
+    collected. The block itself is removed then as well, or earlier by
+    ``release``, after which no new copies can be made.
+    """
+
+    def __init__(self, shape, dtype=float):
+        self.shape = tuple(int(n) for n in np.atleast_1d(shape))
+        self.dtype = np.dtype(dtype)
+        size = max(int(np.prod(self.shape)) * self.dtype.itemsize, 1)
+        self.owner = True
+        self._attach(shared_memory.SharedMemory(create=True, size=size))
+        self.array[...] = 0
+
+    def _attach(self, memory):
+        self._memory = memory
+        self.name = memory.name
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=memory.buf)
+        # the views of the array keep it alive, so the memory is only closed
+        # when nothing points into it anymore
+        weakref.finalize(self.array, _close, memory, self.owner)
+
+    def __getstate__(self):
+        return {"name": self.name, "shape": self.shape, "dtype": self.dtype.str}
+
+    def __setstate__(self, state):
+        self.shape = state["shape"]
+        self.dtype = np.dtype(state["dtype"])
+        self.owner = False
+        self._attach(shared_memory.SharedMemory(name=state["name"]))
+
+    def release(self):
+        """Removes the block, the arrays on it stay usable until they are gone."""
+        if self.owner:
+            _unlink(self._memory)
@@ -0,0 +1,87 @@
+import numpy as np
+
+
+class SteadyStateDetector:
+    """
+    Decides when a simulation has reached a steady state, from the amount of
+    crossings and the mean speed of every step. The steps are grouped in
+    windows of ``window`` steps, and the state is steady once the mean flow and
+    the mean speed of each of the last ``windows`` windows are within
+    ``tolerance`` (relative) of their average over those windows.
+
+    Only the means of the finished windows are kept, not the steps.
+    """
+
+    def __init__(self, window=100, tolerance=0.05, windows=3):
+        if window < 1 or windows < 2:
+            raise ValueError("Need windows of at least one step, and two windows")
+        self.window = window
+        self.tolerance = tolerance
+        self.windows = windows
+        # the mean crossings per step and mean speed of every finished window
+        self.flows = []
+        self.speeds = []
+        self._crossings = 0
+        self._speed = 0.0
+        self._steps = 0
+
+    def update(self, crossings, mean_speed):
+        """
+        Adds a step and returns whether the state is steady. This can only
+        change at the end of a window.
+        """
+        self._crossings += crossings
+        self._speed += mean_speed
+        self._steps += 1
+        if self._steps < self.window:
+            return False
+        self.flows.append(self._crossings / self.window)
+        self.speeds.append(self._speed / self.window)
+        self._crossings = 0
+        self._speed = 0.0
+        self._steps = 0
+        return self.steady()
+
+    def steady(self):
+        """Returns whether the last windows are stationary within the tolerance."""
+        if len(self.flows) < self.windows:
+            return False
+        return self._stationary(self.flows) and self._stationary(self.speeds)
+
+    def _stationary(self, values):
+        values = np.array(values[-self.windows :])
+        if np.all(np.isnan(values)):
+            # an empty track has no speed at all
+            return True
+        mean = np.mean(values)
+        return bool(np.all(np.abs(values - mean) <= self.tolerance * abs(mean)))
+
+    def flow_rate(self):
+        """Returns the mean crossings per step over the last windows."""
+        return float(np.mean(self.flows[-self.windows :]))
+
+
+class MeasurementWindow:
+    """
+    Accumulates the flow and the mean speed of the steps of a measurement
+    window, one step at a time, without keeping the steps themselves.
+    """
+
+    def __init__(self, dt):
+        self.dt = dt
+        self.crossings = 0
+        self.speed = 0.0
+        self.steps = 0
+
+    def update(self, crossings, mean_speed):
+        self.crossings += crossings
+        self.speed += mean_speed
+        self.steps += 1
+
+    def flow(self):
+        """Returns the crossings per hour over the window."""
+        return self.crossings * 3600 / (self.steps * self.dt)
+
+    def mean_speed(self):
+        """Returns the time-averaged mean speed over the window."""
+        return self.speed / self.steps
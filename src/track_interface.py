@@ -1,5 +1,141 @@
 import numpy as np
-from .Agent import VehicleAgent
+from itertools import chain
+from .Agent import DEFAULT_TYPE, VEHICLE_CLASSES, VehicleAgent, VehicleType
+from .lane import Lane
+from .profiling import NULL_PROFILER
+
+
+def split_cars(density, length, lanes_count, rng, equal_lanes=False):
+    """
+    Returns the cumulative amount of cars at the end of every lane for a track
+    of ``length`` meters with the given density (veh/km). The last entry is the
+    total amount of cars.
+    """
+    # amount of cars
+    N_cars = int((length / 1000) * density)
+    if equal_lanes:
+        split_points = np.linspace(0, N_cars, lanes_count + 1)[1:-1]
+    else:
+        split_points = np.sort(rng.uniform(0, N_cars, lanes_count - 1))
+    # different behaviour if split_points is an integer instead of a np array
+    try:
+        split_points = [int(split_points)]
+    except:
+        split_points = split_points.astype(int)
+
+    split_points = list(split_points)
+    split_points.append(N_cars)
+    return split_points
+
+
+def parse_vehicle_mix(mix=None):
+    """
+    Returns the ``VehicleType`` of every class of a vehicle mix, a dict from a
+    name in ``VEHICLE_CLASSES`` (or a ``VehicleType``) to the fraction of the
+    cars of that class, and the fractions scaled to add up to one. Without a
+    mix all cars are of the default type.
+    """
+    if mix is None:
+        return [DEFAULT_TYPE], np.ones(1)
+    types = []
+    for vehicle_class in mix:
+        if isinstance(vehicle_class, VehicleType):
+            types.append(vehicle_class)
+        elif vehicle_class in VEHICLE_CLASSES:
+            types.append(VEHICLE_CLASSES[vehicle_class])
+        else:
+            raise ValueError(f"Unrecognised vehicle class '{vehicle_class}'")
+    fractions = np.array(list(mix.values()), dtype=float)
+    if len(types) == 0 or np.any(fractions < 0) or fractions.sum() <= 0:
+        raise ValueError(f"Can not make a vehicle mix of the fractions {fractions}")
+    return types, fractions / fractions.sum()
+
+
+def draw_classes(fractions, N, rng):
+    """
+    Returns the class of ``N`` new cars, drawn with the fractions of a vehicle
+    mix. Nothing is drawn when there is a single class.
+    """
+    if len(fractions) == 1:
+        return np.zeros(N, dtype=np.int8)
+    return rng.choice(len(fractions), size=N, p=fractions).astype(np.int8)
+
+
+def initial_lane_state(N, length, rng, lengths=None):
+    """
+    Returns random sorted initial positions and random initial speeds for ``N``
+    cars on a lane of ``length`` meters. ``lengths`` are the lengths of the
+    cars when they are not all 5 meters.
+    """
+    if lengths is None:
+        initial_positions = np.sort(rng.uniform(0, length - (N * 5), N))
+        initial_positions += (
+            np.arange(N) * 5
+        )  # Ensure minimum gaps of 5m by adding vehicle length
+    else:
+        lengths = np.asarray(lengths, dtype=float)
+        initial_positions = np.sort(rng.uniform(0, length - lengths.sum(), N))
+        # every car is at least the length of its leader behind that leader
+        initial_positions += np.cumsum(lengths) - lengths[:1].sum()
+
+    initial_speeds = rng.uniform(0, 35, N)
+    return initial_positions, initial_speeds
+
+
+def lane_gaps(positions, length):
+    """
+    Returns the distance from every car of a lane, given by its sorted
+    positions, to the car in front of it. The last car follows the first one,
+    and a car alone in its lane has the whole track in front of it.
+    """
+    if len(positions) == 1:
+        return np.array([float(length)])
+    return (np.roll(positions, -1) - positions) % length
+
+
+def resize_track(track, N):
+    """
+    Brings the amount of cars on ``track`` to ``N`` while keeping the state of
+    the other cars. New cars are put halfway the largest gap between two cars
+    of the same lane, or at the start of an empty lane, at the speed of the
+    slowest of the two cars around them. Cars are removed where the gap in
+    front of them is the smallest. Works on every track that has
+    ``lane_state``, ``add_car`` and ``remove_car``.
+    """
+    while sum(track.lane_sizes()) < N:
+        best_lane, best_slot, best_gap = 0, None, -1.0
+        for lane in range(track.lanes_count):
+            positions, _ = track.lane_state(lane)
+            if len(positions) == 0:
+                gap, slot = float(track.length), None
+            else:
+                gaps = lane_gaps(positions, track.length)
+                slot = int(np.argmax(gaps))
+                gap = gaps[slot]
+            if gap > best_gap:
+                best_lane, best_slot, best_gap = lane, slot, gap
+        if best_slot is None:
+            track.add_car(best_lane, 0.0, 0.0)
+            continue
+        positions, speeds = track.lane_state(best_lane)
+        leader = (best_slot + 1) % len(positions)
+        track.add_car(
+            best_lane,
+            (positions[best_slot] + best_gap / 2) % track.length,
+            min(speeds[best_slot], speeds[leader]),
+        )
+
+    while sum(track.lane_sizes()) > N:
+        best_lane, best_slot, best_gap = 0, None, np.inf
+        for lane in range(track.lanes_count):
+            positions, _ = track.lane_state(lane)
+            if len(positions) == 0:
+                continue
+            gaps = lane_gaps(positions, track.length)
+            slot = int(np.argmin(gaps))
+            if gaps[slot] < best_gap:
+                best_lane, best_slot, best_gap = lane, slot, gaps[slot]
+        track.remove_car(best_lane, best_slot)
 
 
 class Track:
@@ -12,62 +148,135 @@ class Track:
         central_control=False,
         max_accel=1,
         speed_push=0.5,
+        rng=None,
+        profiler=None,
     ):
         self.lanes_count = lane_count
         # Rightmost lane has index 0 and is the slow lane.
-        self.lanes_list = [[] for _ in range(lane_count)]
+        self.lanes_list = [Lane() for _ in range(lane_count)]
         self.length = length
         self.dt = dt
 
         self.central_control = central_control
         self.max_accel = max_accel
         self.speed_push = speed_push
+        # all randomness of the simulation comes from this generator
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # counts what the track does when profiling, see ``profiling.Profiler``
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+        # the type of every vehicle class and the fraction of the cars of it
+        self.vehicle_types, self.class_fractions = parse_vehicle_mix()
 
-    def init_cars(self, density=10, equal_lanes=False):
-        # amount of cars
-        N_cars = int((self.length / 1000) * density)
-        if equal_lanes:
-            split_points = np.linspace(0, N_cars, self.lanes_count + 1)[1:-1]
-        else:
-            split_points = np.sort(np.random.uniform(0, N_cars, self.lanes_count - 1))
-        # different behaviour if split_points is an integer instead of a np array
-        try:
-            split_points = [int(split_points)]
-        except:
-            split_points = split_points.astype(int)
-
-        split_points = list(split_points)
-        split_points.append(N_cars)
+    def init_cars(self, density=10, equal_lanes=False, vehicle_mix=None):
+        """
+        Puts cars on the track at the given density (veh/km). ``vehicle_mix``
+        gives the fraction of the cars of every vehicle class, for example
+        ``{"car": 0.8, "truck": 0.2}``, see ``parse_vehicle_mix``.
+        """
+        self.vehicle_types, self.class_fractions = parse_vehicle_mix(vehicle_mix)
+        split_points = split_cars(
+            density, self.length, self.lanes_count, self.rng, equal_lanes
+        )
+        classes = draw_classes(self.class_fractions, split_points[-1], self.rng)
 
         past_amount = 0
         lane = 0
         for total in split_points:
-            self.lanes_list[lane] = self.populate_lane(total - past_amount)
+            self.lanes_list[lane] = Lane(
+                self.populate_lane(
+                    total - past_amount,
+                    first_id=past_amount,
+                    classes=classes[past_amount:total],
+                )
+            )
             past_amount = total
             lane += 1
 
-    def populate_lane(self, N):
-        initial_positions = np.sort(np.random.uniform(0, self.length - (N * 5), N))
-        initial_positions += (
-            np.arange(N) * 5
-        )  # Ensure minimum gaps of 5m by adding vehicle length
-
-        initial_speeds = np.random.uniform(0, 35, N)
+    def populate_lane(self, N, first_id=0, classes=None):
+        """
+        Creates ``N`` cars for a lane, numbered with vehicle ids counting up
+        from ``first_id``, of the given vehicle classes (all of the first one
+        by default).
+        """
+        if classes is None:
+            classes = np.zeros(N, dtype=np.int8)
+        lengths = [self.vehicle_types[k].length for k in classes]
+        initial_positions, initial_speeds = initial_lane_state(
+            N, self.length, self.rng, lengths
+        )
         vehicle_list = [
-            VehicleAgent(initial_positions[i], initial_speeds[i]) for i in range(N)
+            VehicleAgent(
+                initial_positions[i],
+                initial_speeds[i],
+                rng=self.rng,
+                vehicle_id=first_id + i,
+                vehicle_type=self.vehicle_types[classes[i]],
+                vehicle_class=classes[i],
+            )
+            for i in range(N)
         ]
         return vehicle_list
 
+    def set_density(self, density):
+        """
+        Adds or removes cars until the track has the given density (veh/km),
+        keeping the state of the other cars, see ``resize_track``.
+        """
+        resize_track(self, int((self.length / 1000) * density))
+
+    def lane_state(self, lane):
+        """Returns the sorted positions and the speeds of the cars of a lane."""
+        cars = self.lanes_list[lane].ordered()
+        positions = np.array([veh.position for veh in cars], dtype=float)
+        speeds = np.array([veh.current_speed for veh in cars], dtype=float)
+        return positions, speeds
+
+    def add_car(self, lane, position, speed, vehicle_class=None):
+        """
+        Adds a car to a lane, with the next free vehicle id. Its class is drawn
+        from the vehicle mix when it is not given.
+        """
+        if vehicle_class is None:
+            vehicle_class = draw_classes(self.class_fractions, 1, self.rng)[0]
+        vehicle = VehicleAgent(
+            position,
+            speed,
+            rng=self.rng,
+            vehicle_id=sum(self.lane_sizes()),
+            vehicle_type=self.vehicle_types[vehicle_class],
+            vehicle_class=vehicle_class,
+        )
+        self.lanes_list[lane].insert(vehicle)
+
+    def remove_car(self, lane, slot):
+        """
+        Removes the car at sorted index ``slot`` of a lane. The cars with a
+        larger vehicle id move down by one, so the ids stay consecutive.
+        """
+        (removed,) = self.lanes_list[lane].remove_slots([slot])
+        for vehicle in chain(*self.lanes_list):
+            if vehicle.vehicle_id > removed.vehicle_id:
+                vehicle.vehicle_id -= 1
+
     def lane_switches(self):
+        """
+        Lets every car decide whether it switches lanes. The cars of a lane all
+        decide on the state of the track before any of them moves, after which
+        the switches of that lane are applied at once.
+        """
         for i, lane in enumerate(self.lanes_list):
-            lane.sort()
-            for vehicle in lane:
+            switches = []
+            for slot, vehicle in enumerate(lane.ordered()):
                 front = self.car_in_front(i, vehicle.position)
                 sides = self.closest_cars_sides(i, vehicle.position)
                 left = sides[i + 1]
                 right = sides[i - 1]
                 count = vehicle.lane_switch(front, left, right, self.length)
-                self.switch_lane(i, vehicle.position, count)
+                if count != 0:
+                    switches.append((slot, count))
+            self.profiler.count("lane switches considered", len(lane))
+            self.profiler.count("leader lookups", len(lane))
+            self.switch_lanes(i, switches)
 
     # function by central control which returns the lanes an agent can switch to in the current moemtn
     def can_switch_central(self, vehicle: VehicleAgent, lane):
@@ -79,30 +288,35 @@ class Track:
 
     def lane_switches_central(self, prefered_per_lane):
         for lane_i in range(self.lanes_count):
-            # sort every lane
-            for lane in self.lanes_list:
-                lane.sort()
-            lane_count = len(self.lanes_list[lane_i])
-            for veh in self.lanes_list[lane_i]:
-                if lane_count > prefered_per_lane[lane_i]:
-                    switch_posible = self.can_switch_central(veh, lane_i)
-                    if any(switch_posible):
-                        choice = -1
-                        if all(switch_posible):
-                            choice = np.random.randint(0, 2)
-                        elif switch_posible[0]:
-                            choice = 0
-                        else:
-                            choice = 1
-                        self.switch_lane(
-                            lane_i, veh.position, int(choice == 0) - int(choice == 1)
-                        )
-                else:
+            lane = self.lanes_list[lane_i]
+            if len(lane) <= prefered_per_lane[lane_i]:
+                continue
+            # only the cars above the preferred amount leave the lane
+            excess = len(lane) - prefered_per_lane[lane_i]
+            switches = []
+            # a random choice for every car, used when it can go either way
+            choices = self.rng.integers(0, 2, size=len(lane))
+            for slot, veh in enumerate(lane.ordered()):
+                if len(switches) == excess:
                     break
+                switch_posible = self.can_switch_central(veh, lane_i)
+                if any(switch_posible):
+                    choice = -1
+                    if all(switch_posible):
+                        choice = choices[slot]
+                    elif switch_posible[0]:
+                        choice = 0
+                    else:
+                        choice = 1
+                    switches.append((slot, int(choice == 0) - int(choice == 1)))
+            self.profiler.count("lane switches considered", len(lane))
+            self.profiler.count("leader lookups", len(lane))
+            self.switch_lanes(lane_i, switches)
 
     def calculate_next_state(self):
+        # the noise of every car for this step, drawn at once
+        noise = iter(self.rng.random(sum(self.lane_sizes())).tolist())
         for i, lane in enumerate(self.lanes_list):
-            lane.sort()
             if self.central_control:
                 # edge case if there are no cars on the lane
                 try:
@@ -113,10 +327,11 @@ class Track:
                     mean_speed_lane = None
             else:
                 mean_speed_lane = None
-            for vehicle in lane:
+            self.profiler.count("leader lookups", len(lane))
+            for vehicle in lane.ordered():
                 leader = self.car_in_front(i, vehicle.position)
                 gap = (leader.position - vehicle.position) % self.length
-                gap = max(0, gap - leader.length)
+                gap = max(0, gap - leader.vehicle_type.length)
                 if leader is not vehicle:
                     vehicle.calculate_next_state(
                         gap,
@@ -126,6 +341,7 @@ class Track:
                         mean_speed_lane,
                         self.max_accel,
                         self.speed_push,
+                        next(noise),
                     )
                 else:
                     vehicle.calculate_next_state(
@@ -136,12 +352,63 @@ class Track:
                         mean_speed_lane,
                         self.max_accel,
                         self.speed_push,
+                        next(noise),
                     )
 
     def update_state(self):
+        for lane in self.lanes_list:
+            for vehicle in lane.ordered():
+                vehicle.update_state(self.dt)
+            if lane.update():
+                self.profiler.count("lane sorts")
+
+    def apply_periodic_boundary(self):
+        """
+        Moves every car that drove past the end of the track back to the start
+        and returns the amount of cars that crossed the end.
+        """
+        crossings = 0
+        for lane in self.lanes_list:
+            wrapped = 0
+            for vehicle in lane.ordered():
+                if vehicle.position >= self.length:
+                    vehicle.position -= self.length
+                    wrapped += 1
+            if wrapped > 0 and lane.update(wrapped):
+                self.profiler.count("lane sorts")
+            crossings += wrapped
+        return crossings
+
+    def lane_sizes(self):
+        """Returns the amount of cars in every lane."""
+        return [len(lane) for lane in self.lanes_list]
+
+    def mean_speed(self):
+        """Returns the mean of the current speed of all cars on the track."""
+        return np.mean([veh.current_speed for veh in chain(*self.lanes_list)])
+
+    def snapshot(self):
+        """
+        Returns the ``(position, lane, speed)`` of all cars as arrays indexed
+        by vehicle id, which is what ``TrajectoryRecorder.record`` takes.
+        """
+        N = sum(self.lane_sizes())
+        position = np.empty(N)
+        lane_numbers = np.empty(N, dtype=np.intp)
+        speed = np.empty(N)
         for lane_numb, lane in enumerate(self.lanes_list):
             for vehicle in lane:
-                vehicle.update_state(self.dt, lane_numb)
+                position[vehicle.vehicle_id] = vehicle.position
+                lane_numbers[vehicle.vehicle_id] = lane_numb
+                speed[vehicle.vehicle_id] = vehicle.current_speed
+        return position, lane_numbers, speed
+
+    def vehicle_classes(self):
+        """Returns the vehicle class of every car, indexed by vehicle id."""
+        classes = np.empty(sum(self.lane_sizes()), dtype=np.int8)
+        for vehicle in chain(*self.lanes_list):
+            classes[vehicle.vehicle_id] = vehicle.vehicle_class
+        return classes
 
     def switch_lane(self, lane, position, count=0):
         """
@@ -157,13 +424,33 @@ class Track:
         lane = self.lanes_list[lane]
         if len(lane) == 0:
             return
-        for veh in lane:
-            if veh.position == position:
-                lane.remove(veh)
-                self.lanes_list[new_lane].append(veh)
-                return
+        veh = lane.pop(lane.find(position))
+        self.lanes_list[new_lane].insert(veh)
 
-        raise ValueError(f"No car in lane {lane} at position {position}")
+    def switch_lanes(self, lane, switches):
+        """
+        Applies a batch of lane switches of the cars in ``lane``. ``switches``
+        holds ``(slot, count)`` pairs sorted on slot, where slot is the index of
+        the car in the sorted lane and ``count`` the amount of lanes it moves,
+        like in ``switch_lane``. The cars are taken out by their slot, so no
+        car has to be looked up by its position.
+        """
+        if len(switches) == 0:
+            return
+        self.profiler.count("lane switches made", len(switches))
+        for _, count in switches:
+            new_lane = lane + count
+            assert (
+                0 <= new_lane < self.lanes_count
+            ), f"new lane ({new_lane} out of bounds"
+
+        cars = self.lanes_list[lane].remove_slots([slot for slot, _ in switches])
+        # every lane that gets cars is rebuilt once
+        arrivals = {}
+        for veh, (_, count) in zip(cars, switches):
+            arrivals.setdefault(lane + count, []).append(veh)
+        for new_lane, new_cars in arrivals.items():
+            self.lanes_list[new_lane].insert_many(new_cars)
 
     def car_in_front(self, lane, position):
         """
@@ -171,13 +458,7 @@ class Track:
         or ``None`` if the lane is empty.
         This function assumes the lane is sorted.
         """
-        lane = self.lanes_list[lane]
-        if len(lane) == 0:
-            return None
-        for i, veh in enumerate(lane):
-            if veh.position > position:
-                return lane[i]
-        return lane[0]
+        return self.lanes_list[lane].front(position)
 
     def car_in_back(self, lane, position):
         """
@@ -185,13 +466,7 @@ class Track:
         or ``None`` if the lane is empty.
         This function assumes the lane is sorted.
         """
-        lane = self.lanes_list[lane]
-        if len(lane) == 0:
-            return None
-        for i, veh in reversed(list(enumerate(lane))):
-            if veh.position < position:
-                return lane[i]
-        return lane[-1]
+        return self.lanes_list[lane].back(position)
 
     def closest_cars_sides(self, cur_lane, position):
         """
@@ -0,0 +1,160 @@
+"""
+Writes the trajectories recorded by a ``TrajectoryRecorder`` to disk and reads
+them back. Next to the original csv format, the trajectories can be stored as
+a compressed ``.npz`` archive of the recorded ``(frames, cars)`` arrays, or as
+a Feather or Parquet table with typed columns (these two need pyarrow).
+Whatever the format, ``read_trajectories`` returns the same table as the csv
+file, with the columns id, timestep, alpha, lane and speed.
+
+Long runs can be written chunk by chunk with a ``ChunkWriter``, see
+``StreamingRecorder``.
+"""
+
+import csv
+import os
+import numpy as np
+import pandas as pd
+
+EXPORT_FORMATS = ("csv", "npz", "feather", "parquet")
+
+
+def trajectory_frame(time, position, lane, speed):
+    """
+    Turns the recorded ``(frames, cars)`` arrays into a table with one row per
+    car per timestep, ordered on car like the csv file.
+    """
+    frames, cars = position.shape
+    return pd.DataFrame(
+        {
+            "id": np.repeat(np.arange(cars, dtype=np.int32), frames),
+            "timestep": np.tile(time, cars),
+            "alpha": position.T.ravel(),
+            "lane": lane.T.ravel(),
+            "speed": speed.T.ravel(),
+        }
+    )
+
+
+def csv_values(values):
+    """
+    Returns the values of an array as a list for the csv writer. Floats of less
+    than double precision are written with the digits of their own precision,
+    as a float32 21.676144 and not as the double 21.676143646240234.
+    """
+    if values.dtype.kind == "f" and values.dtype.itemsize < 8:
+        return values.astype(str).tolist()
+    return values.tolist()
+
+
+def write_csv_rows(writer, time, position, lane, speed):
+    """Writes one csv row per car per timestep, ordered on car."""
+    time = csv_values(time)
+    for car_id in range(position.shape[1]):
+        writer.writerows(
+            zip(
+                [car_id] * len(time),
+                time,
+                csv_values(position[:, car_id]),
+                csv_values(lane[:, car_id]),
+                csv_values(speed[:, car_id]),
+            )
+        )
+
+
+def write_trajectories(path, recorder, fmt="csv"):
+    """Writes the frames saved by ``recorder`` to ``path`` in the given format."""
+    write_arrays(path, *recorder.trajectories(), fmt=fmt)
+
+
+def write_arrays(path, time, position, lane, speed, fmt="csv"):
+    """Writes recorded ``(frames, cars)`` arrays to ``path`` in the given format."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unrecognised export format '{fmt}'")
+
+    if fmt == "npz":
+        np.savez_compressed(path, time=time, position=position, lane=lane, speed=speed)
+    elif fmt == "feather":
+        trajectory_frame(time, position, lane, speed).to_feather(path)
+    elif fmt == "parquet":
+        trajectory_frame(time, position, lane, speed).to_parquet(path)
+    else:
+        with open(path, mode="w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["id", "timestep", "alpha", "lane", "speed"])
+            write_csv_rows(writer, time, position, lane, speed)
+
+
+class ChunkWriter:
+    """
+    Writes trajectories to disk one chunk of frames at a time, so they never
+    have to be in memory at once. For csv the chunks are appended to the file
+    ``path + ".csv"``, for the other formats every chunk becomes a numbered
+    file in the directory ``path``. Both are read back by ``read_trajectories``,
+    the rows of a streamed csv file are only ordered on car within a chunk.
+    """
+
+    def __init__(self, path, fmt="csv"):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unrecognised export format '{fmt}'")
+        self.fmt = fmt
+        self.chunks = 0
+        if fmt == "csv":
+            self.path = path + ".csv"
+            self.file = open(self.path, mode="w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(["id", "timestep", "alpha", "lane", "speed"])
+        else:
+            self.path = path
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, time, position, lane, speed):
+        """Writes the next chunk of ``(frames, cars)`` arrays."""
+        if self.fmt == "csv":
+            write_csv_rows(self.writer, time, position, lane, speed)
+        else:
+            chunk = os.path.join(self.path, f"chunk_{self.chunks:05d}.{self.fmt}")
+            write_arrays(chunk, time, position, lane, speed, fmt=self.fmt)
+        self.chunks += 1
+
+    def close(self):
+        if self.fmt == "csv":
+            self.file.close()
+
+
+def read_chunks(path):
+    """Reads the chunk directory written by a ``ChunkWriter`` as one table."""
+    files = sorted(os.listdir(path))
+    if files and files[0].endswith(".npz"):
+        arrays = {"time": [], "position": [], "lane": [], "speed": []}
+        for name in files:
+            with np.load(os.path.join(path, name)) as data:
+                for key, chunks in arrays.items():
+                    chunks.append(data[key])
+        return trajectory_frame(*(np.concatenate(chunks) for chunks in arrays.values()))
+    table = pd.concat(
+        [read_trajectories(os.path.join(path, name)) for name in files],
+        ignore_index=True,
+    )
+    # every chunk is ordered on car, the whole table has to be as well
+    return table.sort_values("id", kind="stable", ignore_index=True)
+
+
+def read_trajectories(path):
+    """
+    Reads a file written by ``write_trajectories``, the format follows from
+    the extension, or the chunk directory of a ``ChunkWriter``. Returns the
+    trajectories as a table.
+    """
+    path = str(path)
+    if os.path.isdir(path):
+        return read_chunks(path)
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return trajectory_frame(
+                data["time"], data["position"], data["lane"], data["speed"]
+            )
+    if path.endswith(".feather"):
+        return pd.read_feather(path)
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
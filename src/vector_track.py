@@ -0,0 +1,553 @@
+import numpy as np
+from .Agent import VehicleType
+from .track_interface import (
+    draw_classes,
+    initial_lane_state,
+    parse_vehicle_mix,
+    resize_track,
+    split_cars,
+)
+from .kernels import follow_lane
+from .profiling import NULL_PROFILER
+
+# the parameter arrays of the cars, and the attribute of ``VehicleType`` they
+# come from
+PARAMETERS = {
+    "desired_speed": "desired_speed",
+    "max_speed": "max_speed",
+    "veh_length": "length",
+    "a_normal": "a_normal",
+    "a_max": "a_max",
+    "b": "b",
+    "TP": "TP",
+    "AC": "AC",
+}
+
+
+class VectorTrack:
+    """
+    Track that stores the state of every car in NumPy arrays (structure of
+    arrays) instead of ``VehicleAgent`` objects. The decision tree, safe speed
+    and noise of ``VehicleAgent`` are evaluated for all cars at once, which
+    gives the same results as ``Track`` for the same random seed.
+
+    Cars are identified by their index in the arrays, ``lane_order`` holds the
+    indices of the cars in every lane in the same order as ``Track.lanes_list``.
+
+    The parameters of the vehicle classes are kept in ``parameter_table``, an
+    array per parameter with a value per class, and ``vehicle_class`` holds the
+    class of every car. The parameter arrays of the cars are taken from the
+    table whenever cars are created, added or removed, so a step reads them
+    like any other state array, whatever the mix of classes.
+    """
+
+    def __init__(
+        self,
+        lane_count=2,
+        length=2000,
+        dt=1.0,
+        central_control=False,
+        max_accel=1,
+        speed_push=0.5,
+        rng=None,
+        profiler=None,
+    ):
+        self.lanes_count = lane_count
+        # Rightmost lane has index 0 and is the slow lane.
+        self.lane_order = [np.empty(0, dtype=np.intp) for _ in range(lane_count)]
+        self.length = length
+        self.dt = dt
+
+        self.central_control = central_control
+        self.max_accel = max_accel
+        self.speed_push = speed_push
+        # all randomness of the simulation comes from this generator
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # counts what the track does when profiling, see ``profiling.Profiler``
+        self.profiler = profiler if profiler is not None else NULL_PROFILER
+
+        self.allocate(0)
+
+    def allocate(
+        self,
+        N,
+        desired_speed=30,
+        max_speed=35,
+        length=5,
+        a_normal=3.05,
+        a_max=6.04,
+        b=0.2,
+        TP=1.2,
+        AC=0.5,
+    ):
+        """
+        Creates the state arrays for ``N`` cars of a single vehicle class, the
+        parameters have the same defaults and meaning as the ones of
+        ``VehicleAgent``.
+        """
+        self.position = np.zeros(N)
+        self.current_speed = np.zeros(N)
+        self.next_speed = np.zeros(N)
+        self.acceleration = np.zeros(N)
+        self.lane = np.zeros(N, dtype=np.intp)
+
+        self.vehicle_types = [
+            VehicleType(desired_speed, max_speed, length, a_normal, a_max, b, TP, AC)
+        ]
+        self.class_fractions = np.ones(1)
+        self.vehicle_class = np.zeros(N, dtype=np.int8)
+        self.set_parameters()
+
+    def set_parameters(self):
+        """
+        Builds ``parameter_table`` from ``vehicle_types`` and gives every car
+        the parameters of its class.
+        """
+        self.parameter_table = {
+            name: np.array(
+                [getattr(t, attribute) for t in self.vehicle_types], dtype=float
+            )
+            for name, attribute in PARAMETERS.items()
+        }
+        for name, values in self.parameter_table.items():
+            setattr(self, name, values[self.vehicle_class])
+
+    def init_cars(self, density=10, equal_lanes=False, vehicle_mix=None):
+        """
+        Puts cars on the track at the given density (veh/km), with the vehicle
+        classes of ``vehicle_mix``, see ``Track.init_cars``.
+        """
+        vehicle_types, class_fractions = parse_vehicle_mix(vehicle_mix)
+        split_points = split_cars(
+            density, self.length, self.lanes_count, self.rng, equal_lanes
+        )
+        self.allocate(split_points[-1])
+        self.vehicle_types = vehicle_types
+        self.class_fractions = class_fractions
+        self.vehicle_class = draw_classes(class_fractions, split_points[-1], self.rng)
+        self.set_parameters()
+
+        past_amount = 0
+        lane = 0
+        for total in split_points:
+            ids = np.arange(past_amount, total)
+            self.position[ids], self.current_speed[ids] = initial_lane_state(
+                total - past_amount, self.length, self.rng, self.veh_length[ids]
+            )
+            self.lane[ids] = lane
+            self.lane_order[lane] = ids
+            past_amount = total
+            lane += 1
+
+    def set_density(self, density):
+        """
+        Adds or removes cars until the track has the given density (veh/km),
+        keeping the state of the other cars, see ``resize_track``.
+        """
+        resize_track(self, int((self.length / 1000) * density))
+
+    def lane_state(self, lane):
+        """Returns the sorted positions and the speeds of the cars of a lane."""
+        ids = self.lane_order[lane]
+        return self.position[ids], self.current_speed[ids]
+
+    def add_car(self, lane, position, speed, vehicle_class=None):
+        """
+        Adds a car to a lane, at the end of the state arrays. Its class is
+        drawn from the vehicle mix when it is not given.
+        """
+        if vehicle_class is None:
+            vehicle_class = draw_classes(self.class_fractions, 1, self.rng)[0]
+        car = len(self.position)
+        state = {
+            "position": position,
+            "current_speed": speed,
+            "next_speed": 0.0,
+            "acceleration": 0.0,
+            "vehicle_class": vehicle_class,
+        }
+        for name, values in self.parameter_table.items():
+            state[name] = values[vehicle_class]
+        for name, value in state.items():
+            setattr(self, name, np.append(getattr(self, name), value))
+        self.lane = np.append(self.lane, lane)
+        ids = self.lane_order[lane]
+        slot = np.searchsorted(self.position[ids], position, side="right")
+        self.lane_order[lane] = np.insert(ids, slot, car)
+
+    def remove_car(self, lane, slot):
+        """
+        Removes the car at sorted index ``slot`` of a lane from the state
+        arrays. The cars after it move down by one, like the vehicle ids of
+        ``Track.remove_car``.
+        """
+        car = self.lane_order[lane][slot]
+        self.lane_order[lane] = np.delete(self.lane_order[lane], slot)
+        names = ["position", "current_speed", "next_speed", "acceleration"]
+        for name in names + ["vehicle_class"] + list(PARAMETERS):
+            setattr(self, name, np.delete(getattr(self, name), car))
+        self.lane = np.delete(self.lane, car)
+        for i, ids in enumerate(self.lane_order):
+            self.lane_order[i] = ids - (ids > car)
+
+    def update_lanes(self, wrapped=None):
+        """
+        Keeps the cars of every lane sorted on their position after they moved,
+        the same way ``Lane.update`` does. ``wrapped`` holds the amount of cars
+        per lane that were moved back to the start of the track.
+        """
+        for i, ids in enumerate(self.lane_order):
+            if wrapped is not None and wrapped[i] > 0:
+                ids = np.roll(ids, wrapped[i])
+            lane_pos = self.position[ids]
+            if np.any(lane_pos[1:] < lane_pos[:-1]):
+                # only happens after an overtake
+                ids = ids[np.argsort(lane_pos, kind="stable")]
+                self.profiler.count("lane sorts")
+            self.lane_order[i] = ids
+
+    # LANE SWITCHING =======================================================
+    # Like ``Track``, the cars of a lane all decide on the state of the track
+    # before any of them moves, so the decisions of a whole lane are made at
+    # once. The lanes are still resolved one after another.
+
+    def _neighbours(self, ids, lane):
+        """
+        Returns the cars in front of and behind the cars ``ids`` in the sorted
+        ``lane``, wrapping around like ``Lane.front`` and ``Lane.back``.
+        """
+        lane_pos = self.position[lane]
+        pos = self.position[ids]
+        front = np.searchsorted(lane_pos, pos, side="right")
+        front[front == len(lane)] = 0
+        # an index of -1 wraps around to the last car
+        back = np.searchsorted(lane_pos, pos, side="left") - 1
+        return lane[front], lane[back]
+
+    def _can_switch_lane(self, ids, lane_i):
+        """
+        Vectorized ``VehicleAgent.can_switch_lane`` of the cars ``ids`` to the
+        lane ``lane_i``. Also returns the cars in front of them in that lane,
+        or ``None`` if it is empty or does not exist.
+        """
+        if not 0 <= lane_i < self.lanes_count:
+            # No lane here
+            return np.zeros(len(ids), dtype=bool), None
+        lane = self.lane_order[lane_i]
+        if len(lane) == 0:
+            # Lane is empty
+            return np.ones(len(ids), dtype=bool), None
+
+        car_front, car_behind = self._neighbours(ids, lane)
+        pos = self.position[ids]
+        length = self.veh_length[ids]
+        front_pos = self.position[car_front]
+        front_end = front_pos - self.veh_length[car_front]
+        can_switch = np.where(
+            car_front == car_behind,
+            (pos < front_end) | (pos - length > front_pos),
+            ~(pos > front_end) & ~(pos - length < self.position[car_behind]),
+        )
+        return can_switch, car_front
+
+    def switch_lanes(self, lane, count):
+        """
+        Moves every car of ``lane`` by its entry in ``count``, which follows
+        the sorted order of the lane. The moved cars are inserted at their
+        sorted position in the new lanes.
+        """
+        ids = self.lane_order[lane]
+        moving = count != 0
+        if not np.any(moving):
+            return
+        self.profiler.count("lane switches made", int(np.count_nonzero(moving)))
+        self.lane_order[lane] = ids[~moving]
+        for new_lane in (lane - 1, lane + 1):
+            arrivals = ids[moving & (lane + count == new_lane)]
+            if len(arrivals) == 0:
+                continue
+            target = self.lane_order[new_lane]
+            slots = np.searchsorted(
+                self.position[target], self.position[arrivals], side="right"
+            )
+            self.lane_order[new_lane] = np.insert(target, slots, arrivals)
+
+    def lane_switches(self):
+        for i in range(self.lanes_count):
+            ids = self.lane_order[i]
+            if len(ids) == 0:
+                continue
+            can_go_left, _ = self._can_switch_lane(ids, i + 1)
+            can_go_right, car_front_right = self._can_switch_lane(ids, i - 1)
+
+            # the decision of VehicleAgent.traditional_lane_switch
+            car_front, _ = self._neighbours(ids, ids)
+            pos = self.position[ids]
+            speed = self.current_speed[ids]
+            speed_difference = self.current_speed[car_front] - speed
+            gap = (self.position[car_front] - pos) % self.length
+            # Car in front is close and slow enough the passing lane is preferred.
+            passing = (speed_difference < -5.0) & (gap < speed * 5.0)
+            if car_front_right is None:
+                # Slow lane is empty
+                far_right = np.ones(len(ids), dtype=bool)
+            else:
+                # Next car in slow lane is far enough away
+                gap_fr = (self.position[car_front_right] - pos) % self.length
+                far_right = gap_fr > 200
+            count = np.where(
+                passing,
+                np.where(can_go_left, 1, 0),
+                np.where(can_go_right & far_right, -1, 0),
+            )
+            self.profiler.count("lane switches considered", len(ids))
+            self.profiler.count("leader lookups", len(ids))
+            self.switch_lanes(i, count)
+
+    def lane_switches_central(self, prefered_per_lane):
+        for lane_i in range(self.lanes_count):
+            ids = self.lane_order[lane_i]
+            if len(ids) <= prefered_per_lane[lane_i]:
+                continue
+            can_go_left, _ = self._can_switch_lane(ids, lane_i + 1)
+            can_go_right, _ = self._can_switch_lane(ids, lane_i - 1)
+            count = np.where(can_go_left, 1, np.where(can_go_right, -1, 0))
+            # a random choice for every car, used when it can go either way
+            choices = self.rng.integers(0, 2, size=len(ids))
+            both = can_go_left & can_go_right
+            count[both] = np.where(choices[both] == 0, 1, -1)
+            # only the first cars above the preferred amount leave the lane
+            excess = len(ids) - prefered_per_lane[lane_i]
+            count[np.flatnonzero(count)[excess:]] = 0
+            self.profiler.count("lane switches considered", len(ids))
+            self.profiler.count("leader lookups", len(ids))
+            self.switch_lanes(lane_i, count)
+
+    # CAR FOLLOWING ========================================================
+
+    def compute_decision(self, ids, gap, vL, aL):
+        """
+        Vectorized ``VehicleAgent.compute_decision``, returns the acceleration
+        of the cars ``ids``.
+        """
+        vF = self.current_speed[ids]
+        desired_speed = self.desired_speed[ids]
+        gap_desire = vF * self.TP[ids]
+
+        accelerate = np.where(vF <= 12.19, 1.1, 0.37)
+        deccelerate = self.decceleration_rate(ids, vF, vL, aL, gap, gap_desire)
+
+        delta = gap - gap_desire
+        delta_free = vF - desired_speed
+        near = gap < 6 * vF
+        keep_distance = (gap > 2 * vF) & (gap > 7.5)
+        return np.select(
+            [
+                near & (delta > 0) & (vL >= vF),
+                near & (delta > 0) & (gap > 3 * vF),
+                near & (delta > 0) & keep_distance,
+                near & (delta > 0),
+                near & (delta == 0) & (vL >= vF),
+                near & (delta == 0),
+                near & (delta < 0) & (vL > vF),
+                near & (delta < 0),
+                ~near & (delta_free < 0),
+                ~near & (delta_free == 0),
+                ~near & (delta_free > 0),
+            ],
+            [
+                accelerate,
+                accelerate,
+                0,
+                deccelerate,
+                0,
+                deccelerate,
+                0,
+                deccelerate,
+                accelerate,
+                0,
+                deccelerate,
+            ],
+            self.acceleration[ids],
+        )
+
+    def decceleration_rate(self, ids, vF, vL, aL, gap, gap_desire):
+        """Vectorized ``VehicleAgent.decceleration_rate``."""
+        desired_speed = self.desired_speed[ids]
+        a_normal = self.a_normal[ids]
+        delta = gap - gap_desire
+        return np.select(
+            [
+                # case 1: free flowing case
+                vF > desired_speed,
+                # case 2: car-following regime, normal decceleration
+                (delta == 0) & ~(vL >= vF),
+                # case 3: emergency decceleration
+                (delta < 0) & ~(vL > vF),
+                # case 4: near-collision decceleration
+                (delta > 0)
+                & ~(vL >= vF)
+                & ~(gap > 3 * vF)
+                & ~((gap > 2 * vF) & (gap > 7.5)),
+            ],
+            [
+                np.minimum((vF - desired_speed) / 3, a_normal),
+                (vF * vF - vL * vL) / (2 * gap),
+                aL - 0.25 * a_normal,
+                np.minimum(aL + ((vF - vL) * (vF - vL) / (2 * gap)), self.a_max[ids]),
+            ],
+            0,
+        )
+
+    def compute_safe_speed(self, ids, gap, vL):
+        """Vectorized ``VehicleAgent.compute_safe_speed``."""
+        reaction_time = 1
+        return vL + (
+            (gap - vL * reaction_time)
+            / (reaction_time + ((self.current_speed[ids] + vL) / (2 * self.a_max[ids])))
+        )
+
+    def calculate_next_state(self):
+        # the cars in the order in which ``Track`` visits them
+        ids = np.concatenate(self.lane_order)
+        self.profiler.count("leader lookups", len(ids))
+        leader = np.empty_like(ids)
+        # leaders which were already visited use their new acceleration
+        wrapped = np.zeros(len(ids), dtype=bool)
+        start = 0
+        for lane in self.lane_order:
+            lane_pos = self.position[lane]
+            # first car with a larger position, or the first car of the lane
+            front = np.searchsorted(lane_pos, lane_pos, side="right")
+            front[front == len(lane)] = 0
+            leader[start : start + len(lane)] = lane[front]
+            wrapped[start : start + len(lane)] = front < np.arange(len(lane))
+            start += len(lane)
+
+        alone = leader == ids
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap = (self.position[leader] - self.position[ids]) % self.length
+            gap = np.maximum(0, gap - self.veh_length[leader])
+            gap[alone] = np.inf
+            vL = np.where(alone, np.inf, self.current_speed[leader])
+            aL = np.where(alone, np.inf, self.acceleration[leader])
+
+            acceleration = self.compute_decision(ids, gap, vL, aL)
+            self.acceleration[ids] = acceleration
+            if np.any(wrapped):
+                aL[wrapped] = self.acceleration[leader[wrapped]]
+                self.acceleration[ids[wrapped]] = self.compute_decision(
+                    ids[wrapped], gap[wrapped], vL[wrapped], aL[wrapped]
+                )
+
+            v_safe = self.compute_safe_speed(ids, gap, vL)
+            # fmin ignores the NaN safe speed of a car that is alone in its lane
+            v_ideal = np.fmin(
+                np.minimum(
+                    self.max_speed[ids],
+                    self.current_speed[ids] + self.acceleration[ids] * self.dt,
+                ),
+                v_safe,
+            )
+
+            # the noise of every car for this step, drawn at once
+            noise = self.rng.random(len(ids))
+            if not self.central_control:
+                self.next_speed[ids] = np.maximum(0, v_ideal - self.b[ids] * noise)
+                return
+
+            next_speed = np.maximum(0, v_ideal - self.b[ids] * 0.5)
+            mean_speed = np.empty(len(ids))
+            start = 0
+            for lane in self.lane_order:
+                if len(lane) > 0:
+                    # summed like ``Track`` does, so both agree to the last bit
+                    lane_speeds = self.current_speed[lane].tolist()
+                    mean_speed[start : start + len(lane)] = sum(lane_speeds) / len(lane)
+                start += len(lane)
+            dif_speed = np.clip(
+                mean_speed - next_speed, -self.max_accel, self.max_accel
+            )
+            next_speed += dif_speed
+            # if with these speeds there is a collision in 3 seconds don't try and increase the average mean_speed
+            push = 0 < gap + 3 * (vL - next_speed)
+            push &= noise < self.AC[ids]
+            next_speed[push] += self.speed_push
+            self.next_speed[ids] = next_speed
+
+    def update_state(self):
+        for lane_numb, lane in enumerate(self.lane_order):
+            self.lane[lane] = lane_numb
+        self.current_speed[:] = self.next_speed
+        self.position += self.current_speed * self.dt
+        self.update_lanes()
+
+    def apply_periodic_boundary(self):
+        """
+        Moves every car that drove past the end of the track back to the start
+        and returns the amount of cars that crossed the end.
+        """
+        crossed = self.position >= self.length
+        self.position[crossed] -= self.length
+        wrapped = [np.count_nonzero(crossed[ids]) for ids in self.lane_order]
+        self.update_lanes(wrapped)
+        return int(np.count_nonzero(crossed))
+
+    def lane_sizes(self):
+        """Returns the amount of cars in every lane."""
+        return [len(lane) for lane in self.lane_order]
+
+    def mean_speed(self):
+        """Returns the mean of the current speed of all cars on the track."""
+        return np.mean(self.current_speed[np.concatenate(self.lane_order)])
+
+    def vehicle_classes(self):
+        """Returns the vehicle class of every car, indexed by vehicle id."""
+        return self.vehicle_class
+
+    def snapshot(self):
+        """
+        Returns the ``(position, lane, speed)`` of all cars as arrays indexed
+        by vehicle id, the same as ``Track.snapshot``. The arrays are not
+        copied.
+        """
+        return self.position, self.lane, self.current_speed
+
+
+class CompiledTrack(VectorTrack):
+    """
+    ``VectorTrack`` that computes the car following of every lane in a single
+    loop over the cars, ``kernels.follow_lane``, which is compiled with Numba
+    when it is installed. The branches of the decision tree are then only
+    evaluated for the cars that take them, instead of for all cars at once.
+    Gives the same results as ``Track`` and ``VectorTrack``.
+    """
+
+    def calculate_next_state(self):
+        # the noise of every car for this step, drawn at once
+        noise = self.rng.random(sum(self.lane_sizes()))
+        self.profiler.count("leader lookups", len(noise))
+        start = 0
+        for lane in self.lane_order:
+            follow_lane(
+                lane,
+                self.position,
+                self.current_speed,
+                self.acceleration,
+                self.next_speed,
+                self.veh_length,
+                self.desired_speed,
+                self.max_speed,
+                self.a_normal,
+                self.a_max,
+                self.b,
+                self.TP,
+                self.AC,
+                noise[start : start + len(lane)],
+                self.length,
+                self.dt,
+                self.central_control,
+                self.max_accel,
+                self.speed_push,
+            )
+            start += len(lane)
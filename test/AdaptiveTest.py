@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from src.adaptive import confidence_interval, interval_scores, t_quantile
+from src.model import Model
+
+
+class AdaptiveTest(unittest.TestCase):
+    def make_model(self):
+        model = Model(total_time=100, lane_count=2, engine="vector", seed=5)
+        model.density_values = np.array([0, 120])
+        return model
+
+    def test_interval_scores(self):
+        """A straight diagram only scores the spread, a bend scores its sides."""
+        densities = np.array([0.0, 10.0, 20.0, 30.0])
+        straight = interval_scores(densities, [[0, 0], [10, 10], [20, 20], [30, 30]])
+        np.testing.assert_array_equal(straight, [0, 0, 0])
+        noisy = interval_scores(densities, [[0, 0], [8, 12], [20, 20], [30, 30]])
+        self.assertTrue(noisy[0] > 0 and noisy[1] > 0)
+
+        bend = interval_scores(densities, [[0], [10], [20], [20]])
+        np.testing.assert_array_equal(bend, [0, 5, 5])
+
+    def test_budget(self):
+        """The sweep spends its budget and keeps the ends of the range."""
+        model = self.make_model()
+        model.adaptive_sweep(budget=16, initial=3, runs=2)
+        self.assertEqual(len(model.density_values), 8)
+        self.assertEqual(model.density_values[0], 0)
+        self.assertEqual(model.density_values[-1], 120)
+        self.assertTrue(np.all(np.diff(model.density_values) > 0))
+        self.assertEqual(model.total_runs, 2)
+        self.assertEqual(np.shape(model.flow_results), (2, 8))
+        self.assertEqual(np.shape(model.speed_results), (2, 8))
+
+    def test_min_spacing(self):
+        model = self.make_model()
+        model.adaptive_sweep(budget=100, initial=3, runs=1, min_spacing=20)
+        np.testing.assert_array_equal(model.density_values, [0, 30, 60, 90, 120])
+
+    def test_reproducible(self):
+        """The same seed gives the same grid, serial or parallel."""
+        results = []
+        for processes, batch in ((1, 2), (2, 2)):
+            model = self.make_model()
+            model.adaptive_sweep(
+                budget=12, initial=3, runs=2, batch=batch, processes=processes
+            )
+            results.append((list(model.density_values), model.flow_results))
+        self.assertEqual(results[0], results[1])
+
+    def test_small_budget(self):
+        with self.assertRaises(ValueError):
+            self.make_model().adaptive_sweep(budget=5, initial=3, runs=2)
+
+    def test_t_quantile(self):
+        for df, expected in ((3, 3.182), (4, 2.776), (9, 2.262), (49, 2.010)):
+            self.assertAlmostEqual(t_quantile(0.975, df), expected, places=2)
+        # the expansion is far off for the smallest amounts of runs
+        for df, expected in ((1, 12.706), (2, 4.303), (29, 2.045)):
+            self.assertAlmostEqual(t_quantile(0.975, df), expected, places=3)
+        self.assertAlmostEqual(t_quantile(0.995, 1), 63.657, places=3)
+        self.assertAlmostEqual(t_quantile(0.025, 1), -12.706, places=3)
+
+    def test_confidence_interval(self):
+        mean, width = confidence_interval([1.0, 2.0, 3.0, 4.0, 5.0])
+        self.assertEqual(mean, 3.0)
+        self.assertAlmostEqual(width, 2 * 2.776 * np.sqrt(2.5 / 5), places=2)
+        mean, width = confidence_interval([np.nan, np.nan])
+        self.assertTrue(np.isnan(mean))
+        self.assertEqual(width, 0)
+
+    def test_adaptive_runs(self):
+        """Noisy densities get more runs, up to the cap, with the seeds of ``run``."""
+        model = Model(total_time=100, lane_count=2, engine="vector", seed=5)
+        model.density_values = np.array([0, 60])
+        model.adaptive_runs(flow_width=1, speed_width=0.01, min_runs=3, max_runs=20)
+        self.assertEqual([ci["runs"] for ci in model.ci_results], [3, 20])
+        self.assertEqual(model.total_runs, 20)
+        self.assertTrue(np.isnan(model.flow_results[3][0]))
+        self.assertGreater(model.ci_results[1]["flow_width"], 0)
+
+        serial = Model(total_time=100, lane_count=2, engine="vector", seed=5)
+        serial.density_values = model.density_values
+        serial.run(4)
+        self.assertEqual(serial.flow_results[4][1], model.flow_results[4][1])
+
+    def test_adaptive_runs_converge(self):
+        model = Model(total_time=100, lane_count=2, engine="vector", seed=5)
+        model.density_values = np.array([60])
+        model.adaptive_runs(flow_width=1e6, speed_width=1e6, min_runs=4)
+        self.assertEqual(model.ci_results[0]["runs"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
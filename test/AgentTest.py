@@ -1,5 +1,5 @@
 import unittest
-from src.Agent import VehicleAgent
+from src.Agent import DEFAULT_TYPE, VehicleAgent, VehicleType
 
 
 class AgentTest(unittest.TestCase):
@@ -87,6 +87,28 @@ class AgentTest(unittest.TestCase):
             v_safe, 39.59, delta=0.1
         )  # within a standard deviation of 0.1 we find it OK
 
+    def test_vehicle_type(self):
+        """
+        The parameters of an agent live in its VehicleType, which is shared by
+        all agents with the same parameters. Changing a parameter of one agent
+        gives it a type of its own, so the other agents keep theirs.
+        """
+
+        other = VehicleAgent(position=0, current_speed=10)
+        self.assertIs(other.vehicle_type, DEFAULT_TYPE)
+        self.assertFalse(hasattr(other, "__dict__"))
+
+        other.TP = 2.0
+        self.assertEqual(other.TP, 2.0)
+        self.assertEqual(self.agent.TP, 1.2)
+        self.assertEqual(DEFAULT_TYPE.TP, 1.2)
+
+        truck = VehicleType(length=12, max_speed=25)
+        agent = VehicleAgent(position=0, current_speed=10, vehicle_type=truck)
+        self.assertEqual((agent.length, agent.max_speed, agent.b), (12, 25, 0.2))
+        same = VehicleAgent(position=0, current_speed=10, length=12, max_speed=25)
+        self.assertEqual(same.vehicle_type, truck)
+
 
 if __name__ == "__main__":
     unittest.main()  # run the tests
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from PIL import Image
+from src.circular_animation import (
+    alpha_to_xy,
+    frame_rows,
+    prepare_frames,
+    render_headless,
+    select_timesteps,
+)
+
+
+class AnimationTest(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "id": [0, 0, 0, 1, 1, 1],
+                "timestep": [0.0, 1.0, 2.0, 0.0, 1.0, 2.0],
+                "alpha": [0.0, 500.0, 1000.0, 100.0, 600.0, 1100.0],
+                "lane": [0, 0, 1, 1, 1, 1],
+                "speed": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            }
+        )
+        self.frames = prepare_frames(self.df)
+
+    def test_grouped_per_timestep(self):
+        """The rows of a timestep are one slice, in the order of the cars."""
+        np.testing.assert_array_equal(self.frames["timesteps"], [0, 1, 2])
+        rows = frame_rows(self.frames, 1.0)
+        np.testing.assert_array_equal(self.frames["speed"][rows], [2, 5])
+        x, y = alpha_to_xy(np.array([500.0, 600.0]), np.array([0, 1]))
+        np.testing.assert_array_equal(self.frames["xy"][rows], np.column_stack((x, y)))
+
+    def test_missing_timestep(self):
+        """A timestep without data gives an empty frame."""
+        self.assertEqual(len(self.frames["xy"][frame_rows(self.frames, 1.5)]), 0)
+        self.assertEqual(len(self.frames["xy"][frame_rows(self.frames, 3.0)]), 0)
+
+    def test_select_timesteps(self):
+        """Frames are subsampled by step, or spread evenly to a frame count."""
+        self.assertEqual(select_timesteps(range(10), every=3), [0, 3, 6, 9])
+        self.assertEqual(select_timesteps(range(10), frames=4), [0, 3, 6, 9])
+        self.assertEqual(select_timesteps(range(3), frames=5), [0, 1, 2])
+
+    def test_render_headless(self):
+        """The rendered frames are stitched into a GIF, without a window."""
+        with tempfile.TemporaryDirectory() as directory:
+            data_file = os.path.join(directory, "data.csv")
+            output_file = os.path.join(directory, "out.gif")
+            self.df.to_csv(data_file, index=False)
+            render_headless(data_file, data_file, output_file, [0.0, 2.0], fps=10)
+            with Image.open(output_file) as gif:
+                self.assertEqual(gif.n_frames, 2)
+                self.assertEqual(gif.info["duration"], 100)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
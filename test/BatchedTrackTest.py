@@ -0,0 +1,110 @@
+import unittest
+import numpy as np
+from src.batched_track import BatchedTrack
+from src.model import Model
+from src.vector_track import VectorTrack
+
+
+class BatchedTrackTest(unittest.TestCase):
+    def make_model(self, **kwargs):
+        model = Model(total_time=150, engine="vector", seed=4, **kwargs)
+        model.density_values = np.array([0, 15, 60, 140])
+        model.total_runs = 3
+        return model
+
+    def assert_same_as_run(self, stack_densities=True, **kwargs):
+        """Every ring gives exactly the results of simulating it on its own."""
+        serial = self.make_model(**kwargs)
+        for idx in range(serial.total_runs):
+            serial.run(idx)
+        batched = self.make_model(**kwargs)
+        batched.run_batched(stack_densities=stack_densities)
+        self.assertEqual(batched.flow_results, serial.flow_results[:3])
+        np.testing.assert_array_equal(batched.speed_results, serial.speed_results[:3])
+        self.assertEqual(batched.steps_results, serial.steps_results[:3])
+
+    def test_single_lane(self):
+        self.assert_same_as_run(lane_count=1)
+
+    def test_lane_switches(self):
+        self.assert_same_as_run(lane_count=2)
+        self.assert_same_as_run(lane_count=3, stack_densities=False)
+
+    def test_central_control(self):
+        self.assert_same_as_run(lane_count=2, central_control=True)
+
+    def test_measurement_window(self):
+        self.assert_same_as_run(lane_count=2, warmup_time=100, measure_time=50)
+
+    def test_sorted(self):
+        """The cars stay sorted on ring, lane and position."""
+        track = BatchedTrack(lane_count=2)
+        rngs = [np.random.default_rng(seed) for seed in range(3)]
+        track.init_rings([30, 0, 90], rngs)
+        self.assertEqual(list(track.ring_lane_sizes().sum(axis=1)), [60, 0, 180])
+        for _ in range(50):
+            track.lane_switches()
+            track.calculate_next_state()
+            track.update_state()
+            track.apply_periodic_boundary()
+            order = np.lexsort((track.position, track.segments()))
+            np.testing.assert_array_equal(order, np.arange(len(order)))
+        self.assertEqual(list(track.ring_lane_sizes().sum(axis=1)), [60, 0, 180])
+
+    def test_snapshot(self):
+        """The snapshot of every ring is that of the ring on its own."""
+        track = BatchedTrack(lane_count=2)
+        track.init_rings([40, 90], [np.random.default_rng(s) for s in range(2)])
+        rings = []
+        for seed, density in enumerate([40, 90]):
+            ring = VectorTrack(lane_count=2, rng=np.random.default_rng(seed))
+            ring.init_cars(density)
+            rings.append(ring)
+        for _ in range(30):
+            for engine in [track] + rings:
+                engine.lane_switches()
+                engine.calculate_next_state()
+                engine.update_state()
+                engine.apply_periodic_boundary()
+        for r, ring in enumerate(rings):
+            block = slice(track.ring_start[r], track.ring_start[r + 1])
+            for batched, single in zip(track.snapshot(), ring.snapshot()):
+                np.testing.assert_array_equal(batched[block], single)
+            for lane in range(2):
+                for batched, single in zip(
+                    track.lane_state(lane, ring=r), ring.lane_state(lane)
+                ):
+                    np.testing.assert_array_equal(batched, single)
+        speeds = np.concatenate([ring.current_speed for ring in rings])
+        self.assertAlmostEqual(track.mean_speed(), np.mean(speeds))
+
+    def test_fixed_cars(self):
+        """The cars of the rings are only set up by init_rings."""
+        track = BatchedTrack(lane_count=2)
+        track.init_rings([40, 90], [np.random.default_rng(s) for s in range(2)])
+        calls = [
+            lambda: track.init_cars(40),
+            lambda: track.set_density(50),
+            lambda: track.add_car(0, 10.0, 5.0),
+            lambda: track.remove_car(0, 0),
+        ]
+        for call in calls:
+            with self.assertRaises(NotImplementedError):
+                call()
+        self.assertEqual(len(track.position), 260)
+
+    def test_unsupported(self):
+        """The options a batched run can not honour are refused, each on its own."""
+        cases = [
+            ({"steady_window": 50}, {}, "steady state"),
+            ({"warmup_time": 50, "warm_start_time": 20}, {}, "warm-start"),
+            ({"profile": True}, {}, "profiled"),
+            ({}, {"export_data": True}, "export"),
+        ]
+        for options, arguments, message in cases:
+            with self.assertRaisesRegex(ValueError, message):
+                self.make_model(**options).run_batched(**arguments)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
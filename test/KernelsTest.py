@@ -0,0 +1,118 @@
+import itertools
+import unittest
+import numpy as np
+from src import kernels
+from src.Agent import VehicleAgent
+from src.model import Model
+
+
+class KernelsTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(KernelsTest, self).__init__(*args, **kwargs)
+        # speeds and gaps around the boundaries of the decision tree
+        speeds = [0.0, 5.0, 12.19, 20.0, 30.0, 33.0]
+        gaps = [0.0, 3.0, 7.5, 12.0, 24.0, 36.0, 60.0, 150.0, 400.0, np.inf]
+        self.cases = list(itertools.product(speeds, speeds, [-2.0, 0.0, 1.1], gaps))
+        self.cases += [(10.0, 5.0, 0.0, 12.0), (10.0, 10.0, 0.0, 12.0)]
+
+    def test_compute_decision(self):
+        """The compiled decision tree picks the same acceleration as the agent."""
+        for vF, vL, aL, gap in self.cases:
+            agent = VehicleAgent(0, vF)
+            agent.acceleration = 0.5
+            agent.compute_decision(gap, vL, aL)
+            acceleration = kernels.compute_decision(
+                vF, vL, aL, gap, 0.5, 30.0, 3.05, 6.04, 1.2
+            )
+            self.assertEqual(acceleration, agent.acceleration, (vF, vL, aL, gap))
+
+    def test_decceleration_rate(self):
+        for vF, vL, aL, gap in self.cases:
+            agent = VehicleAgent(0, vF)
+            gap_desire = vF * agent.TP
+            self.assertEqual(
+                kernels.decceleration_rate(
+                    vF, vL, aL, gap, gap_desire, 30.0, 3.05, 6.04
+                ),
+                agent.decceleration_rate(vF, vL, aL, gap, gap_desire),
+                (vF, vL, aL, gap),
+            )
+
+    def test_compute_safe_speed(self):
+        for vF, vL, _, gap in self.cases:
+            agent = VehicleAgent(0, vF)
+            np.testing.assert_equal(
+                kernels.compute_safe_speed(vF, vL, gap, 6.04),
+                agent.compute_safe_speed(gap, vL),
+            )
+
+    def assert_same_lane(self, central_control, positions):
+        """
+        Updates a lane of agents like ``Track.calculate_next_state`` does and
+        compares it with ``follow_lane`` on the same state.
+        """
+        rng = np.random.default_rng(2)
+        n = len(positions)
+        speeds = rng.random(n) * 30
+        noise = rng.random(n)
+        agents = [VehicleAgent(p, v) for p, v in zip(positions, speeds)]
+        mean_speed = sum(speeds.tolist()) / n if central_control else None
+        for i, agent in enumerate(agents):
+            leader = agents[(i + 1) % n]
+            gap = max(0, (leader.position - agent.position) % 2000 - leader.length)
+            if leader is agent:
+                gap = leader_speed = leader_acceleration = np.inf
+            else:
+                leader_speed = leader.current_speed
+                leader_acceleration = leader.acceleration
+            agent.calculate_next_state(
+                gap, leader_speed, leader_acceleration, 1.0, mean_speed, noise=noise[i]
+            )
+
+        acceleration = np.zeros(n)
+        next_speed = np.zeros(n)
+        kernels.follow_lane(
+            np.arange(n),
+            np.array(positions, dtype=float),
+            speeds,
+            acceleration,
+            next_speed,
+            *(np.full(n, value) for value in (5, 30, 35, 3.05, 6.04, 0.2, 1.2, 0.5)),
+            noise,
+            2000,
+            1.0,
+            central_control,
+            1,
+            0.5,
+        )
+        np.testing.assert_array_equal(acceleration, [a.acceleration for a in agents])
+        np.testing.assert_array_equal(next_speed, [a.next_speed for a in agents])
+
+    def test_follow_lane(self):
+        """A whole lane is updated like the agents, wrapping around the track."""
+        positions = [10.0, 18.0, 40.0, 300.0, 1000.0, 1990.0]
+        self.assert_same_lane(False, positions)
+        self.assert_same_lane(True, positions)
+        self.assert_same_lane(False, [500.0])
+        self.assert_same_lane(True, [500.0])
+
+    def test_compiled_engine(self):
+        """The compiled engine gives exactly the same results as the agents."""
+        for lane_count, central_control in [(1, False), (2, False), (2, True)]:
+            results = []
+            for engine in ("agent", "compiled"):
+                model = Model(
+                    total_time=200,
+                    lane_count=lane_count,
+                    central_control=central_control,
+                    engine=engine,
+                    seed=1,
+                )
+                model.density_values = np.array([15, 60, 140])
+                model.run(0)
+                results.append((model.flow_results[0], model.speed_results[0]))
+            self.assertEqual(results[0], results[1])
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
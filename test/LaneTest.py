@@ -0,0 +1,103 @@
+import unittest
+from src.Agent import VehicleAgent
+from src.lane import Lane
+
+
+class LaneTest(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super(LaneTest, self).__init__(*args, **kwargs)
+        self.cars = [VehicleAgent(position, 20) for position in (300, 100, 200)]
+
+    def setUp(self):
+        self.lane = Lane(self.cars)
+        self.lane.sort()
+
+    def test_sort(self):
+        """The lane is ordered on position, together with its index."""
+        self.assertEqual([car.position for car in self.lane], [100, 200, 300])
+        self.assertEqual(self.lane.positions, [100, 200, 300])
+
+    def test_front_and_back(self):
+        """
+        The car in front is the first car with a larger position, the car behind
+        the last one with a smaller position. Both wrap around the lane.
+        """
+        self.assertIs(self.lane.front(150), self.cars[2])
+        self.assertIs(self.lane.front(200), self.cars[0])
+        self.assertIs(self.lane.front(300), self.cars[1])
+        self.assertIs(self.lane.back(200), self.cars[1])
+        self.assertIs(self.lane.back(100), self.cars[0])
+        self.assertIsNone(Lane().front(100))
+        self.assertIsNone(Lane().back(100))
+
+    def test_insert_and_remove(self):
+        """Inserted cars end up at their sorted position."""
+        car = VehicleAgent(250, 20)
+        self.lane.insert(car)
+        self.assertEqual(self.lane.positions, [100, 200, 250, 300])
+        self.lane.remove(self.cars[2])
+        self.assertEqual(self.lane.positions, [100, 250, 300])
+        self.assertIs(self.lane.pop(self.lane.find(250)), car)
+        with self.assertRaises(ValueError):
+            self.lane.find(250)
+
+    def test_remove_slots(self):
+        """A batch of cars is removed by their index in the sorted lane."""
+        removed = self.lane.remove_slots([0, 2])
+        self.assertEqual(removed, [self.cars[1], self.cars[0]])
+        self.assertEqual(self.lane.ordered(), [self.cars[2]])
+
+    def test_insert_many(self):
+        """
+        A batch of cars ends up where inserting them one by one puts them, a
+        car at the same position as one in the lane goes behind it.
+        """
+        cars = [VehicleAgent(position, 20) for position in (350, 200, 50)]
+        self.lane.insert_many(cars)
+        self.assertEqual(self.lane.positions, [50, 100, 200, 200, 300, 350])
+        self.assertEqual(self.lane.ordered()[2:4], [self.cars[2], cars[1]])
+        cars = self.lane.remove_slots([1, 3, 5])
+        self.assertEqual([car.position for car in cars], [100, 200, 350])
+        self.assertEqual(self.lane.positions, [50, 200, 300])
+        self.lane.insert_many([])
+        self.assertEqual(self.lane.remove_slots([]), [])
+        self.assertEqual(self.lane.positions, [50, 200, 300])
+
+    def test_wrap_around(self):
+        """
+        Cars driving past the end of the track are rotated to the start of the
+        lane, after which the lookups still follow the sorted order.
+        """
+        for car in self.cars:
+            car.position += 1750
+        self.cars[0].position -= 2000
+        self.cars[2].position -= 2000
+        self.lane.update(wrapped=2)
+        self.assertEqual(self.lane.head, 1)
+        self.assertEqual([car.position for car in self.lane], [-50, 50, 1850])
+        self.assertIs(self.lane.front(0), self.cars[0])
+        self.assertIs(self.lane.front(1900), self.cars[2])
+        self.assertIs(self.lane.back(0), self.cars[2])
+        self.assertIs(self.lane.back(-100), self.cars[1])
+
+        other = Lane(self.lane.cars)
+        other.head = self.lane.head
+        car = VehicleAgent(1900, 20)
+        self.lane.insert(car)
+        self.assertEqual(
+            self.lane.ordered(), [self.cars[2], self.cars[0], self.cars[1], car]
+        )
+        other.insert_many([car])
+        self.assertEqual(other.ordered(), self.lane.ordered())
+        self.lane.remove(self.cars[2])
+        self.assertEqual(self.lane.ordered(), [self.cars[0], self.cars[1], car])
+
+    def test_overtake(self):
+        """A car that overtook its leader is put back in order."""
+        self.cars[1].position = 250
+        self.lane.update()
+        self.assertEqual([car.position for car in self.lane], [200, 250, 300])
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
@@ -0,0 +1,32 @@
+import unittest
+import matplotlib
+import numpy as np
+from src.live_viewer import LiveViewer
+from src.model import Model
+
+matplotlib.use("Agg")
+
+
+class LiveViewerTest(unittest.TestCase):
+    def simulate(self, viewer):
+        model = Model(total_time=20, lane_count=2, engine="vector", seed=1)
+        return model.simulate(30, rng=np.random.default_rng(0), viewer=viewer)
+
+    def test_shows_track(self):
+        """The viewer shows the cars of the track, at the end of the run too."""
+        viewer = LiveViewer(interval=0, max_overhead=None)
+        self.simulate(viewer)
+        # the first state, every step and the final state
+        self.assertEqual(viewer.frames, 22)
+        self.assertEqual(len(viewer.scatter.get_offsets()), 60)
+        self.assertEqual(viewer.time_text.get_text(), "t = 20")
+
+    def test_interval(self):
+        """A long interval skips the redraws, without changing the results."""
+        viewer = LiveViewer(interval=60)
+        self.assertEqual(self.simulate(viewer), self.simulate(None))
+        self.assertEqual(viewer.frames, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+from src.model import Model
+from src.profiling import summarize
+
+
+class ProfilingTest(unittest.TestCase):
+    def run_model(self, engine, profile, central_control=False):
+        model = Model(
+            total_time=100,
+            lane_count=2,
+            central_control=central_control,
+            engine=engine,
+            seed=4,
+            profile=profile,
+        )
+        model.density_values = np.array([30, 90])
+        model.run(0)
+        return model
+
+    def test_report(self):
+        """Every density gets a report with the time and calls of every phase."""
+        model = self.run_model("agent", profile=True)
+        self.assertEqual(len(model.profile_results[0]), 2)
+        for report in model.profile_results[0]:
+            for phase in ("lane switches", "next state", "periodic boundary"):
+                self.assertEqual(report["phases"][phase]["calls"], 100)
+                self.assertGreater(report["phases"][phase]["seconds"], 0)
+            self.assertGreater(report["counters"]["lane switches made"], 0)
+        total = summarize(model.profile_results[0])
+        self.assertEqual(total["phases"]["next state"]["calls"], 200)
+
+    def test_same_counters(self):
+        """Both engines do the same work, so they count the same."""
+        for central_control in (False, True):
+            counters = [
+                [
+                    report["counters"]
+                    for report in self.run_model(
+                        engine, True, central_control
+                    ).profile_results[0]
+                ]
+                for engine in ("agent", "vector")
+            ]
+            self.assertEqual(counters[0], counters[1])
+
+    def test_disabled(self):
+        """Without profiling there are no reports, and the results are the same."""
+        plain = self.run_model("vector", profile=False)
+        profiled = self.run_model("vector", profile=True)
+        self.assertEqual(plain.profile_results[0], [])
+        self.assertEqual(plain.flow_results[0], profiled.flow_results[0])
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
@@ -0,0 +1,69 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from src.model import Model
+from src.recorder import TrajectoryRecorder
+from src.results_store import ResultsStore
+from src.track_interface import Track
+from src.vector_track import VectorTrack
+
+
+class RecorderTest(unittest.TestCase):
+    def test_every(self):
+        """Only every k-th step is recorded, into arrays allocated up front."""
+        recorder = TrajectoryRecorder(steps=10, cars=2, every=3)
+        self.assertEqual(recorder.position.shape, (4, 2))
+        for t in range(10):
+            recorder.record(t, t * 0.5, [t, 2 * t], [0, 1], [1, 1])
+        time, position, lane, speed = recorder.trajectories()
+        np.testing.assert_array_equal(time, [0, 1.5, 3, 4.5])
+        np.testing.assert_array_equal(position[:, 1], [0, 6, 12, 18])
+        self.assertEqual(position.dtype, np.float32)
+        with self.assertRaises(ValueError):
+            TrajectoryRecorder(steps=10, cars=2, every=0)
+
+    def test_snapshot(self):
+        """Both engines index the snapshot by the same vehicle ids."""
+        snapshots = []
+        for engine in (Track, VectorTrack):
+            track = engine(lane_count=2, rng=np.random.default_rng(3))
+            track.init_cars(30)
+            track.lane_switches()
+            track.calculate_next_state()
+            track.update_state()
+            track.apply_periodic_boundary()
+            snapshots.append(track.snapshot())
+        for agent, vector in zip(*snapshots):
+            np.testing.assert_array_equal(agent, vector)
+
+    def test_shared(self):
+        """A copy of a shared recorder records into the memory of the original."""
+        recorder = TrajectoryRecorder(steps=4, cars=2, shared=True)
+        copy = pickle.loads(pickle.dumps(recorder))
+        for t in range(3):
+            copy.record(t, t, [t, t + 1], [0, 1], [2, 2])
+        self.assertEqual(len(recorder), 3)
+        np.testing.assert_array_equal(recorder.position[:3, 1], [1, 2, 3])
+        np.testing.assert_array_equal(recorder.lane[:3], copy.lane[:3])
+        recorder.release()
+
+    def test_record_cached(self):
+        """Recording simulates again, even when the results are stored already."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = ResultsStore(os.path.join(directory, "results.sqlite"))
+            model = Model(
+                total_time=20, lane_count=2, engine="vector", seed=5, store=store
+            )
+            model.density_values = np.array([30, 60])
+            model.total_runs = 1
+            model.run_parallel(processes=1)
+            self.assertEqual(len(store), 2)
+            recorders = model.record_parallel(processes=1)
+            self.assertEqual([len(recorder) for recorder in recorders], [20, 20])
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
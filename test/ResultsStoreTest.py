@@ -0,0 +1,107 @@
+import os
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from src.model import Model
+from src.results_store import ResultsStore
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ResultsStore(os.path.join(self.directory.name, "results.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def make_model(self, **kwargs):
+        model = Model(
+            total_time=100, lane_count=2, engine="vector", seed=3, store=self.store
+        )
+        for name, value in kwargs.items():
+            setattr(model, name, value)
+        model.density_values = np.array([0, 40, 100])
+        model.total_runs = 2
+        return model
+
+    def test_put_get(self):
+        model = self.make_model()
+        seed = np.random.SeedSequence(1)
+        self.assertIsNone(self.store.get(model, 40, seed))
+        self.store.put(model, 40, seed, 0, 120, np.nan, 100, {"a": 1})
+        flow, speed, steps, stats = self.store.get(model, 40, seed)
+        self.assertEqual((flow, steps, stats), (120, 100, {"a": 1}))
+        self.assertTrue(np.isnan(speed))
+        self.assertIsNone(self.store.get(model, 40, np.random.SeedSequence(2)))
+        self.assertIsNone(self.store.get(self.make_model(lane_count=3), 40, seed))
+
+    def test_key(self):
+        """Only the parameters that change the results change the key."""
+        key = self.store.key(self.make_model())
+        self.assertEqual(key, self.store.key(self.make_model(engine="agent")))
+        self.assertNotEqual(key, self.store.key(self.make_model(speed_push=1)))
+
+    def test_cached(self):
+        """A stored sweep gives the same results without simulating again."""
+        model = self.make_model()
+        model.run_parallel(processes=1)
+        self.assertEqual(len(self.store), 6)
+
+        cached = self.make_model()
+        cached.simulate = None  # fails when anything is simulated
+        cached.run_parallel(processes=1)
+        self.assertEqual(cached.flow_results, model.flow_results)
+        np.testing.assert_array_equal(cached.speed_results, model.speed_results)
+        self.assertEqual(cached.steps_results, model.steps_results)
+        for flows, cached_flows in zip(model.flow_results, cached.flow_results):
+            self.assertEqual(
+                [type(flow) for flow in cached_flows], [type(flow) for flow in flows]
+            )
+
+    def test_cached_types(self):
+        """Measured flows are floats, whether they come from the store or not."""
+        model = self.make_model(warmup_time=50, measure_time=50)
+        model.run(0)
+        cached = self.make_model(warmup_time=50, measure_time=50)
+        cached.run(0)
+        self.assertEqual(cached.flow_results[0], model.flow_results[0])
+        for flow in cached.flow_results[0]:
+            self.assertIsInstance(flow, float)
+
+    def test_profile(self):
+        """A profiled model simulates again what was stored without a profile."""
+        self.make_model().run(0)
+        model = self.make_model(profile=True)
+        model.run(0)
+        for report in model.profile_results[0]:
+            self.assertIn("next state", report["phases"])
+        cached = self.make_model(profile=True)
+        cached.simulate = None
+        cached.run(0)
+        self.assertEqual(cached.profile_results[0], model.profile_results[0])
+        self.assertEqual(len(self.store), 3)
+
+    def test_resume(self):
+        """Only the simulations that are missing from the store are run."""
+        partial = self.make_model()
+        partial.run(0)
+        self.assertEqual(len(self.store), 3)
+
+        model = self.make_model()
+        model.run_parallel(processes=2)
+        self.assertEqual(len(self.store), 6)
+        expected = self.make_model(store=None)
+        expected.run_parallel(processes=1)
+        self.assertEqual(model.flow_results, expected.flow_results)
+
+    def test_pickle(self):
+        self.store.key(self.make_model())
+        copy = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(copy.path, self.store.path)
+        self.assertIsNone(copy._connection)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
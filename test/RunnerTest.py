@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from src.model import Model
+from src.recorder import TrajectoryRecorder
+from src.runner import task_seeds
+
+
+class RunnerTest(unittest.TestCase):
+    def make_model(self, seed=7):
+        model = Model(total_time=100, lane_count=2, engine="vector", seed=seed)
+        model.density_values = np.array([0, 40, 120])
+        model.total_runs = 3
+        return model
+
+    def test_results_shape(self):
+        """The parallel results have the same [run][density] shape as ``run``."""
+        model = self.make_model()
+        model.run_parallel(processes=2)
+        self.assertEqual(len(model.flow_results), 3)
+        self.assertEqual(len(model.speed_results), 3)
+        for flows, speeds in zip(model.flow_results, model.speed_results):
+            self.assertEqual(len(flows), 3)
+            self.assertEqual(len(speeds), 3)
+            self.assertEqual(flows[0], 0)
+
+    def test_reproducible(self):
+        """
+        Every task has its own seed, so the results do not depend on the amount
+        of processes, but do depend on the seed.
+        """
+        results = []
+        for processes, seed in ((1, 7), (3, 7), (2, 8)):
+            model = self.make_model(seed)
+            model.run_parallel(processes=processes)
+            results.append(model.flow_results)
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0], results[2])
+
+    def test_same_as_serial(self):
+        """The parallel runner uses the same seeds as running the runs one by one."""
+        parallel = self.make_model()
+        parallel.run_parallel(processes=2)
+        serial = self.make_model()
+        for idx in range(serial.total_runs):
+            serial.run(idx)
+        runs = serial.total_runs
+        self.assertEqual(parallel.flow_results, serial.flow_results[:runs])
+        np.testing.assert_array_equal(
+            parallel.speed_results, serial.speed_results[:runs]
+        )
+
+    def test_record_parallel(self):
+        """
+        The workers record the first run of every density into shared memory,
+        the same trajectories as recording it in this process.
+        """
+        model = self.make_model()
+        recorders = model.record_parallel(processes=2, every=3)
+        seeds = task_seeds(model.seed, model.total_runs, len(model.density_values))
+        for j, density in enumerate(model.density_values):
+            recorder = TrajectoryRecorder(100, model.car_count(density), every=3)
+            model.simulate(
+                density, rng=np.random.default_rng(seeds[0][j]), recorder=recorder
+            )
+            self.assertEqual(len(recorders[j]), 34)
+            for serial, shared in zip(
+                recorder.trajectories(), recorders[j].trajectories()
+            ):
+                np.testing.assert_array_equal(serial, shared)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
@@ -0,0 +1,100 @@
+import unittest
+import numpy as np
+from src.model import Model
+from src.steady_state import MeasurementWindow, SteadyStateDetector
+
+
+class SteadyStateTest(unittest.TestCase):
+    def test_detector(self):
+        """Only stationary windows count as steady, and only at a window end."""
+        detector = SteadyStateDetector(window=2, tolerance=0.1, windows=2)
+        results = [detector.update(1, 10.0) for _ in range(3)]
+        self.assertEqual(results, [False, False, False])
+        self.assertTrue(detector.update(1, 10.0))
+        self.assertEqual(detector.flow_rate(), 1.0)
+
+        detector = SteadyStateDetector(window=1, tolerance=0.1, windows=2)
+        self.assertFalse(detector.update(1, 10.0))
+        self.assertFalse(detector.update(1, 20.0))
+        self.assertTrue(detector.update(1, 21.0))
+
+    def test_empty_track(self):
+        detector = SteadyStateDetector(window=1, windows=2)
+        detector.update(0, np.nan)
+        self.assertTrue(detector.update(0, np.nan))
+
+    def test_stops_early(self):
+        """A steady simulation stops early, with a flow of the same magnitude."""
+        results = []
+        for steady_window in (None, 50):
+            model = Model(
+                total_time=1000, engine="vector", seed=4, steady_window=steady_window
+            )
+            model.density_values = np.array([20, 100])
+            model.run(0)
+            results.append((model.flow_results[0], model.steps_results[0]))
+        (full_flows, full_steps), (flows, steps) = results
+        self.assertEqual(full_steps, [1000, 1000])
+        for flow, full_flow, step in zip(flows, full_flows, steps):
+            self.assertLess(step, 1000)
+            self.assertEqual(step % 50, 0)
+            self.assertAlmostEqual(flow / full_flow, 1, delta=0.2)
+
+    def test_parallel(self):
+        """The parallel runner reports the same steps as ``run``."""
+        model = Model(total_time=500, engine="vector", seed=4, steady_window=50)
+        model.density_values = np.array([20, 100])
+        model.total_runs = 2
+        model.run_parallel(processes=1)
+        serial = Model(total_time=500, engine="vector", seed=4, steady_window=50)
+        serial.density_values = model.density_values
+        serial.run(0)
+        serial.run(1)
+        self.assertEqual(model.steps_results, serial.steps_results[:2])
+        self.assertEqual(model.flow_results, serial.flow_results[:2])
+
+    def test_measurement_window(self):
+        window = MeasurementWindow(dt=0.5)
+        for crossings, speed in ((1, 10.0), (0, 20.0), (2, 30.0), (1, 20.0)):
+            window.update(crossings, speed)
+        self.assertEqual(window.flow(), 4 * 3600 / 2)
+        self.assertEqual(window.mean_speed(), 20.0)
+
+    def test_warmup(self):
+        """Without a warm-up the window measures the same crossings as a normal run."""
+        results = []
+        for warmup_time in (None, 0):
+            model = Model(
+                total_time=300, engine="vector", seed=4, warmup_time=warmup_time
+            )
+            model.density_values = np.array([20, 100])
+            model.run(0)
+            results.append(model.flow_results[0])
+        self.assertEqual([flow * 3600 / 300 for flow in results[0]], results[1])
+
+    def test_warmup_steps(self):
+        """The warm-up ends at warmup_time or earlier at a steady state."""
+        model = Model(engine="vector", seed=4, warmup_time=200, measure_time=100)
+        model.density_values = np.array([20])
+        model.run(0)
+        self.assertEqual(model.steps_results[0], [300])
+
+        model = Model(
+            engine="vector",
+            seed=4,
+            warmup_time=5000,
+            measure_time=100,
+            steady_window=50,
+        )
+        model.density_values = np.array([20])
+        model.run(0)
+        self.assertLess(model.steps_results[0][0], 5000)
+        self.assertEqual(model.steps_results[0][0] % 50, 0)
+
+    def test_invalid_window(self):
+        with self.assertRaises(ValueError):
+            Model(total_time=100, warmup_time=100)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
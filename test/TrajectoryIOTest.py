@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from src.recorder import StreamingRecorder, TrajectoryRecorder
+from src.trajectory_io import ChunkWriter, read_trajectories, write_trajectories
+
+
+class TrajectoryIOTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.states = [
+            (rng.random(5) * 2000, rng.integers(0, 2, 5), rng.random(5) * 30)
+            for _ in range(20)
+        ]
+        self.recorder = TrajectoryRecorder(steps=20, cars=5)
+        for t, state in enumerate(self.states):
+            self.recorder.record(t, t, *state)
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_npz_matches_csv(self):
+        """The binary export reads back as the same table as the csv export."""
+        tables = []
+        for fmt in ("csv", "npz"):
+            path = os.path.join(self.dir.name, "data." + fmt)
+            write_trajectories(path, self.recorder, fmt)
+            tables.append(read_trajectories(path))
+        self.assertEqual(list(tables[1].columns), list(tables[0].columns))
+        pd.testing.assert_frame_equal(tables[0], tables[1], check_dtype=False)
+
+    def test_csv_precision(self):
+        """Recorded float32 values are written with the digits of a float32."""
+        path = os.path.join(self.dir.name, "data.csv")
+        write_trajectories(path, self.recorder, "csv")
+        with open(path) as file:
+            file.readline()
+            alpha = file.readline().split(",")[2]
+        position = self.recorder.trajectories()[1][0, 0]
+        self.assertEqual(alpha, str(position))
+        self.assertEqual(np.float32(alpha), position)
+
+    def test_streaming(self):
+        """
+        Streaming the frames to disk in chunks, with or without a writer thread,
+        gives the same data as exporting them at the end.
+        """
+        path = os.path.join(self.dir.name, "data.npz")
+        write_trajectories(path, self.recorder, "npz")
+        expected = read_trajectories(path)
+        for fmt in ("csv", "npz"):
+            for background in (False, True):
+                path = os.path.join(self.dir.name, f"{fmt}_{background}")
+                writer = ChunkWriter(path, fmt)
+                recorder = StreamingRecorder(
+                    writer, cars=5, chunk=3, background=background, queue_size=1
+                )
+                for t, state in enumerate(self.states):
+                    recorder.record(t, t, *state)
+                    self.assertLessEqual(len(recorder.buffer), 3)
+                recorder.close()
+                self.assertEqual(writer.chunks, 7)
+                # a streamed csv file is only ordered on car within a chunk
+                table = read_trajectories(writer.path).sort_values(
+                    "id", kind="stable", ignore_index=True
+                )
+                pd.testing.assert_frame_equal(table, expected, check_dtype=False)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            write_trajectories("data.txt", self.recorder, "txt")
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
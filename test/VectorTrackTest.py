@@ -0,0 +1,84 @@
+import unittest
+import numpy as np
+from src.model import Model, TRACK_ENGINES
+
+
+class VectorTrackTest(unittest.TestCase):
+    def run_engines(self, lane_count, central_control):
+        """
+        Runs the same simulation with both engines, starting from the same random
+        seed, and returns the models.
+        """
+        models = []
+        for engine in ("agent", "vector"):
+            model = Model(
+                total_time=200,
+                lane_count=lane_count,
+                central_control=central_control,
+                engine=engine,
+                seed=1,
+            )
+            model.density_values = np.array([15, 60, 140])
+            model.run(0)
+            models.append(model)
+        return models
+
+    def assert_same_results(self, lane_count, central_control):
+        agent, vector = self.run_engines(lane_count, central_control)
+        np.testing.assert_array_equal(agent.flow_results[0], vector.flow_results[0])
+        np.testing.assert_array_equal(agent.speed_results[0], vector.speed_results[0])
+
+    def test_single_lane(self):
+        """
+        With a single lane only the car following is used, the vectorized engine
+        has to give exactly the same flow and mean speed as the agents.
+        """
+        self.assert_same_results(lane_count=1, central_control=False)
+
+    def test_lane_switches(self):
+        """Individual lane switching has to be resolved in the same order as the agents."""
+        self.assert_same_results(lane_count=2, central_control=False)
+
+    def test_central_control(self):
+        """Central control draws its random numbers in the same order as the agents."""
+        self.assert_same_results(lane_count=2, central_control=True)
+
+    def test_three_lanes_central(self):
+        """
+        Central control only moves the cars above the preferred amount of a
+        lane, so a lane never drops below it, and with three lanes every engine
+        runs through lanes with empty neighbours and still agrees.
+        """
+        for engine in TRACK_ENGINES:
+            track = TRACK_ENGINES[engine](lane_count=3, rng=np.random.default_rng(0))
+            track.init_cars(30)
+            before = [len(track.lane_state(lane)[0]) for lane in range(3)]
+            track.lane_switches_central(before)
+            after = [len(track.lane_state(lane)[0]) for lane in range(3)]
+            self.assertEqual(after, before)
+        results = []
+        for engine in TRACK_ENGINES:
+            model = Model(
+                total_time=50,
+                lane_count=3,
+                central_control=True,
+                engine=engine,
+                seed=3,
+            )
+            model.density_values = np.array([1, 2, 5])
+            model.total_runs = 3
+            for idx in range(3):
+                model.run(idx)
+            results.append((model.flow_results[:3], model.speed_results[:3]))
+        model.run_batched()
+        results.append((model.flow_results, model.speed_results))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            Model(engine="unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+from src.Agent import VEHICLE_CLASSES, VehicleType
+from src.model import Model, TRACK_ENGINES
+from src.track_interface import lane_gaps, parse_vehicle_mix
+
+MIX = {"car": 0.6, "truck": 0.3, "bus": 0.1}
+
+
+class VehicleMixTest(unittest.TestCase):
+    def test_parse(self):
+        """The fractions are scaled to one, unknown classes are refused."""
+        van = VehicleType(length=7)
+        types, fractions = parse_vehicle_mix({"truck": 1, van: 3})
+        self.assertEqual(types, [VEHICLE_CLASSES["truck"], van])
+        np.testing.assert_array_equal(fractions, [0.25, 0.75])
+        for mix in ({"tractor": 1}, {"car": -1, "bus": 2}, {"car": 0}, {}):
+            with self.assertRaises(ValueError):
+                parse_vehicle_mix(mix)
+        with self.assertRaises(ValueError):
+            Model(vehicle_mix={"tractor": 1})
+
+    def test_init_cars(self):
+        """
+        Every engine draws the same classes, and gives the cars the parameters
+        of their class. No car starts closer than its length to its leader.
+        """
+        classes = []
+        for engine in TRACK_ENGINES:
+            track = TRACK_ENGINES[engine](lane_count=2, rng=np.random.default_rng(4))
+            track.init_cars(120, vehicle_mix=MIX)
+            classes.append(track.vehicle_classes())
+            np.testing.assert_array_equal(classes[0], classes[-1])
+            lengths = np.array([t.length for t in track.vehicle_types])
+            for lane in range(2):
+                positions, _ = track.lane_state(lane)
+                ids = track.snapshot()[1] == lane
+                leader_lengths = np.roll(lengths[classes[-1][ids]], -1)
+                self.assertTrue(np.all(lane_gaps(positions, 2000) >= leader_lengths))
+        self.assertEqual(set(classes[0]), {0, 1, 2})
+        np.testing.assert_array_equal(
+            track.veh_length, track.parameter_table["veh_length"][classes[0]]
+        )
+        self.assertEqual(track.parameter_table["TP"].tolist(), [1.2, 1.6, 1.5])
+
+    def test_equal_types(self):
+        """Two classes with the same parameters are still told apart."""
+        mix = {VehicleType(): 1, "car": 1}
+        for engine in TRACK_ENGINES:
+            track = TRACK_ENGINES[engine](lane_count=2, rng=np.random.default_rng(3))
+            track.init_cars(60, vehicle_mix=mix)
+            track.set_density(70)
+            self.assertEqual(set(track.vehicle_classes()), {0, 1})
+            if engine == "agent":
+                expected = track.vehicle_classes()
+            np.testing.assert_array_equal(track.vehicle_classes(), expected)
+
+    def test_same_results(self):
+        """All engines, batched included, agree with a mixed fleet."""
+        results = []
+        for engine in TRACK_ENGINES:
+            model = Model(
+                total_time=100, lane_count=2, engine=engine, seed=6, vehicle_mix=MIX
+            )
+            model.density_values = np.array([20, 90])
+            model.total_runs = 2
+            model.run(0)
+            model.run(1)
+            results.append((model.flow_results[:2], model.speed_results[:2]))
+        model.run_batched()
+        results.append((model.flow_results, model.speed_results))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_set_density(self):
+        """Added cars are drawn from the mix in the same way by every engine."""
+        classes = []
+        for engine in TRACK_ENGINES:
+            track = TRACK_ENGINES[engine](lane_count=2, rng=np.random.default_rng(2))
+            track.init_cars(20, vehicle_mix=MIX)
+            track.set_density(50)
+            classes.append(track.vehicle_classes())
+            track.set_density(10)
+            self.assertEqual(len(track.vehicle_classes()), 20)
+        for other in classes[1:]:
+            np.testing.assert_array_equal(other, classes[0])
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests
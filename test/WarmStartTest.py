@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+from src.model import Model, TRACK_ENGINES
+from src.track_interface import lane_gaps
+
+
+class WarmStartTest(unittest.TestCase):
+    def make_track(self, engine):
+        track = TRACK_ENGINES[engine](lane_count=2, rng=np.random.default_rng(1))
+        track.init_cars(20)
+        for _ in range(20):
+            track.lane_switches()
+            track.calculate_next_state()
+            track.update_state()
+            track.apply_periodic_boundary()
+        return track
+
+    def test_lane_gaps(self):
+        np.testing.assert_array_equal(
+            lane_gaps(np.array([10.0, 50.0, 1990.0]), 2000), [40.0, 1940.0, 20.0]
+        )
+        np.testing.assert_array_equal(lane_gaps(np.array([10.0]), 2000), [2000.0])
+
+    def test_set_density(self):
+        """Cars are added and removed without touching the other cars."""
+        for engine in TRACK_ENGINES:
+            track = self.make_track(engine)
+            position, _, speed = (a.copy() for a in track.snapshot())
+            track.set_density(60)
+            self.assertEqual(sum(track.lane_sizes()), 120)
+            new_position, lane, new_speed = track.snapshot()
+            self.assertEqual(len(new_position), 120)
+            np.testing.assert_array_equal(new_position[:40], position)
+            np.testing.assert_array_equal(new_speed[:40], speed)
+            for i in range(2):
+                positions, _ = track.lane_state(i)
+                self.assertTrue(np.all(np.diff(positions) >= 0))
+                self.assertEqual(np.count_nonzero(lane == i), len(positions))
+                # the cars are spread out instead of piled up
+                self.assertGreater(lane_gaps(positions, 2000).min(), 5)
+
+            track.set_density(10)
+            self.assertEqual(sum(track.lane_sizes()), 20)
+            self.assertEqual(len(track.snapshot()[0]), 20)
+
+    def test_engines(self):
+        """All engines sweep to the same results, up and down in density."""
+        results = []
+        for engine in TRACK_ENGINES:
+            model = Model(
+                lane_count=2,
+                engine=engine,
+                seed=2,
+                warmup_time=100,
+                measure_time=50,
+                warm_start_time=20,
+            )
+            model.density_values = np.array([20, 60, 120, 40])
+            model.run(0)
+            self.assertEqual(model.steps_results[0], [150, 70, 70, 70])
+            results.append((model.flow_results[0], model.speed_results[0]))
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[2])
+
+    def test_parallel(self):
+        """The parallel runner gives the same sweeps as ``run``."""
+        models = []
+        for _ in range(2):
+            model = Model(
+                total_time=150,
+                engine="vector",
+                seed=2,
+                warmup_time=100,
+                warm_start_time=20,
+            )
+            model.density_values = np.array([20, 60])
+            model.total_runs = 2
+            models.append(model)
+        models[0].run_parallel(processes=1)
+        models[1].run(0)
+        models[1].run(1)
+        self.assertEqual(models[0].flow_results, models[1].flow_results[:2])
+        self.assertEqual(models[0].steps_results, models[1].steps_results[:2])
+
+    def test_needs_warmup(self):
+        with self.assertRaises(ValueError):
+            Model(warm_start_time=100)
+
+
+if __name__ == "__main__":
+    unittest.main()  # run the tests